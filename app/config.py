@@ -1,18 +1,131 @@
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+class NefBackendSettings(BaseModel):
+    """One NEF instance of the backend pool, unset fields fall back to the top-level settings."""
+    name: str
+    base_url: str
+    scs_as_id: str | None = None
+    project_api_name: str | None = None
+
 class Settings(BaseSettings):
     host: str = "127.0.0.1"
     port: int = 8080
     
     log_directory_path: str = "./app/log/"
     log_filename_path: str = f"{log_directory_path}app_logger"
+    log_level: str = "INFO"
+    log_json: bool = False
+    log_sample_per_second: int = 50 #DEBUG/INFO records kept per call site and second, 0 keeps all
     
     base_url: str = "http://localhost:8000"
     scs_as_id: str = "1"
     location_type: str = "last_known" #last_known or current_location
     notification_destination: str | None = "http://127.0.0.1:8001"
+    notification_token: str | None = None #secret notifications must carry in the token query parameter, generated and kept in shared_state_dir when unset
     project_api_name: str | None = None
 
+    nef_http2: bool = False
+    nef_max_connections: int = 200
+    nef_max_keepalive_connections: int = 50
+    nef_keepalive_expiry: float = 30.0 #seconds an idle pooled connection is kept open
+    nef_connect_timeout: float = 3.0
+    nef_read_timeout: float = 10.0
+    nef_pool_timeout: float = 5.0 #seconds to wait for a free pooled connection
+
+    nef_backends: list[NefBackendSettings] = [] #JSON list of NEF instances, empty uses base_url alone
+    nef_routing: str = "least_loaded" #least_loaded or hash (consistent hashing by device)
+    nef_latency_decay: float = 10.0 #seconds over which the latency average of a backend forgets old calls
+
+    location_cache_enabled: bool = True
+    location_cache_ttl: int = 600 #seconds after lastLocationTime a cached location is dropped
+    location_cache_max_entries: int = 100_000
+    location_cache_max_bytes: int = 256 * 1024 * 1024
+    location_cache_layout: str = "objects" #objects (pydantic models) or columnar (flat arrays, for millions of devices)
+    location_cache_coordinates: str = "float64" #float64 or float32 coordinates of the columnar layout, float32 is precise to about 1 m
+    location_cache_decoded_entries: int = 1024 #locations the columnar and multi-worker caches also keep as built models for hot devices, 0 disables
+
+    negative_cache_enabled: bool = True
+    #JSON map of failure cause (NEF_NOT_FOUND, NO_LOCATION_INFO or a NEF locFailureCause) to the seconds
+    #a device failing with it is answered from the negative cache, causes not listed are not cached
+    negative_cache_ttls: dict[str, float] = {
+        "NEF_NOT_FOUND": 60.0,
+        "NO_LOCATION_INFO": 10.0,
+        "NOT_REGISTERED_UE": 30.0,
+        "POSITIONING_DENIED": 300.0,
+        "UNSUPPORTED_BY_UE": 3600.0,
+        "UNSPECIFIED": 10.0,
+    }
+    negative_cache_max_entries: int = 100_000
+
+    batch_max_devices: int = 10_000
+    batch_max_concurrency: int = 64 #NEF retrievals in flight per batch request
+
+    notification_wait_timeout: float = 30.0 #seconds a current_location retrieval waits for a notified report
+    notification_unclaimed_ttl: float = 10.0 #seconds a report notified before its POST response is kept
+    notification_max_unclaimed: int = 10_000
+
+    standing_subscriptions_enabled: bool = False
+    hot_device_threshold: int = 10 #requests per hot_device_window that make a device hot
+    hot_device_window: int = 60
+    hot_device_cold_after: int = 300 #seconds without requests after which a standing subscription is removed
+    standing_subscription_lifetime: int = 3600
+    standing_subscription_rep_period: int = 30
+    standing_subscription_renew_margin: int = 300
+    standing_subscription_max: int = 1000
+
+    stream_rep_period: int = 10 #default seconds between the reports of a location stream
+    stream_max_reports: int = 360 #default reports after which a location stream ends
+    stream_max_streams: int = 1000 #location streams open at once per worker
+    stream_queue_size: int = 8 #locations buffered for a slow stream client, the oldest are dropped beyond
+    stream_heartbeat_interval: float = 15.0 #seconds without a report after which a heartbeat is sent
+
+    subscription_cleanup_enabled: bool = True
+    subscription_journal_path: str = "./app/state/subscription_journal.log"
+    subscription_reaper_batch_size: int = 20
+    subscription_reaper_rate: float = 50.0 #NEF subscription deletes per second
+    subscription_reaper_max_attempts: int = 5
+    subscription_reaper_retry_backoff: float = 1.0 #seconds before the first retry, doubled per attempt
+    subscription_reaper_drain_timeout: float = 5.0
+
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_window: int = 30 #seconds of call outcomes the error and slow-call rates are computed over
+    circuit_breaker_min_calls: int = 20
+    circuit_breaker_error_rate: float = 0.5
+    circuit_breaker_slow_call_duration: float = 3.0
+    circuit_breaker_slow_call_rate: float = 0.8
+    circuit_breaker_open_duration: float = 15.0
+    circuit_breaker_half_open_calls: int = 3
+
+    cell_geometry_index_path: str | None = None #index built by app.utils.cell_geometry_index, used when reports lack geographicArea
+
+    warmup_enabled: bool = True #onboard, connect to the NEF and exercise the models before reporting ready
+    warmup_nef_connections: int = 8
+    warmup_retry_interval: float = 5.0 #seconds between CAPIF token attempts during warm-up
+
+    request_timeout: float = 30.0 #seconds a retrieval may take unless the request_timeout_header asks otherwise
+    request_timeout_header: str = "x-request-timeout" #seconds the client waits, capped at request_max_timeout
+    request_max_timeout: float = 60.0
+
+    admission_control_enabled: bool = True
+    admission_deadline: float = 5.0 #seconds an admitted retrieval is expected to complete in, longer waits are shed
+    admission_min_in_flight: int = 64 #retrievals always admitted, whatever the measured NEF throughput
+    admission_max_in_flight: int = 0 #fixed cap on retrievals in flight, 0 derives it from the NEF alone
+    admission_client_rate: float = 0.0 #requests per second and client, 0 disables the per-client limit
+    admission_client_burst: int = 20
+    admission_max_clients: int = 10_000 #clients whose request rate is tracked at once
+    admission_trust_client_id_header: bool = False #rate-limit by client_id_header instead of source address, only behind a gateway that sets it
+
+    workers: int = 1 #uvicorn worker processes, more than one shares the CAPIF token and cached locations
+    shared_state_dir: str = "./app/state/shared" #files the workers share state through, local to the host
+    capif_leader_wait_timeout: float = 30.0 #seconds a worker waits for the onboarding leader to publish a token
+
+    client_id_header: str = "x-client-id" #request header identifying the API consumer
+    circle_area_clients: list[str] = [] #client ids answered with Circle areas unless the request asks otherwise
+
+    capif_token_refresh_margin: int = 60 #seconds before the JWT exp claim to refresh the token
+    capif_token_default_ttl: int = 3600 #assumed JWT lifetime when the token carries no exp claim
+
     model_config = SettingsConfigDict(env_ignore_empty=True)
 
 settings = Settings()
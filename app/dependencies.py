@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
-from app.utils.errors.exception_errors import LocationInfoNotFoundException, CoreUnauthorizedException
-from app.utils.errors.exception_error_handlers import validation_exception_handler, location_info_exception_handler, unauthorized_exception_handler
+from app.utils.errors.exception_errors import LocationInfoNotFoundException, LocationFailureException, CoreUnauthorizedException, LocationMaxAgeNotFulfilledException, LocationMaxSurfaceNotFulfilledException, NetworkPlatformError, CircuitOpenException, OverloadedException, RateLimitedException, DeadlineExceededException
+from app.utils.errors.exception_error_handlers import validation_exception_handler, location_info_exception_handler, location_failure_exception_handler, unauthorized_exception_handler, max_age_exception_handler, max_surface_exception_handler, network_platform_exception_handler, circuit_open_exception_handler, overloaded_exception_handler, rate_limited_exception_handler, deadline_exceeded_exception_handler
 from app.utils.logger import get_app_logger
 
 logger = get_app_logger(__name__)
@@ -11,9 +11,17 @@ def init_custom_exc_handlers(app: FastAPI) -> None:
     Initialize custom exception handlers for the FastAPI application.
     This function should be called during the application startup.
     """
-    logger.info("Initializing FastAPI application with custom exception handlers...")
+    logger.debug("Initializing FastAPI application with custom exception handlers...")
 
 
     app.add_exception_handler(RequestValidationError, validation_exception_handler)
     app.add_exception_handler(LocationInfoNotFoundException, location_info_exception_handler)
-    app.add_exception_handler(CoreUnauthorizedException, unauthorized_exception_handler)
\ No newline at end of file
+    app.add_exception_handler(LocationFailureException, location_failure_exception_handler)
+    app.add_exception_handler(CoreUnauthorizedException, unauthorized_exception_handler)
+    app.add_exception_handler(LocationMaxAgeNotFulfilledException, max_age_exception_handler)
+    app.add_exception_handler(LocationMaxSurfaceNotFulfilledException, max_surface_exception_handler)
+    app.add_exception_handler(NetworkPlatformError, network_platform_exception_handler)
+    app.add_exception_handler(CircuitOpenException, circuit_open_exception_handler)
+    app.add_exception_handler(OverloadedException, overloaded_exception_handler)
+    app.add_exception_handler(RateLimitedException, rate_limited_exception_handler)
+    app.add_exception_handler(DeadlineExceededException, deadline_exceeded_exception_handler)
@@ -1,10 +1,20 @@
 import os
-from opencapif_sdk import capif_invoker_connector,service_discoverer
+import threading
+import time
+
+from app.config import get_settings
+from app.invoker_onboarding.shared_token import SharedTokenFile
+from app.utils.circuit_breaker import capif_circuit_breaker
+from app.utils.errors.exception_errors import NetworkPlatformError
+from app.utils.logger import get_app_logger
 
 
 INVOKER_CONFIG_FILE = os.getenv('INVOKER_CONFIG_FILE', './app/invoker_onboarding/invoker_config_sample.json')
 INVOKER_ACCESS_TOKEN_FILE = os.getenv('INVOKER_ACCESS_TOKEN_FILE', './invoker_impl/invoker_folder/ppavlidis/jwt_token.txt')
 
+log = get_app_logger(__name__)
+settings = get_settings()
+
 def _write_to_file(filename, content):
     """
     Writes the given content to a file with the specified filename.
@@ -24,36 +34,211 @@ def _write_to_file(filename, content):
         f.write(content)
     print(f"Wrote content to {filename}")
 
-def onboard_invoker() -> str:
-    """
-    Onboards an invoker to the CAPIF system, discovers available services, retrieves a JWT access token, 
-    prints it, and writes it to a file.
-    This function performs the following steps:
-    1. Initializes the CAPIF invoker connector using the provided configuration file.
-    2. Onboards the invoker to the CAPIF system.
-    3. Initializes the service discoverer using the same configuration file.
-    4. Discovers available services.
-    5. Retrieves JWT tokens from the service discoverer.
-    6. Prints the obtained JWT token.
-    7. Writes the JWT token to a specified access token file.
 
-    Raises:
-        Any exceptions raised by the underlying connector or file operations.
+def _token_expiry(jwt_token: str, default_ttl: int) -> float:
     """
+    Returns the epoch time at which the given JWT expires.
 
-    capif_connector = capif_invoker_connector(config_file=INVOKER_CONFIG_FILE)
+    The token is only decoded to read its ``exp`` claim, the signature is verified
+    by the NEF. Tokens without a readable ``exp`` claim are assumed to be valid for
+    ``default_ttl`` seconds.
+    """
+    import jwt # imports cryptography, only needed once a token is fetched
 
-    capif_connector.onboard_invoker()
+    try:
+        claims = jwt.decode(jwt_token, options={"verify_signature": False})
+        return float(claims["exp"])
+    except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+        log.warning("CAPIF token has no readable exp claim, assuming a lifetime of %s seconds", default_ttl)
+        return time.time() + default_ttl
 
-    discoverer_svc = service_discoverer(config_file=INVOKER_CONFIG_FILE)
-    discoverer_svc.discover()
 
+class CapifCredentialManager:
+    """
+    Process-wide holder of the CAPIF invoker state.
+
+    The invoker is onboarded and the service APIs are discovered only once; the JWT
+    obtained from CAPIF is cached until shortly before its ``exp`` claim and refreshed
+    by a background timer. Concurrent refreshes are collapsed into a single CAPIF
+    round trip by a lock, callers that lose the race reuse the winner's token.
+
+    With a ``shared`` token file the manager also collapses onboarding and token
+    fetches across the worker processes of the host: only the worker holding the
+    onboarding leadership talks to CAPIF, it checks the published token every second
+    and refreshes it before expiry or once another worker marked it invalid. The
+    other workers adopt the published token, waiting up to ``leader_wait_timeout``
+    seconds for it, and take over the leadership when the leader is gone.
+    """
 
-    discoverer_svc.get_tokens()
-    jwt_token=discoverer_svc.token
+    def __init__(self, config_file: str, refresh_margin: int, default_ttl: int,
+                 shared: SharedTokenFile | None = None, leader_wait_timeout: float = 30.0):
+        self._config_file = config_file
+        self._refresh_margin = refresh_margin
+        self._default_ttl = default_ttl
+        self._shared = shared
+        self._leader_wait_timeout = leader_wait_timeout
+        self._lock = threading.Lock()
+        self._discoverer = None
+        self._discovered_apis: list | None = None
+        self._token: str | None = None
+        self._expires_at: float = 0.0
+        self._refresh_timer: threading.Timer | None = None
+
+    @property
+    def discovered_apis(self) -> list | None:
+        """The service API descriptions returned by the CAPIF discovery, if any."""
+        return self._discovered_apis
+
+    def cached_token(self) -> str | None:
+        """Returns the cached JWT if it is still fresh, without contacting CAPIF."""
+        token = self._token
+        if token is not None and time.time() < self._expires_at - self._refresh_margin:
+            return token
+        if self._shared is not None:
+            return self._adopt_published(stale_token=token)
+        return None
+
+    def get_token(self) -> str:
+        """Returns a valid JWT, onboarding and fetching a new one only when needed."""
+        token = self.cached_token()
+        if token is not None:
+            return token
+        return self._refresh(stale_token=self._token)
+
+    def invalidate(self, token: str | None = None) -> None:
+        """
+        Drops the cached JWT so the next caller fetches a new one.
+
+        If ``token`` is given, the cache is only cleared while it still holds that
+        token, so a token that has already been replaced is not thrown away twice.
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                log.info("Invalidating cached CAPIF access token")
+                if self._shared is not None and self._token is not None:
+                    self._shared.mark_invalid(self._token)
+                self._token = None
+                self._expires_at = 0.0
+
+    def shutdown(self) -> None:
+        """Cancels the background refresh timer and gives up the onboarding leadership."""
+        with self._lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+            if self._shared is not None:
+                self._shared.release()
+
+    def _refresh(self, stale_token: str | None = None) -> str:
+        with self._lock:
+            # Another caller may have refreshed the token while we waited for the lock.
+            if (self._token is not None and self._token != stale_token
+                    and time.time() < self._expires_at - self._refresh_margin):
+                return self._token
+
+            if self._shared is not None and not self._shared.try_lead():
+                token = self._await_leader(stale_token)
+                if token is not None:
+                    return token
+
+            if self._discoverer is None:
+                self._discoverer = capif_circuit_breaker.call(self._onboard_and_discover)
+
+            capif_circuit_breaker.call(self._discoverer.get_tokens)
+            self._token = self._discoverer.token
+            self._expires_at = _token_expiry(self._token, self._default_ttl)
+            log.info("Fetched CAPIF access token valid until %s", time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(self._expires_at)))
+            if self._shared is not None:
+                self._shared.publish(self._token, self._expires_at)
+            self._schedule_refresh()
+            return self._token
+
+    def _adopt_published(self, stale_token: str | None) -> str | None:
+        published = self._shared.read()
+        if published is None:
+            return None
+        token, expires_at = published
+        if token == stale_token or time.time() >= expires_at - self._refresh_margin:
+            return None
+        self._token, self._expires_at = token, expires_at
+        return token
+
+    def _await_leader(self, stale_token: str | None) -> str | None:
+        """Waits for the leader's token, returns None once this worker took over the leadership."""
+        # Called with the lock held, so the other threads of this worker wait here too.
+        deadline = time.monotonic() + self._leader_wait_timeout
+        while time.monotonic() < deadline:
+            token = self._adopt_published(stale_token)
+            if token is not None:
+                return token
+            if self._shared.try_lead():
+                log.warning("CAPIF onboarding leader is gone, worker %s takes over", os.getpid())
+                return None
+            time.sleep(0.1)
+        raise NetworkPlatformError("Timed out waiting for the CAPIF onboarding leader to publish a token")
+
+    def _onboard_and_discover(self):
+        # The SDK pulls in requests, yaml and cryptography; load it only when onboarding.
+        from opencapif_sdk import capif_invoker_connector, service_discoverer
+
+        capif_connector = capif_invoker_connector(config_file=self._config_file)
+        capif_connector.onboard_invoker()
+
+        discoverer_svc = service_discoverer(config_file=self._config_file)
+        discoverer_svc.discover()
+        self._discovered_apis = discoverer_svc.invoker_capif_details.get("registered_security_contexes")
+        log.info("Onboarded CAPIF invoker and discovered %s service APIs", len(self._discovered_apis or []))
+        return discoverer_svc
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+        delay = max(self._expires_at - self._refresh_margin - time.time(), 1.0)
+        if self._shared is not None:
+            # The leader also watches for tokens the other workers marked invalid.
+            delay = 1.0
+        self._refresh_timer = threading.Timer(delay, self._background_refresh, args=(self._token,))
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self, stale_token: str) -> None:
+        try:
+            if self._shared is not None:
+                published = self._shared.read()
+                if (published is not None and published[0] == stale_token
+                        and time.time() < published[1] - self._refresh_margin):
+                    with self._lock:
+                        if self._token == stale_token:
+                            self._schedule_refresh()
+                    return
+            self._refresh(stale_token=stale_token)
+        except Exception as exc: # the request path fetches a token on its own if this fails
+            log.error("Background refresh of the CAPIF access token failed: %s", exc)
+            if self._shared is not None:
+                # The other workers rely on the leader, keep trying.
+                with self._lock:
+                    self._schedule_refresh()
+
+
+credential_manager = CapifCredentialManager(
+    config_file=INVOKER_CONFIG_FILE,
+    refresh_margin=settings.capif_token_refresh_margin,
+    default_ttl=settings.capif_token_default_ttl,
+    shared=SharedTokenFile(settings.shared_state_dir) if settings.workers > 1 else None,
+    leader_wait_timeout=settings.capif_leader_wait_timeout,
+)
 
-    return jwt_token
+def onboard_invoker() -> str:
+    """
+    Returns a JWT access token for the NEF, onboarding the invoker to CAPIF on first use.
 
-    # print("JWT TOKEN: ", jwt_token)
+    The first call initializes the CAPIF invoker connector, onboards the invoker,
+    discovers the available services and retrieves a JWT from the service discoverer.
+    Subsequent calls are served from the process-wide ``credential_manager`` until the
+    token approaches its expiry.
 
-    # _write_to_file(INVOKER_ACCESS_TOKEN_FILE, jwt_token)
+    Raises:
+        Any exceptions raised by the underlying connector.
+    """
+    return credential_manager.get_token()
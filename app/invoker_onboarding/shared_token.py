@@ -0,0 +1,76 @@
+import fcntl
+import json
+import os
+
+from app.utils.logger import get_app_logger
+
+log = get_app_logger(__name__)
+
+
+class SharedTokenFile:
+    """
+    CAPIF access token shared by the worker processes of one host.
+
+    One worker becomes the onboarding leader by holding an exclusive lock on the
+    leader lock file for as long as it lives; only the leader onboards to CAPIF and
+    fetches tokens, which it publishes in the token file. The other workers read the
+    published token. When the leader dies the kernel releases its lock and the next
+    worker needing a token takes over.
+
+    A worker whose token is rejected by the NEF marks it invalid in the token file,
+    which the leader picks up to fetch a new one.
+    """
+
+    def __init__(self, directory: str):
+        self.token_path = os.path.join(directory, "capif_token.json")
+        self.lock_path = os.path.join(directory, "capif_leader.lock")
+        self._lock_fd: int | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None
+
+    def try_lead(self) -> bool:
+        """Takes the onboarding leadership if no live worker holds it."""
+        if self._lock_fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        log.info("Worker %s is the CAPIF onboarding leader", os.getpid())
+        return True
+
+    def release(self) -> None:
+        """Gives up the onboarding leadership."""
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def read(self) -> tuple[str, float] | None:
+        """Returns the published token and its expiry epoch, if any."""
+        try:
+            with open(self.token_path, encoding="utf-8") as token_file:
+                published = json.load(token_file)
+            return published["token"], float(published["expires_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def publish(self, token: str, expires_at: float) -> None:
+        """Atomically replaces the published token."""
+        os.makedirs(os.path.dirname(self.token_path) or ".", exist_ok=True)
+        temporary_path = f"{self.token_path}.{os.getpid()}"
+        with open(temporary_path, "w", encoding="utf-8") as token_file:
+            json.dump({"token": token, "expires_at": expires_at}, token_file)
+        os.chmod(temporary_path, 0o600)
+        os.replace(temporary_path, self.token_path)
+
+    def mark_invalid(self, token: str) -> None:
+        """Publishes the token as expired, unless it has been replaced already."""
+        published = self.read()
+        if published is not None and published[0] == token:
+            self.publish(token, 0.0)
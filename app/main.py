@@ -1,30 +1,83 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from app.routers import location_retrieval
+from app.routers import location_retrieval, location_streaming, monitoring_event_notifications, metrics, health
 
 from app.config import get_settings
 from app.utils.logger import get_app_logger
 from app.dependencies import init_custom_exc_handlers
+from app.utils.network_request_to_core import close_nef_client
+from app.utils.nef_pool import nef_pool
+from app.services.standing_subscriptions import standing_subscriptions
+from app.utils.subscription_reaper import subscription_reaper
+from app.utils.metrics import MetricsMiddleware
+from app.utils.admission_control import AdmissionControlMiddleware
+from app.utils.deadline import RequestDeadlineMiddleware
+from app.utils.warmup import warm_up
 
 settings = get_settings()
 
 logger = get_app_logger(__name__)
-logger.info("Starting CAMARA LOCATION RETRIEVAL API")
-logger.info("Host: %s, Port: %s", settings.host, settings.port)
-logger.info("Log Directory Path: %s", settings.log_directory_path)
-logger.info("Log Filename Path: %s", settings.log_filename_path)
-logger.info("Base URL: %s", settings.base_url)
-logger.info("SCS AS ID: %s", settings.scs_as_id)
-logger.info("Location Type: %s", settings.location_type)
-logger.info("Notification Destination: %s", settings.notification_destination)
 
-app = FastAPI()
+
+def check_worker_notifications() -> None:
+    """
+    Refuses to start current_location retrievals with several workers.
+
+    A NEF notification reaches any one worker, while a current_location retrieval
+    waits for it on the worker that subscribed, so (N-1)/N of them would time out.
+    Streams and standing subscriptions degrade the same way, which is warned about.
+    """
+    if settings.workers <= 1:
+        return
+    if settings.location_type == "current_location":
+        raise RuntimeError(f"LOCATION_TYPE=current_location needs WORKERS=1, not {settings.workers}: "
+                           "retrievals wait for NEF notifications that may reach another worker")
+    logger.warning("WORKERS=%s: location streams%s only get the NEF notifications that reach the worker "
+                   "that subscribed, run a single worker to rely on them", settings.workers,
+                   " and standing subscriptions" if settings.standing_subscriptions_enabled else "")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_worker_notifications()
+    logger.info("Starting CAMARA LOCATION RETRIEVAL API")
+    logger.info("Host: %s, Port: %s", settings.host, settings.port)
+    logger.info("Log Directory Path: %s", settings.log_directory_path)
+    logger.info("Log Filename Path: %s", settings.log_filename_path)
+    for backend in nef_pool.backends:
+        logger.info("NEF backend %s: %s", backend.name, backend.subscriptions_url)
+    if len(nef_pool.backends) > 1:
+        logger.info("NEF routing: %s", nef_pool.routing)
+    logger.info("Location Type: %s", settings.location_type)
+    logger.info("Notification Destination: %s", settings.notification_destination)
+    await subscription_reaper.start()
+    if settings.standing_subscriptions_enabled:
+        standing_subscriptions.start()
+    warm_up.start()
+    yield
+    await warm_up.stop()
+    await standing_subscriptions.stop()
+    await subscription_reaper.stop(settings.subscription_reaper_drain_timeout)
+    await close_nef_client()
+
+app = FastAPI(lifespan=lifespan)
 
 init_custom_exc_handlers(app)
 
 uri_prefix: str = "/location-retrieval/v0.5"
 
 app.include_router(location_retrieval.router, prefix=uri_prefix)
+app.include_router(location_streaming.router, prefix=uri_prefix)
+app.include_router(monitoring_event_notifications.router, prefix="/notifications")
+app.include_router(metrics.router)
+app.include_router(health.router)
+
+# Streams are long-lived and capped by stream_max_streams instead of the retrievals in flight.
+app.add_middleware(AdmissionControlMiddleware, path_prefix=uri_prefix, exclude_paths=(f"{uri_prefix}/stream",))
+app.add_middleware(RequestDeadlineMiddleware, path_prefix=uri_prefix)
+app.add_middleware(MetricsMiddleware)
 
 if __name__ == "__main__":
     import uvicorn
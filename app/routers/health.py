@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Response, status
+
+from app.utils.response_encoding import APPLICATION_JSON, encode_json
+from app.utils.warmup import warm_up
+
+
+router = APIRouter()
+
+_READY_BODY = encode_json({"status": "ready"})
+
+
+@router.get("/ready", include_in_schema=False)
+async def ready() -> Response:
+    """Answers 200 once the warm-up finished, 503 with the completed warm-up steps before."""
+    if warm_up.ready:
+        return Response(content=_READY_BODY, media_type=APPLICATION_JSON)
+    return Response(content=encode_json({"status": "warming_up", "completed_steps": sorted(warm_up.steps)}),
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, media_type=APPLICATION_JSON)
@@ -1,16 +1,28 @@
 import uuid
 from typing import Annotated
-from fastapi import APIRouter, Response, status, Header, Depends
+from fastapi import APIRouter, Request, Response, status, Header, Depends
+from fastapi.responses import StreamingResponse
 from app.schemas.location_retrieval import (
-    RetrievalLocationRequest, XCorrelator, Location,
+    RetrievalLocationRequest, XCorrelator, Location, AreaType,
     BadRequestError, UnauthorizedError, ForbiddenError,
-    NotFound404, UnprocessableEntityError
+    NotFound404, UnprocessableEntityError, TooManyRequestsError, ServiceUnavailableError, GatewayTimeoutError,
+    BatchRetrievalLocationRequest, BatchRetrievalLocationResponse
 )
 from app.services.location_retrieval_tf import retrieve_location_info
+from app.services.location_retrieval_batch import (
+    retrieve_batch_location_info, iter_batch_location_results, validate_batch_size
+)
 from app.utils.logger import get_app_logger
+from app.utils.metrics import instrument_endpoint, endpoint_finished
+from app.utils.admission_control import admission_controller
+from app.utils.response_encoding import location_response, batch_location_response
+from app.config import get_settings
 
 
 log = get_app_logger(__name__)
+settings = get_settings()
+
+_circle_area_clients = frozenset(settings.circle_area_clients)
 
 router = APIRouter()
 
@@ -50,17 +62,53 @@ async def get_xcorrelator(x_correlator: Annotated[XCorrelator | None,
     if x_correlator is None:
         x_correlator = str(uuid.uuid4())
 
-    log.info("The x-correlator header value that going to be used is: %s", x_correlator)
+    log.debug("The x-correlator header value that going to be used is: %s", x_correlator)
 
     return XCorrelator.model_validate(x_correlator)
 
 
+async def get_area_type(request: Request,
+                        x_area_type: Annotated[AreaType | None,
+                                               Header(description="Type of the returned location areas. "
+                                                                  "A CIRCLE is the smallest circle enclosing the network polygon. "
+                                                                  "Defaults to the setting of the client, else POLYGON.")] = None
+                        ) -> AreaType:
+    """
+    Negotiates the area type of the returned locations.
+
+    The ``x-area-type`` header of the request wins, then the setting of the client
+    identified by the ``client_id_header`` header, then POLYGON.
+    """
+    if x_area_type is not None:
+        return x_area_type
+    if request.headers.get(settings.client_id_header) in _circle_area_clients:
+        return AreaType.circle
+    return AreaType.polygon
+
+
 x_correlator_header = {
     "description": "Correlation id for the different services",
     "schema": {"$ref": "#/components/schemas/XCorrelator"},
     "example": "b4333c46-49c0-4f62-80d7-f0ef930f1c46",
 }
 
+retry_after_header = {
+    "description": "Seconds after which the request may be retried",
+    "schema": {"type": "integer"},
+}
+
+too_many_requests_response = {
+    "model": TooManyRequestsError,
+    "description": "Too Many Requests, the client exceeded its request rate",
+    "headers": {"Retry-After": retry_after_header},
+}
+
+service_unavailable_response = {
+    "model": ServiceUnavailableError,
+    "description": "Service Unavailable, the API is overloaded or the NEF is unavailable",
+    "headers": {"Retry-After": retry_after_header},
+}
+
 
 @router.post(
     "/retrieve",
@@ -97,8 +145,79 @@ x_correlator_header = {
             "description": "Unprocessable Entity",
             "headers": {"x-correlator": x_correlator_header},
         },
+        status.HTTP_429_TOO_MANY_REQUESTS: too_many_requests_response,
+        status.HTTP_503_SERVICE_UNAVAILABLE: service_unavailable_response,
+        status.HTTP_504_GATEWAY_TIMEOUT: {
+            "model": GatewayTimeoutError,
+            "description": "Gateway Timeout, the location could not be retrieved before the request deadline",
+            "headers": {"x-correlator": x_correlator_header},
+        },
     },
+    response_model=Location,
     response_model_exclude_unset=True)
-async def retrieve_location(x_correlator: Annotated[XCorrelator, Depends(get_xcorrelator)], sub_req: RetrievalLocationRequest, response: Response) -> Location | None:
-    response.headers["x-correlator"] = x_correlator.root
-    return retrieve_location_info(sub_req)
+@instrument_endpoint
+async def retrieve_location(x_correlator: Annotated[XCorrelator, Depends(get_xcorrelator)],
+                            area_type: Annotated[AreaType, Depends(get_area_type)],
+                            sub_req: RetrievalLocationRequest) -> Response:
+    location = await retrieve_location_info(sub_req, area_type)
+    endpoint_finished()
+    # The location is built from an already validated NEF report, so it is encoded
+    # directly instead of being validated again against the response model.
+    return location_response(location, x_correlator.root)
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+@router.post(
+    "/retrieve/batch",
+    description="Retrieve the areas where several user devices are localized. "
+                f"With an `Accept: {NDJSON_MEDIA_TYPE}` header, each device result is streamed "
+                "as a JSON line as soon as it is ready instead of being returned in order at the end.",
+    tags=["Location retrieval"],
+    responses={
+        status.HTTP_200_OK: {
+            "model": BatchRetrievalLocationResponse,
+            "description": "Per-device location retrieval results",
+            "headers": {"x-correlator": x_correlator_header},
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestError,
+            "description": "Bad Request",
+            "headers": {"x-correlator": x_correlator_header},
+        },
+        status.HTTP_429_TOO_MANY_REQUESTS: too_many_requests_response,
+        status.HTTP_503_SERVICE_UNAVAILABLE: service_unavailable_response,
+    },
+    response_model=BatchRetrievalLocationResponse,
+    response_model_exclude_none=True)
+@instrument_endpoint
+async def retrieve_batch_location(x_correlator: Annotated[XCorrelator, Depends(get_xcorrelator)],
+                                  area_type: Annotated[AreaType, Depends(get_area_type)],
+                                  batch_req: BatchRetrievalLocationRequest,
+                                  request: Request,
+                                  accept: Annotated[str | None, Header(include_in_schema=False)] = None):
+    # Admission took one token for the request, the other devices of a valid batch are charged here.
+    validate_batch_size(batch_req)
+    admission_controller.charge(getattr(request.state, "admission_client", None), len(batch_req.devices) - 1)
+    if accept is not None and NDJSON_MEDIA_TYPE in accept:
+        results = iter_batch_location_results(batch_req, area_type)
+        # Validate the batch before the response starts, so errors keep their status code.
+        first_result = await anext(results, None)
+
+        async def ndjson_lines():
+            result = first_result
+            try:
+                while result is not None:
+                    yield result.model_dump_json(exclude_none=True) + "\n"
+                    result = await anext(results, None)
+            finally:
+                await results.aclose()
+
+        return StreamingResponse(ndjson_lines(), media_type=NDJSON_MEDIA_TYPE,
+                                 headers={"x-correlator": x_correlator.root})
+
+    batch_response = await retrieve_batch_location_info(batch_req, area_type)
+    endpoint_finished()
+    return batch_location_response(batch_response, x_correlator.root)
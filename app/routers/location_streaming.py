@@ -0,0 +1,85 @@
+from typing import Annotated
+from fastapi import APIRouter, status, Depends
+from fastapi.responses import StreamingResponse
+from app.schemas.location_retrieval import (
+    LocationStreamRequest, XCorrelator, Location, AreaType,
+    BadRequestError, UnauthorizedError, ForbiddenError, NotFound404,
+)
+from app.routers.location_retrieval import (
+    get_xcorrelator, get_area_type, x_correlator_header, service_unavailable_response
+)
+from app.services.location_streaming import location_streams
+from app.utils.response_encoding import encode_json
+from app.utils.logger import get_app_logger
+
+
+log = get_app_logger(__name__)
+
+router = APIRouter()
+
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+# A comment line, ignored by EventSource clients but keeping proxies from timing the stream out.
+_HEARTBEAT = b": heartbeat\n\n"
+_END_EVENT = b"event: end\ndata: {}\n\n"
+
+
+def _location_event(location: Location) -> bytes:
+    return b"event: location\ndata: " + encode_json(location.model_dump(mode="json", exclude_unset=True)) + b"\n\n"
+
+
+@router.post(
+    "/stream",
+    description="Stream the area where a certain user device is localized, as the network reports it, "
+                f"as Server-Sent Events (`{EVENT_STREAM_MEDIA_TYPE}`). Each report is sent as a `location` "
+                "event carrying a Location, an `end` event closes the stream after the last report.",
+    tags=["Location retrieval"],
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Stream of location events",
+            "headers": {"x-correlator": x_correlator_header},
+            "content": {EVENT_STREAM_MEDIA_TYPE: {}},
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestError,
+            "description": "Bad Request",
+            "headers": {"x-correlator": x_correlator_header},
+        },
+        status.HTTP_401_UNAUTHORIZED: {
+            "model": UnauthorizedError,
+            "description": "Unauthorized",
+            "headers": {"x-correlator": x_correlator_header},
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "model": ForbiddenError,
+            "description": "Forbidden",
+            "headers": {"x-correlator": x_correlator_header},
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "model": NotFound404,
+            "description": "Not Found",
+            "headers": {"x-correlator": x_correlator_header},
+        },
+        status.HTTP_503_SERVICE_UNAVAILABLE: service_unavailable_response,
+    },
+    response_class=StreamingResponse)
+async def stream_location(x_correlator: Annotated[XCorrelator, Depends(get_xcorrelator)],
+                          area_type: Annotated[AreaType, Depends(get_area_type)],
+                          stream_req: LocationStreamRequest) -> StreamingResponse:
+    locations = location_streams.stream(stream_req, area_type)
+    # Subscribe before the response starts, so errors keep their status code.
+    await anext(locations)
+
+    async def events():
+        try:
+            yield _HEARTBEAT
+            async for location in locations:
+                yield _HEARTBEAT if location is None else _location_event(location)
+            yield _END_EVENT
+        finally:
+            await locations.aclose()
+
+    return StreamingResponse(events(), media_type=EVENT_STREAM_MEDIA_TYPE,
+                             headers={"x-correlator": x_correlator.root,
+                                      "Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Response
+
+from app.utils.metrics import registry, register_callback, PROMETHEUS_CONTENT_TYPE
+from app.utils.circuit_breaker import capif_circuit_breaker, CircuitState
+from app.utils.nef_pool import nef_pool
+from app.utils.location_cache import location_cache
+from app.utils.negative_cache import negative_cache
+from app.utils.cell_geometry_index import cell_geometry_index
+from app.utils.notification_correlator import notification_correlator
+from app.utils.subscription_reaper import subscription_reaper
+from app.services.location_retrieval_tf import nef_report_calls
+from app.services.standing_subscriptions import standing_subscriptions
+from app.services.location_streaming import location_streams
+from app.utils.warmup import warm_up
+from app.utils.admission_control import admission_controller
+from app.utils import deadline
+
+
+router = APIRouter()
+
+_CIRCUIT_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+_circuit_breakers = (*nef_pool.breakers(), capif_circuit_breaker)
+
+def _register_component_metrics() -> None:
+    """Exposes the counters kept by the caches, breakers and background workers."""
+    register_callback("camara_location_cache_lookups_total", "Location cache lookups by result.", "counter",
+                      lambda: {("hit",): location_cache.hits, ("miss",): location_cache.misses}, ("result",))
+    register_callback("camara_location_cache_hit_ratio", "Share of location cache lookups served from the cache.", "gauge",
+                      lambda: {(): location_cache.stats()["hit_ratio"]})
+    register_callback("camara_location_cache_entries", "Locations held by the location cache.", "gauge",
+                      lambda: {(): len(location_cache)})
+    register_callback("camara_location_cache_bytes", "Estimated memory held by the location cache.", "gauge",
+                      lambda: {(): location_cache.current_bytes})
+    register_callback("camara_location_cache_evictions_total", "Locations evicted from the location cache.", "counter",
+                      lambda: {(): location_cache.evictions})
+    register_callback("camara_location_negative_cache_hits_total", "Retrievals answered from the negative cache by failure cause.", "counter",
+                      lambda: {(cause,): count for cause, count in negative_cache.hits.items()}, ("cause",))
+    register_callback("camara_location_negative_cache_misses_total", "Negative cache lookups of devices not known to fail.", "counter",
+                      lambda: {(): negative_cache.misses})
+    register_callback("camara_location_negative_cache_stores_total", "Device failures stored in the negative cache by failure cause.", "counter",
+                      lambda: {(cause,): count for cause, count in negative_cache.stores.items()}, ("cause",))
+    register_callback("camara_location_negative_cache_entries", "Devices held by the negative cache.", "gauge",
+                      lambda: {(): len(negative_cache)})
+    register_callback("camara_location_negative_cache_evictions_total", "Devices evicted from the negative cache.", "counter",
+                      lambda: {(): negative_cache.evictions})
+    register_callback("camara_location_cell_index_lookups_total", "Cell geometry index lookups by result.", "counter",
+                      lambda: {("hit",): cell_geometry_index.hits, ("miss",): cell_geometry_index.misses}, ("result",))
+    register_callback("camara_location_nef_calls_total", "NEF report retrievals executed or coalesced into one in flight.", "counter",
+                      lambda: {("executed",): nef_report_calls.executed, ("coalesced",): nef_report_calls.coalesced}, ("result",))
+    register_callback("camara_location_nef_backend_requests_total", "NEF calls by backend and outcome.", "counter",
+                      lambda: {(backend.name, outcome): count for backend in nef_pool.backends
+                               for outcome, count in backend.requests.items()}, ("backend", "outcome"))
+    register_callback("camara_location_nef_backend_outstanding", "NEF calls in flight by backend.", "gauge",
+                      lambda: {(backend.name,): backend.outstanding for backend in nef_pool.backends}, ("backend",))
+    register_callback("camara_location_nef_backend_latency_seconds", "Decayed average NEF call latency the routing weighs backends by.", "gauge",
+                      lambda: {(backend.name,): backend.latency() for backend in nef_pool.backends}, ("backend",))
+    register_callback("camara_location_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open).", "gauge",
+                      lambda: {(breaker.name,): _CIRCUIT_STATE_VALUES[breaker.state] for breaker in _circuit_breakers}, ("dependency",))
+    register_callback("camara_location_circuit_transitions_total", "Circuit breaker state transitions.", "counter",
+                      lambda: {(breaker.name, state): count for breaker in _circuit_breakers
+                               for state, count in breaker.transitions.items()}, ("dependency", "state"))
+    register_callback("camara_location_circuit_rejected_total", "Calls rejected by an open circuit.", "counter",
+                      lambda: {(breaker.name,): breaker.rejected for breaker in _circuit_breakers}, ("dependency",))
+    register_callback("camara_location_notifications_total", "NEF notifications by correlation result.", "counter",
+                      lambda: {("matched",): notification_correlator.matched, ("unmatched",): notification_correlator.unmatched,
+                               ("timeout",): notification_correlator.timeouts}, ("result",))
+    register_callback("camara_location_notification_waiters", "Retrievals waiting for a notified location.", "gauge",
+                      lambda: {(): notification_correlator.pending()})
+    register_callback("camara_location_subscription_deletes_total", "NEF subscription deletes by result.", "counter",
+                      lambda: {("deleted",): subscription_reaper.deleted, ("failed",): subscription_reaper.failed}, ("result",))
+    register_callback("camara_location_subscriptions_pending_delete", "Released NEF subscriptions not deleted yet.", "gauge",
+                      lambda: {(): subscription_reaper.outstanding()})
+    register_callback("camara_location_standing_subscriptions", "Standing subscriptions of hot devices.", "gauge",
+                      lambda: {(): standing_subscriptions.active()})
+    register_callback("camara_location_streams", "Open location streams.", "gauge",
+                      lambda: {(): location_streams.active()})
+    register_callback("camara_location_stream_locations_total", "Streamed locations by result, dropped ones were overtaken before a slow client read them.", "counter",
+                      lambda: {("sent",): location_streams.delivered, ("dropped",): location_streams.dropped}, ("result",))
+    register_callback("camara_location_admission_rejected_total", "Retrievals shed by admission control by reason.", "counter",
+                      lambda: {(reason,): count for reason, count in admission_controller.rejected.items()}, ("reason",))
+    register_callback("camara_location_admission_in_flight", "Admitted retrievals in flight.", "gauge",
+                      lambda: {(): admission_controller.in_flight})
+    register_callback("camara_location_admission_limit", "Retrievals allowed in flight at the measured NEF throughput.", "gauge",
+                      lambda: {(): admission_controller.limit()})
+    register_callback("camara_location_deadline_exceeded_total", "Retrievals whose deadline ran out, by the stage it ran out in.", "counter",
+                      lambda: {(stage,): count for stage, count in deadline.exceeded_stages.items()}, ("stage",))
+    register_callback("camara_location_requests_abandoned_total", "Retrievals cancelled because the client disconnected.", "counter",
+                      lambda: {(): deadline.abandoned_requests})
+    register_callback("camara_location_nef_calls_cancelled_total", "Shared NEF retrievals cancelled because no request waited for them anymore.", "counter",
+                      lambda: {(): nef_report_calls.cancelled})
+    register_callback("camara_location_ready", "Whether the startup warm-up finished (1) or not (0).", "gauge",
+                      lambda: {(): int(warm_up.ready)})
+    register_callback("camara_location_warmup_step_seconds", "Duration of the completed startup warm-up steps.", "gauge",
+                      lambda: {(name,): seconds for name, seconds in warm_up.steps.items()}, ("step",))
+
+_register_component_metrics()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from app.schemas.monitoring_event import MonitoringNotification
+from app.services.monitoring_event_notifications import handle_monitoring_notification
+from app.utils.notification_auth import TOKEN_PARAMETER, is_authentic
+from app.utils.errors.exception_error_handlers import camara_error_response, FORBIDDEN_ERROR
+from app.utils.logger import get_app_logger
+
+
+log = get_app_logger(__name__)
+
+router = APIRouter()
+
+
+@router.post(
+    "/monitoring-event",
+    description="Receive Monitoring Event notifications sent by the NEF.",
+    tags=["NEF notifications"],
+    status_code=status.HTTP_204_NO_CONTENT,
+    include_in_schema=False)
+async def receive_monitoring_notification(request: Request) -> Response:
+    # The endpoint is reachable without authentication, only the NEF knows the token of notificationDestination.
+    if not is_authentic(request.query_params.get(TOKEN_PARAMETER)):
+        log.warning("Rejecting a notification without the notification token from %s",
+                    request.client.host if request.client else "unknown")
+        return camara_error_response(FORBIDDEN_ERROR)
+    # Validate the raw body in one pass instead of FastAPI's JSON decode + model validation.
+    body = await request.body()
+    try:
+        notification = MonitoringNotification.model_validate_json(body)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+
+    handle_monitoring_notification(notification)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -182,6 +182,51 @@ class ErrorInfo(BaseModel):
     message: str = Field(..., description="Detailed error description.")
 
 
+class ServiceUnavailableError(ErrorInfo):
+    status: Literal[503]
+    code: Literal["UNAVAILABLE"]
+    message: Literal["Service Unavailable."]
+
+
+class BatchRetrievalLocationRequest(BaseModel):
+    """
+    Request to retrieve the location of several devices, sharing the same maxAge and maxSurface.
+    """
+    devices: Annotated[list[Device], Field(
+        ..., min_length=1, description="End-user devices whose location is retrieved.")]
+    maxAge: Annotated[int | None, Field(
+        None, description="Maximum age of the location information which is accepted for the location retrieval (in seconds).")]
+    maxSurface: Annotated[int | None, Field(
+        None, description="Maximum surface in square meters which is accepted by the client for the location retrieval.", ge=1, examples=[1000000])]
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class LocationStreamRequest(BaseModel):
+    """
+    Request to stream the location of a device as the network reports it.
+    """
+    device: Annotated[Device, Field(..., description="End-user device whose location is streamed.")]
+    repPeriod: Annotated[int | None, Field(
+        None, ge=1, description="Seconds between two location reports, defaults to the setting of the API.")]
+    maximumNumberOfReports: Annotated[int | None, Field(
+        None, ge=1, description="Location reports after which the stream ends, defaults to the setting of the API.")]
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class BatchRetrievalLocationResult(BaseModel):
+    index: Annotated[int, Field(description="Position of the device in the request devices list.")]
+    device: Annotated[Device, Field(description="Device the result refers to.")]
+    location: Annotated[Location | None, Field(None, description="Location of the device, if it was retrieved.")]
+    error: Annotated[ErrorInfo | None, Field(None, description="Error preventing the location retrieval of the device.")]
+
+
+class BatchRetrievalLocationResponse(BaseModel):
+    results: Annotated[list[BatchRetrievalLocationResult], Field(
+        description="Per-device results, in the order of the request devices list.")]
+
+
 class BadRequestError(ErrorInfo):
     status: Literal[400]
     code: Literal["INVALID_ARGUMENT"]
@@ -206,6 +251,18 @@ class NotFound404(ErrorInfo):
     message: Literal["Device identifier not found."]
 
 
+class TooManyRequestsError(ErrorInfo):
+    status: Literal[429]
+    code: Literal["TOO_MANY_REQUESTS"]
+    message: Literal["Rate limit reached."]
+
+
+class GatewayTimeoutError(ErrorInfo):
+    status: Literal[504]
+    code: Literal["TIMEOUT"]
+    message: Literal["Request timeout exceeded."]
+
+
 class UnprocessableEntityError(ErrorInfo):
     status: Literal[422]
     code: Literal[
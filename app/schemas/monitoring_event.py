@@ -2,7 +2,7 @@ from typing import Optional, List
 from enum import Enum
 from datetime import datetime
 
-from pydantic import BaseModel, Field, IPvAnyAddress, AnyHttpUrl
+from pydantic import BaseModel, Field, IPvAnyAddress, AnyHttpUrl, AliasChoices
 
 #{apiRoot}/3gpp-monitoring-event/v1
 #Applicability location notification NEF northbound API feature, e.g. Location Reporting Monitor Type
@@ -36,7 +36,7 @@ class GeographicalCoordinates(BaseModel):
     lat: float = Field(..., description="Latitude coordinate.")
 
 class PointList(BaseModel):
-    geographical_coords: list[GeographicalCoordinates] = Field(..., description="List of geographical coordinates defining the points.",min_length=3,max_length=15)
+    geographical_coords: list[GeographicalCoordinates] = Field(..., description="List of geographical coordinates defining the points.",min_length=3)
 
 class Polygon(BaseModel):
     point_list: PointList = Field(..., description="List of points defining the polygon.")
@@ -73,6 +73,10 @@ class MonitoringEventReport(BaseModel):
     monitoringType: MonitoringType = Field(..., description="Identifies the type of monitoring as defined in clause 5.3.2.4.3.")
     eventTime: Optional[datetime] = Field(None, description="Identifies when the event is detected or received. Shall be included for each group of UEs.")
 
+# One-time report answered to a subscription request, along with the link of the subscription resource if the NEF created one.
+class MonitoringEventReportResponse(MonitoringEventReport):
+    self_link: Optional[str] = Field(None, validation_alias=AliasChoices("self", "self_link"), description="Link to the created subscription resource.")
+
 class MonitoringEventSubscriptionRequest(BaseModel):
     accuracy: Optional[Accuracy] = Field(None,description="Accuracy represents a desired granularity of accuracy of the requested location information.")
     externalId: Optional[str] = Field(None, description="Identifies a user clause 4.6.2 TS 23.682 (optional)")
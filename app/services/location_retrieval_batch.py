@@ -0,0 +1,113 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+from fastapi.exceptions import RequestValidationError
+
+from app.schemas.location_retrieval import (
+    AreaType,
+    BatchRetrievalLocationRequest,
+    BatchRetrievalLocationResponse,
+    BatchRetrievalLocationResult,
+    Device,
+    RetrievalLocationRequest
+)
+from app.services.location_retrieval_tf import retrieve_location_info
+from app.utils.admission_control import admission_controller
+from app.utils.errors.exception_error_handlers import error_info_from_exception
+from app.utils.logger import get_app_logger
+from app.config import get_settings
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+def validate_batch_size(batch_request: BatchRetrievalLocationRequest) -> None:
+    if len(batch_request.devices) > settings.batch_max_devices:
+        raise RequestValidationError([{
+            "type": "too_long",
+            "loc": ("body", "devices"),
+            "msg": f"List should have at most {settings.batch_max_devices} items",
+            "input": len(batch_request.devices),
+        }])
+
+async def _retrieve_device_location(
+    index: int, device: Device, batch_request: BatchRetrievalLocationRequest, area_type: AreaType
+) -> BatchRetrievalLocationResult:
+    retrieve_location_request = RetrievalLocationRequest(
+        device=device, maxAge=batch_request.maxAge, maxSurface=batch_request.maxSurface
+    )
+    try:
+        location = await retrieve_location_info(retrieve_location_request, area_type)
+    except Exception as exc:
+        log.error("Location retrieval of batch device %s failed: %s", index, exc)
+        return BatchRetrievalLocationResult(index=index, device=device, error=error_info_from_exception(exc))
+    return BatchRetrievalLocationResult(index=index, device=device, location=location)
+
+async def iter_batch_location_results(
+    batch_request: BatchRetrievalLocationRequest,
+    area_type: AreaType = AreaType.polygon
+) -> AsyncIterator[BatchRetrievalLocationResult]:
+    """
+    Retrieves the location of every device of the batch, yielding each result as soon as it is ready.
+
+    At most ``batch_max_concurrency`` retrievals run at a time and at most as many
+    finished results are buffered, so memory stays bounded by the concurrency and not
+    by the batch size. Results are yielded in completion order, their ``index`` refers
+    to the position of the device in the request.
+
+    Every retrieval counts towards the admission in-flight cap: the first worker runs
+    on the slot the batch request was admitted with, the others take a slot of their
+    own per device and wait while the cap leaves none, so a batch slows down under
+    load instead of exceeding the cap. A worker still waiting at the deadline of the
+    request stops, the first one answers the remaining devices.
+
+    args:
+        batch_request: CAMARA devices sharing maxAge and maxSurface.
+        area_type: type of the returned areas.
+
+    yields:
+        per-device results carrying either the location or the CAMARA error.
+    """
+    validate_batch_size(batch_request)
+    devices = batch_request.devices
+    concurrency = min(settings.batch_max_concurrency, len(devices))
+    pending = iter(enumerate(devices))
+    finished: asyncio.Queue[BatchRetrievalLocationResult] = asyncio.Queue(maxsize=concurrency)
+
+    async def worker(on_request_slot: bool) -> None:
+        while True:
+            if not on_request_slot and not await admission_controller.acquire():
+                return
+            try:
+                item = next(pending, None)
+                if item is None:
+                    return
+                index, device = item
+                result = await _retrieve_device_location(index, device, batch_request, area_type)
+            finally:
+                if not on_request_slot:
+                    admission_controller.release()
+            await finished.put(result)
+
+    workers = [asyncio.create_task(worker(on_request_slot=number == 0)) for number in range(concurrency)]
+    try:
+        for _ in range(len(devices)):
+            yield await finished.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+async def retrieve_batch_location_info(
+    batch_request: BatchRetrievalLocationRequest,
+    area_type: AreaType = AreaType.polygon
+) -> BatchRetrievalLocationResponse:
+    """
+    Retrieves the location of every device of the batch.
+
+    returns:
+        per-device results in the order of the request devices list.
+    """
+    results: list[BatchRetrievalLocationResult | None] = [None] * len(batch_request.devices)
+    async for result in iter_batch_location_results(batch_request, area_type):
+        results[result.index] = result
+    return BatchRetrievalLocationResponse(results=results)
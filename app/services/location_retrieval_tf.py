@@ -1,14 +1,23 @@
 from app.schemas.location_retrieval import (
     RetrievalLocationRequest,
+    AreaType,
     Location)
 
+import asyncio
+
+from pydantic import ValidationError
+
 from app.schemas.monitoring_event import (
-    MonitoringEventReport
+    MonitoringEventReport,
+    MonitoringEventReportResponse
 )
 
 from app.utils.logger import get_app_logger
 from app.utils.network_request_to_core import (
-    monitoring_event_post_request
+    NefResponse,
+    monitoring_event_post_request,
+    resolve_subscription_link,
+    subscription_self_link
 )
 
 from app.utils.tf_to_3gpp_subscription import (
@@ -16,51 +25,212 @@ from app.utils.tf_to_3gpp_subscription import (
 )
 
 from app.utils.tf_helper_for_camara_loc import (
-    build_camara_last_location_time,
-    build_camara_area
+    build_camara_location,
+    build_camara_circle_location
 )
+from app.utils.device_identity import device_key
+from app.utils.location_cache import location_cache, location_age_seconds
+from app.utils.negative_cache import negative_cache
+from app.utils.single_flight import SingleFlight
+from app.utils.notification_correlator import notification_correlator
+from app.services.standing_subscriptions import standing_subscriptions
+from app.utils.subscription_reaper import subscription_reaper
+from app.utils.metrics import stage_timer
+from app.utils.deadline import bounded_timeout, check_deadline, deadline_exceeded, expired, remaining
 from app.config import get_settings
-from app.utils.errors.exception_errors import LocationInfoNotFoundException
+from app.utils.errors.exception_errors import LocationInfoNotFoundException, LocationFailureException, NO_LOCATION_INFO, LocationMaxAgeNotFulfilledException, LocationMaxSurfaceNotFulfilledException
 
 log = get_app_logger(__name__)
 settings = get_settings()
 
-def retrieve_location_info(
-    retrieve_location_request: RetrievalLocationRequest
+# Concurrent retrievals of the same device share one NEF subscription request.
+nef_report_calls = SingleFlight("NEF monitoring event")
+
+async def retrieve_location_info(
+    retrieve_location_request: RetrievalLocationRequest,
+    area_type: AreaType = AreaType.polygon
 ) -> Location:
     """
-    Creates a Monitoring Event subscription based on CAMARA Location API input.
+    Retrieves the location of a device, from the location cache when it is fresh enough
+    for the request's maxAge or else through a Monitoring Event subscription in the NEF.
+    A device the NEF recently could not locate is answered its failure from the
+    negative cache instead.
 
     args:
         retrieve_location_request: Dictionary containing location retrieval details conforming to
                                     the CAMARA Location API parameters.
+        area_type: type of the returned area, the NEF polygon or its smallest enclosing circle.
 
     returns:
-        dictionary containing the created subscription details, including its ID.
+        CAMARA Location of the device.
+
+    raises:
+        LocationFailureException: if the NEF could not locate the device, now or recently.
+        LocationMaxAgeNotFulfilledException: if the NEF location is older than maxAge.
+        LocationMaxSurfaceNotFulfilledException: if the location area is larger than maxSurface.
     """
-    subscription = build_monitoring_event_subscription(
-        retrieve_location_request
-    )
-    
-    response = monitoring_event_post_request(
-        settings.base_url, settings.scs_as_id, subscription
-    )
+    max_age = retrieve_location_request.maxAge
+    max_surface = retrieve_location_request.maxSurface
+    device_id = None
+    if retrieve_location_request.device is not None:
+        device_id = device_key(retrieve_location_request.device)
+        if settings.standing_subscriptions_enabled:
+            standing_subscriptions.record_request(device_id, retrieve_location_request)
+
+    if settings.location_cache_enabled and device_id is not None:
+        cached_location = location_cache.get(device_id, max_age)
+        if cached_location is not None:
+            log.debug("Serving location of %s from cache", device_id)
+            return _fit_location(cached_location, area_type, max_surface)
+
+    if settings.negative_cache_enabled and device_id is not None:
+        failure_cause = negative_cache.get(device_id)
+        if failure_cause is not None:
+            raise LocationFailureException(failure_cause, f"Device {device_id} recently could not be located: {failure_cause}")
+
+    try:
+        camara_location = await _retrieve_location_from_nef(retrieve_location_request, device_id)
+    except LocationFailureException as exc:
+        if settings.negative_cache_enabled and device_id is not None:
+            negative_cache.put(device_id, exc.cause)
+        raise
+
+    if settings.location_cache_enabled and device_id is not None:
+        location_cache.put(device_id, camara_location)
+
+    if max_age is not None and location_age_seconds(camara_location) > max_age:
+        raise LocationMaxAgeNotFulfilledException(
+            f"Location is older than the requested maxAge of {max_age} seconds"
+        )
+
+    return _fit_location(camara_location, area_type, max_surface)
+
+def _fit_location(location: Location, area_type: AreaType, max_surface: int | None) -> Location:
+    """Converts a polygon location to the requested area type and checks its maxSurface."""
+    if area_type == AreaType.circle:
+        with stage_timer("area_mapping"):
+            location = build_camara_circle_location(location)
+    if max_surface is None:
+        return location
+    from app.utils.geometry import area_surface # numpy is loaded on first use
+
+    surface = area_surface(location.area)
+    if surface > max_surface:
+        raise LocationMaxSurfaceNotFulfilledException(
+            f"Location area of {surface:.0f} m2 exceeds the requested maxSurface of {max_surface} m2"
+        )
+    return location
+
+async def _retrieve_location_from_nef(
+    retrieve_location_request: RetrievalLocationRequest, device_id: str | None
+) -> Location:
+    """
+    Retrieves the Monitoring Event report of the device, sharing the NEF call with
+    concurrent requests for the same device, and maps it to a CAMARA Location.
+    """
+    if device_id is None:
+        monitoring_event_report = await _fetch_monitoring_event_report(retrieve_location_request, device_id)
+    else:
+        monitoring_event_report = await nef_report_calls.do(
+            device_id, lambda: _fetch_monitoring_event_report(retrieve_location_request, device_id)
+        )
 
-    monitoring_event_report = MonitoringEventReport(**response)
     if monitoring_event_report.locationInfo is None:
+        failure_cause = monitoring_event_report.locFailureCause
+        if failure_cause is not None:
+            raise LocationFailureException(
+                failure_cause.value, f"Location positioning failed: {failure_cause.value}"
+            )
         log.error(
             "Failed to retrieve location information from monitoring event report"
         )
-        raise LocationInfoNotFoundException(
-            "Location information not found in monitoring event report"
+        raise LocationFailureException(
+            NO_LOCATION_INFO, "Location information not found in monitoring event report"
         )
     
-    area = build_camara_area(monitoring_event_report)
-    last_location_time = build_camara_last_location_time(monitoring_event_report)
+    with stage_timer("area_mapping"):
+        return build_camara_location(monitoring_event_report)
+
+async def _fetch_monitoring_event_report(
+    retrieve_location_request: RetrievalLocationRequest, device_id: str | None
+) -> MonitoringEventReport:
+    """
+    Creates a one-shot Monitoring Event subscription based on CAMARA Location API input,
+    on the NEF backend picked for the device, and returns its report. The subscription
+    is released to the reaper once the report is consumed, or once the POST completes
+    if the retrieval was abandoned meanwhile.
+    """
+    with stage_timer("build_subscription"):
+        subscription = build_monitoring_event_subscription(
+            retrieve_location_request
+        )
+    
+    check_deadline("nef_post")
+    post = asyncio.ensure_future(monitoring_event_post_request(subscription, routing_key=device_id))
+    try:
+        response = await asyncio.wait_for(asyncio.shield(post), remaining())
+    except (asyncio.CancelledError, TimeoutError) as exc:
+        # The NEF may create the subscription anyway, let the POST finish so it is released.
+        post.add_done_callback(_release_abandoned_subscription)
+        if isinstance(exc, TimeoutError):
+            raise deadline_exceeded("nef_post") from exc
+        raise
+
+    if settings.location_type == "current_location":
+        subscription_link = subscription_self_link(response)
+        try:
+            return await _await_current_location_report(response, subscription_link)
+        finally:
+            _release_subscription(subscription_link)
+
+    # The report is validated straight from the NEF bytes, without decoding them to a dict first.
+    try:
+        with stage_timer("report_parsing"):
+            monitoring_event_report = MonitoringEventReportResponse.model_validate_json(response.content)
+    except ValidationError:
+        _release_subscription(response.location)
+        raise
+    _release_subscription(resolve_subscription_link(response, monitoring_event_report.self_link) or response.location)
+    return monitoring_event_report
 
-    camara_location = Location(
-        area=area, lastLocationTime=last_location_time
-    )
+def _release_subscription(subscription_link: str | None) -> None:
+    if subscription_link is not None and settings.subscription_cleanup_enabled:
+        subscription_reaper.release(subscription_link)
 
-    return camara_location
+def _release_abandoned_subscription(post: asyncio.Future) -> None:
+    if post.cancelled() or post.exception() is not None:
+        return
+    _release_subscription(subscription_self_link(post.result()))
 
+async def _await_current_location_report(
+    response: NefResponse, subscription_link: str | None
+) -> MonitoringEventReport:
+    """
+    Returns the first usable report of a CURRENT_LOCATION subscription.
+
+    The NEF may embed a report in the subscription response, otherwise the report is
+    awaited from the notifications sent for the subscription's self link.
+    """
+    embedded_report = (response.body or {}).get("monitoringEventReport")
+    if embedded_report is not None:
+        monitoring_event_report = MonitoringEventReport.model_validate(embedded_report)
+        if monitoring_event_report.locationInfo is not None or monitoring_event_report.locFailureCause is not None:
+            return monitoring_event_report
+
+    if subscription_link is None:
+        raise LocationInfoNotFoundException(
+            "Subscription response carries no link to correlate notifications with"
+        )
+
+    check_deadline("notification_wait")
+    try:
+        return await notification_correlator.wait_for_report(
+            subscription_link, bounded_timeout(settings.notification_wait_timeout)
+        )
+    except TimeoutError as exc:
+        if expired():
+            raise deadline_exceeded("notification_wait") from exc
+        log.error("No location notified for subscription %s in time", subscription_link)
+        raise LocationInfoNotFoundException(
+            "No location notified before the deadline"
+        ) from exc
\ No newline at end of file
@@ -0,0 +1,219 @@
+import asyncio
+import math
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from app.schemas.location_retrieval import AreaType, Location, LocationStreamRequest, RetrievalLocationRequest
+from app.schemas.monitoring_event import DurationSec, LocationType, MonitoringEventReport
+from app.utils.network_request_to_core import monitoring_event_post_request, subscription_self_link
+from app.utils.notification_correlator import notification_correlator, subscription_key
+from app.utils.subscription_reaper import subscription_reaper
+from app.utils.tf_to_3gpp_subscription import build_monitoring_event_subscription
+from app.utils.tf_helper_for_camara_loc import build_camara_circle_location, build_camara_location
+from app.utils.device_identity import device_key
+from app.utils.logger import get_app_logger
+from app.utils.errors.exception_errors import LocationInfoNotFoundException, OverloadedException
+from app.config import get_settings
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+# Queued after the last location of a stream.
+_END = object()
+
+# Seconds a stream stays open past the expiry of its subscription, for a last notification still in flight.
+EXPIRY_GRACE = 5.0
+
+
+@dataclass(slots=True, eq=False)
+class LocationStream:
+    device_id: str
+    link: str
+    area_type: AreaType
+    reports_left: int
+    # time.monotonic() at which the subscription expires on the NEF and no more reports can come.
+    expires_at: float
+    queue: asyncio.Queue = field(repr=False)
+
+
+class LocationStreams:
+    """
+    Long-lived location streams, one NEF LOCATION_REPORTING subscription each.
+
+    Opening a stream creates a CURRENT_LOCATION subscription reporting every
+    ``repPeriod`` seconds up to ``maximumNumberOfReports`` times; the location of
+    each notified report is queued for the client of the stream. The queue holds
+    ``queue_size`` locations: a client reading slower than the NEF reports skips the
+    oldest ones, as only the latest location of a device matters. A stream without
+    a report for ``heartbeat_interval`` seconds yields a heartbeat to keep the
+    connection open through proxies.
+
+    The stream ends after the last report, when the NEF cancels the subscription or
+    at the latest once the subscription expired, so a lost last notification or
+    reports delivered to another worker do not keep it open. Its subscription is
+    released to the reaper once the stream is closed, also when the client
+    disconnects before.
+    """
+
+    def __init__(self, max_streams: int, queue_size: int, heartbeat_interval: float):
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self._streams: dict[str, LocationStream] = {}
+        self._opening = 0
+        self.opened = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def active(self) -> int:
+        return len(self._streams)
+
+    async def stream(self, stream_request: LocationStreamRequest,
+                     area_type: AreaType = AreaType.polygon) -> AsyncIterator[Location | None]:
+        """
+        Subscribes to the location reports of the device and yields their locations.
+
+        None is yielded once subscribed and then as heartbeat, whenever no report
+        arrived for ``heartbeat_interval`` seconds.
+        """
+        stream = await self._open(stream_request, area_type)
+        try:
+            yield None
+            while True:
+                expires_in = stream.expires_at - time.monotonic()
+                if expires_in <= 0:
+                    log.info("Location stream of %s expired with %s reports left", stream.device_id, stream.reports_left)
+                    return
+                try:
+                    location = await asyncio.wait_for(stream.queue.get(), min(self.heartbeat_interval, expires_in))
+                except TimeoutError:
+                    if time.monotonic() < stream.expires_at:
+                        yield None
+                    continue
+                if location is _END:
+                    return
+                self.delivered += 1
+                yield location
+        finally:
+            self._close(stream)
+
+    def dispatch(self, subscription_link: str, reports: list[MonitoringEventReport] | None,
+                 cancel_ind: bool | None) -> bool:
+        """
+        Queues the notified locations for the stream of the subscription.
+
+        returns:
+            True if the subscription belongs to a stream.
+        """
+        stream = self._streams.get(subscription_key(subscription_link))
+        if stream is None:
+            return False
+        for report in reports or []:
+            if stream.reports_left > 0:
+                self._push_report(stream, report)
+        if cancel_ind or stream.reports_left <= 0:
+            self._push(stream, _END)
+        return True
+
+    async def _open(self, stream_request: LocationStreamRequest, area_type: AreaType) -> LocationStream:
+        if len(self._streams) + self._opening >= self.max_streams:
+            raise OverloadedException(max(math.ceil(self.heartbeat_interval), 1))
+        self._opening += 1
+        try:
+            rep_period = stream_request.repPeriod or settings.stream_rep_period
+            max_reports = stream_request.maximumNumberOfReports or settings.stream_max_reports
+            device_id = device_key(stream_request.device)
+            payload = build_monitoring_event_subscription(RetrievalLocationRequest(device=stream_request.device))
+            payload.locationType = LocationType.CURRENT_LOCATION
+            payload.repPeriod = DurationSec(duration=rep_period)
+            payload.maximumNumberOfReports = max_reports
+            expire_time = datetime.now(timezone.utc) + timedelta(seconds=rep_period * (max_reports + 1))
+            payload.monitorExpireTime = expire_time
+
+            post = asyncio.ensure_future(monitoring_event_post_request(payload, routing_key=device_id))
+            try:
+                response = await asyncio.shield(post)
+            except asyncio.CancelledError:
+                # The NEF may create the subscription anyway, let the POST finish so it is released.
+                post.add_done_callback(_release_abandoned_subscription)
+                raise
+            link = subscription_self_link(response)
+            if link is None:
+                raise LocationInfoNotFoundException("Subscription response carries no link to stream notifications from")
+        finally:
+            self._opening -= 1
+
+        expire_time = min(expire_time, _granted_expire_time(response) or expire_time)
+        expires_at = time.monotonic() + (expire_time - datetime.now(timezone.utc)).total_seconds() + EXPIRY_GRACE
+        stream = LocationStream(device_id=device_id, link=link, area_type=area_type, reports_left=max_reports,
+                                expires_at=expires_at, queue=asyncio.Queue(self.queue_size + 1))
+        self._streams[subscription_key(link)] = stream
+        self.opened += 1
+        log.info("Opened location stream of %s on subscription %s", device_id, link)
+
+        embedded_report = (response.body or {}).get("monitoringEventReport")
+        if embedded_report is not None:
+            self._push_report(stream, MonitoringEventReport.model_validate(embedded_report))
+        early_report = notification_correlator.take_unclaimed(link)
+        if early_report is not None:
+            self._push_report(stream, early_report)
+        return stream
+
+    def _close(self, stream: LocationStream) -> None:
+        if self._streams.pop(subscription_key(stream.link), None) is not None:
+            log.info("Closed location stream of %s", stream.device_id)
+            _release_subscription(stream.link)
+
+    def _push_report(self, stream: LocationStream, report: MonitoringEventReport) -> None:
+        if report.locationInfo is None:
+            return
+        try:
+            location = build_camara_location(report)
+            if stream.area_type == AreaType.circle:
+                location = build_camara_circle_location(location)
+        except (LocationInfoNotFoundException, ValueError) as exc:
+            log.debug("Skipping streamed report of %s without a usable area: %s", stream.device_id, exc)
+            return
+        stream.reports_left -= 1
+        self._push(stream, location)
+
+    def _push(self, stream: LocationStream, item) -> None:
+        # One slot is kept for the end of the stream, a full queue drops its oldest location.
+        while stream.queue.qsize() >= (self.queue_size + 1 if item is _END else self.queue_size):
+            if stream.queue.get_nowait() is _END:
+                stream.queue.put_nowait(_END)
+                return
+            self.dropped += 1
+        stream.queue.put_nowait(item)
+
+
+def _granted_expire_time(response) -> datetime | None:
+    """The monitorExpireTime the NEF granted, which may be earlier than the requested one."""
+    granted = (response.body or {}).get("monitorExpireTime")
+    if not isinstance(granted, str):
+        return None
+    try:
+        expire_time = datetime.fromisoformat(granted)
+    except ValueError:
+        return None
+    return expire_time if expire_time.tzinfo is not None else expire_time.replace(tzinfo=timezone.utc)
+
+
+def _release_subscription(subscription_link: str | None) -> None:
+    if subscription_link is not None and settings.subscription_cleanup_enabled:
+        subscription_reaper.release(subscription_link)
+
+
+def _release_abandoned_subscription(post: asyncio.Future) -> None:
+    if post.cancelled() or post.exception() is not None:
+        return
+    _release_subscription(subscription_self_link(post.result()))
+
+
+location_streams = LocationStreams(
+    max_streams=settings.stream_max_streams,
+    queue_size=settings.stream_queue_size,
+    heartbeat_interval=settings.stream_heartbeat_interval,
+)
@@ -0,0 +1,68 @@
+from app.schemas.monitoring_event import MonitoringNotification, MonitoringEventReport
+from app.utils.device_identity import report_device_key
+from app.utils.location_cache import location_cache
+from app.utils.negative_cache import negative_cache
+from app.utils.notification_correlator import notification_correlator
+from app.services.standing_subscriptions import standing_subscriptions
+from app.services.location_streaming import location_streams
+from app.utils.tf_helper_for_camara_loc import build_camara_location
+from app.utils.logger import get_app_logger
+from app.utils.errors.exception_errors import LocationInfoNotFoundException
+from app.config import get_settings
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+def _store_reported_locations(device_id: str | None, reports: list[MonitoringEventReport] | None) -> int:
+    """
+    Stores the locations of the reports in the location cache. The reports belong to
+    `device_id` if known from the subscription, else to the UE they name, as msisdn
+    and externalId are optional.
+
+    Failure causes are only stored in the negative cache for a `device_id` known from
+    the subscription: a failure named by the report alone would deny a device on the
+    word of a single notification. The failures of retrievals are stored from their
+    own outcome.
+    """
+    stored = 0
+    for report in reports or []:
+        cache_key = device_id or report_device_key(report.msisdn, report.externalId)
+        if cache_key is None:
+            continue
+        if report.locationInfo is None:
+            if report.locFailureCause is not None and settings.negative_cache_enabled and device_id is not None:
+                negative_cache.put(cache_key, report.locFailureCause.value)
+            continue
+        try:
+            location = build_camara_location(report)
+        except (LocationInfoNotFoundException, ValueError) as exc:
+            log.debug("Skipping notified report of %s without a usable area: %s", cache_key, exc)
+            continue
+        if settings.location_cache_enabled:
+            location_cache.put(cache_key, location)
+        if settings.negative_cache_enabled:
+            negative_cache.invalidate(cache_key)
+        stored += 1
+    return stored
+
+def handle_monitoring_notification(notification: MonitoringNotification) -> None:
+    """
+    Processes a MonitoringNotification sent by the NEF.
+
+    The reports go to the location stream of the notified subscription, or else resolve
+    the retrieval waiting on it, if any. Every report with a usable location, solicited
+    or not, refreshes the location cache, which is how standing subscriptions keep hot
+    devices warm, and the locFailureCause reports of standing subscriptions refresh the
+    negative cache.
+
+    args:
+        notification: the parsed NEF notification.
+    """
+    if not location_streams.dispatch(notification.subscription, notification.monitoringEventReports,
+                                     notification.cancelInd):
+        notification_correlator.dispatch(notification.subscription, notification.monitoringEventReports)
+    # Looked up before a cancellation forgets the standing subscription.
+    device_id = standing_subscriptions.device_for(notification.subscription)
+    standing_subscriptions.on_notification(notification.subscription, notification.cancelInd)
+    if settings.location_cache_enabled or settings.negative_cache_enabled:
+        _store_reported_locations(device_id, notification.monitoringEventReports)
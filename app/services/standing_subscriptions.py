@@ -0,0 +1,220 @@
+import asyncio
+import contextvars
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from app.schemas.location_retrieval import RetrievalLocationRequest
+from app.schemas.monitoring_event import (
+    DurationSec,
+    LocationType,
+    MonitoringEventSubscriptionRequest
+)
+from app.utils.network_request_to_core import (
+    monitoring_event_post_request,
+    monitoring_event_put_request,
+    subscription_self_link
+)
+from app.utils.subscription_reaper import subscription_reaper
+from app.utils.notification_correlator import subscription_key
+from app.utils.tf_to_3gpp_subscription import build_monitoring_event_subscription
+from app.utils.errors.exception_errors import NetworkPlatformError, LocationInfoNotFoundException, CoreUnauthorizedException
+from app.utils.logger import get_app_logger
+from app.config import get_settings
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+_MAINTENANCE_INTERVAL_SECONDS = 10.0
+
+
+@dataclass(slots=True)
+class _DeviceActivity:
+    window_start: float
+    window_count: int
+    last_request: float
+    request: RetrievalLocationRequest
+
+
+@dataclass(slots=True)
+class _StandingSubscription:
+    device_id: str
+    link: str
+    payload: MonitoringEventSubscriptionRequest
+    expires_at: datetime
+
+
+class StandingSubscriptionManager:
+    """
+    Keeps long-lived LOCATION_REPORTING subscriptions for frequently requested devices.
+
+    Requests are counted per device over fixed windows; a device reaching the hot
+    threshold within a window gets one periodic subscription whose notifications keep
+    its location cache entry fresh, so its retrievals are answered without a NEF
+    round trip. Subscriptions are renewed before monitorExpireTime and deleted once the
+    device has not been requested for ``cold_after`` seconds.
+    """
+
+    def __init__(self, hot_threshold: int, window: int, cold_after: int, lifetime: int,
+                 rep_period: int, renew_margin: int, max_subscriptions: int):
+        self.hot_threshold = hot_threshold
+        self.window = window
+        self.cold_after = cold_after
+        self.lifetime = lifetime
+        self.rep_period = rep_period
+        self.renew_margin = renew_margin
+        self.max_subscriptions = max_subscriptions
+        self._activity: dict[str, _DeviceActivity] = {}
+        self._subscriptions: dict[str, _StandingSubscription] = {}
+        self._device_by_link: dict[str, str] = {}
+        self._creating: set[str] = set()
+        self._maintenance_task: asyncio.Task | None = None
+        self.created = 0
+        self.renewed = 0
+        self.removed = 0
+
+    def active(self) -> int:
+        return len(self._subscriptions)
+
+    def is_hot(self, device_id: str) -> bool:
+        return device_id in self._subscriptions
+
+    def record_request(self, device_id: str, retrieve_location_request: RetrievalLocationRequest) -> None:
+        """Counts a retrieval of the device and subscribes it once it becomes hot."""
+        now = time.monotonic()
+        activity = self._activity.get(device_id)
+        if activity is None or now - activity.window_start >= self.window:
+            activity = _DeviceActivity(window_start=now, window_count=0, last_request=now,
+                                       request=retrieve_location_request)
+            self._activity[device_id] = activity
+        activity.window_count += 1
+        activity.last_request = now
+
+        if (activity.window_count >= self.hot_threshold
+                # The NEF subscription identifies the device by its MSISDN only.
+                and activity.request.device.phoneNumber is not None
+                and device_id not in self._subscriptions
+                and device_id not in self._creating
+                and len(self._subscriptions) + len(self._creating) < self.max_subscriptions):
+            self._creating.add(device_id)
+            # A fresh context, so the subscription outlives the deadline of the request that made the device hot.
+            asyncio.get_running_loop().create_task(self._subscribe(device_id, activity.request),
+                                                   context=contextvars.Context())
+
+    def device_for(self, subscription_link: str) -> str | None:
+        """Returns the device key of the standing subscription, None if it is not one."""
+        return self._device_by_link.get(subscription_key(subscription_link))
+
+    def on_notification(self, subscription_link: str, cancel_ind: bool | None) -> None:
+        """Forgets a standing subscription the NEF reports as cancelled."""
+        if not cancel_ind:
+            return
+        device_id = self._device_by_link.pop(subscription_key(subscription_link), None)
+        if device_id is not None:
+            log.info("NEF cancelled the standing subscription of %s", device_id)
+            self._subscriptions.pop(device_id, None)
+
+    def start(self) -> None:
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.get_running_loop().create_task(self._maintain())
+
+    async def stop(self) -> None:
+        """Stops the maintenance loop and releases every standing subscription to the reaper."""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            await asyncio.gather(self._maintenance_task, return_exceptions=True)
+            self._maintenance_task = None
+        for device_id in list(self._subscriptions):
+            self._unsubscribe(device_id)
+
+    def _build_payload(self, retrieve_location_request: RetrievalLocationRequest) -> MonitoringEventSubscriptionRequest:
+        payload = build_monitoring_event_subscription(retrieve_location_request)
+        payload.locationType = LocationType.CURRENT_LOCATION
+        payload.repPeriod = DurationSec(duration=self.rep_period)
+        payload.maximumNumberOfReports = self.lifetime // self.rep_period + 1
+        payload.monitorExpireTime = datetime.now(timezone.utc) + timedelta(seconds=self.lifetime)
+        return payload
+
+    async def _subscribe(self, device_id: str, retrieve_location_request: RetrievalLocationRequest) -> None:
+        try:
+            payload = self._build_payload(retrieve_location_request)
+            response = await monitoring_event_post_request(payload, routing_key=device_id)
+            link = subscription_self_link(response)
+            if link is None:
+                log.warning("NEF returned no subscription link for the standing subscription of %s", device_id)
+                return
+            self._subscriptions[device_id] = _StandingSubscription(
+                device_id=device_id, link=link, payload=payload, expires_at=payload.monitorExpireTime
+            )
+            self._device_by_link[subscription_key(link)] = device_id
+            self.created += 1
+            log.info("Created standing subscription %s for hot device %s", link, device_id)
+        except (NetworkPlatformError, LocationInfoNotFoundException, CoreUnauthorizedException) as exc:
+            log.error("Failed to create standing subscription for %s: %s", device_id, exc)
+        except Exception as exc: # nothing awaits this task, so anything else is logged here as well
+            log.exception("Unexpected error creating standing subscription for %s: %s", device_id, exc)
+        finally:
+            self._creating.discard(device_id)
+
+    async def _renew(self, subscription: _StandingSubscription) -> None:
+        payload = subscription.payload.model_copy()
+        payload.maximumNumberOfReports = self.lifetime // self.rep_period + 1
+        payload.monitorExpireTime = datetime.now(timezone.utc) + timedelta(seconds=self.lifetime)
+        try:
+            await monitoring_event_put_request(subscription.link, payload)
+        except (NetworkPlatformError, LocationInfoNotFoundException, CoreUnauthorizedException) as exc:
+            log.warning("Failed to renew standing subscription %s, dropping it: %s", subscription.link, exc)
+            self._forget(subscription.device_id)
+            return
+        subscription.payload = payload
+        subscription.expires_at = payload.monitorExpireTime
+        self.renewed += 1
+
+    def _unsubscribe(self, device_id: str) -> None:
+        subscription = self._forget(device_id)
+        if subscription is None:
+            return
+        subscription_reaper.release(subscription.link)
+        self.removed += 1
+        log.info("Released standing subscription %s of cold device %s", subscription.link, device_id)
+
+    def _forget(self, device_id: str) -> _StandingSubscription | None:
+        subscription = self._subscriptions.pop(device_id, None)
+        if subscription is not None:
+            self._device_by_link.pop(subscription_key(subscription.link), None)
+        return subscription
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.sleep(_MAINTENANCE_INTERVAL_SECONDS)
+            try:
+                await self._maintain_once()
+            except Exception as exc: # keep the loop alive, the next pass retries
+                log.error("Standing subscription maintenance failed: %s", exc)
+
+    async def _maintain_once(self) -> None:
+        now = time.monotonic()
+        cold_devices = [device_id for device_id, activity in self._activity.items()
+                        if now - activity.last_request >= self.cold_after]
+        for device_id in cold_devices:
+            del self._activity[device_id]
+
+        for device_id in cold_devices:
+            self._unsubscribe(device_id)
+
+        renew_before = datetime.now(timezone.utc) + timedelta(seconds=self.renew_margin)
+        renewals = [self._renew(subscription) for subscription in self._subscriptions.values()
+                    if subscription.expires_at <= renew_before]
+        if renewals:
+            await asyncio.gather(*renewals)
+
+
+standing_subscriptions = StandingSubscriptionManager(
+    hot_threshold=settings.hot_device_threshold,
+    window=settings.hot_device_window,
+    cold_after=settings.hot_device_cold_after,
+    lifetime=settings.standing_subscription_lifetime,
+    rep_period=settings.standing_subscription_rep_period,
+    renew_margin=settings.standing_subscription_renew_margin,
+    max_subscriptions=settings.standing_subscription_max,
+)
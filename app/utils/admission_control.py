@@ -0,0 +1,248 @@
+import asyncio
+import math
+import time
+from collections import Counter, OrderedDict, deque
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.utils.errors.exception_errors import OverloadedException, RateLimitedException
+from app.utils.errors.exception_error_handlers import overloaded_exception_handler, rate_limited_exception_handler
+from app.utils.nef_pool import nef_pool
+from app.utils.deadline import remaining
+from app.config import get_settings
+
+settings = get_settings()
+
+# Seconds between two measurements of the NEF throughput.
+THROUGHPUT_SAMPLE_INTERVAL = 1.0
+
+
+class AdmissionController:
+    """
+    Decides whether a retrieval is served or shed before any work is spent on it.
+
+    Every client, identified by its source address or, behind a trusted gateway, by
+    the ``client_id_header`` header, has a token bucket refilled at ``client_rate``
+    requests per second up to ``client_burst``; a client out of tokens is answered
+    429. Buckets of at most ``max_clients`` clients are kept. Only a bucket that has
+    refilled, which a new one would equal, is dropped for a new client; while all of
+    them are still draining, new clients are answered 429 too.
+
+    A batch request takes one token and one in-flight slot when it is admitted, is
+    charged a token for each further device, and takes a further slot for each
+    device retrieved concurrently, see app.services.location_retrieval_batch.
+
+    Retrievals in flight are capped so an admitted one completes within
+    ``deadline``: with the NEF completing X calls per second at latency L, the
+    retrievals ahead of a new one are served in about ``in_flight / X`` seconds, so
+    the cap is ``(deadline - L) * X``, i.e. the NEF concurrency measured by Little's
+    law scaled by how much queueing the deadline allows. The cap never drops below
+    ``min_in_flight`` nor exceeds ``max_in_flight`` when set. Beyond it the request
+    is answered 503 at once instead of timing out behind the NEF.
+
+    X is measured from the NEF calls completed per second: an increase counts at
+    once, a decrease is averaged over ``throughput_decay`` seconds.
+    """
+
+    def __init__(self, enabled: bool, deadline: float, min_in_flight: int, max_in_flight: int,
+                 client_rate: float, client_burst: int, max_clients: int, throughput_decay: float):
+        self.enabled = enabled
+        self.deadline = deadline
+        self.min_in_flight = min_in_flight
+        self.max_in_flight = max_in_flight
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self.throughput_decay = throughput_decay
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected: Counter[str] = Counter()
+        self.nef_throughput = 0.0
+        # Per-client [tokens, refilled at].
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._nef_completed = 0
+        self._sampled_at = time.monotonic()
+        # Retrievals waiting in acquire() for a slot, woken one per release.
+        self._slot_waiters: deque[asyncio.Future] = deque()
+
+    def limit(self) -> int:
+        """Retrievals allowed in flight at the current NEF throughput and latency."""
+        now = time.monotonic()
+        self._sample_throughput(now)
+        latencies = [latency for latency in (backend.latency(now) for backend in nef_pool.backends) if latency > 0]
+        latency = min(latencies, default=0.0)
+        limit = max(self.min_in_flight, int((self.deadline - latency) * self.nef_throughput))
+        if self.max_in_flight > 0:
+            limit = min(limit, self.max_in_flight)
+        return limit
+
+    def admit(self, client: str) -> None:
+        """Admits a retrieval or raises RateLimitedException or OverloadedException."""
+        if self.enabled:
+            if self.client_rate > 0:
+                self._take_token(client)
+            if self.in_flight >= self.limit():
+                self.rejected["overloaded"] += 1
+                retry_after = self.in_flight / self.nef_throughput if self.nef_throughput else 1.0
+                raise OverloadedException(max(math.ceil(retry_after), 1))
+        self.in_flight += 1
+        self.admitted += 1
+
+    def charge(self, client: str | None, tokens: int) -> None:
+        """
+        Takes further tokens from an admitted client, e.g. for the devices of a batch.
+
+        The bucket may go negative, so a batch larger than the burst is still served,
+        and the client is rate limited until its rate has paid the batch off.
+        """
+        if not self.enabled or self.client_rate <= 0 or client is None or tokens <= 0:
+            return
+        bucket = self._buckets.get(client)
+        if bucket is not None:
+            bucket[0] -= tokens
+
+    def try_acquire(self) -> bool:
+        """Takes an in-flight slot for a retrieval running within an admitted request, if the limit allows."""
+        if self.enabled and self.in_flight >= self.limit():
+            return False
+        self.in_flight += 1
+        return True
+
+    async def acquire(self) -> bool:
+        """
+        Waits for an in-flight slot for a retrieval running within an admitted request.
+
+        A waiter is woken when a retrieval finishes and at least every throughput
+        sample, as the limit may rise meanwhile.
+
+        returns:
+            False if the deadline of the current request ran out first.
+        """
+        while not self.try_acquire():
+            left = remaining()
+            if left is not None and left <= 0:
+                return False
+            waiter = asyncio.get_running_loop().create_future()
+            self._slot_waiters.append(waiter)
+            try:
+                await asyncio.wait((waiter,), timeout=min(THROUGHPUT_SAMPLE_INTERVAL, left or math.inf))
+            finally:
+                if not waiter.done():
+                    waiter.cancel()
+                    self._slot_waiters.remove(waiter)
+        return True
+
+    def release(self) -> None:
+        """Marks an admitted retrieval as finished."""
+        self.in_flight -= 1
+        while self._slot_waiters:
+            waiter = self._slot_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def _take_token(self, client: str) -> None:
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients and not self._drop_idle_bucket(now):
+                self.rejected["rate_limited"] += 1
+                raise RateLimitedException(client, max(math.ceil(self._refill_time(self._oldest_bucket(), now)), 1))
+            bucket = self._buckets[client] = [float(self.client_burst), now]
+        else:
+            self._buckets.move_to_end(client)
+            bucket[0] = min(self.client_burst, bucket[0] + (now - bucket[1]) * self.client_rate)
+            bucket[1] = now
+        if bucket[0] < 1.0:
+            self.rejected["rate_limited"] += 1
+            raise RateLimitedException(client, max(math.ceil((1.0 - bucket[0]) / self.client_rate), 1))
+        bucket[0] -= 1.0
+
+    def _oldest_bucket(self) -> list[float]:
+        return next(iter(self._buckets.values()))
+
+    def _refill_time(self, bucket: list[float], now: float) -> float:
+        """Seconds until the bucket is full again."""
+        return (self.client_burst - bucket[0]) / self.client_rate - (now - bucket[1])
+
+    def _drop_idle_bucket(self, now: float) -> bool:
+        """Drops the least recently seen bucket if it has refilled, as forgetting it then changes nothing."""
+        if self._refill_time(self._oldest_bucket(), now) > 0:
+            return False
+        self._buckets.popitem(last=False)
+        return True
+
+    def _sample_throughput(self, now: float) -> None:
+        elapsed = now - self._sampled_at
+        if elapsed < THROUGHPUT_SAMPLE_INTERVAL:
+            return
+        completed = sum(backend.requests["ok"] + backend.requests["error"] for backend in nef_pool.backends)
+        throughput = (completed - self._nef_completed) / elapsed
+        weight = math.exp(-elapsed / self.throughput_decay)
+        self.nef_throughput = max(throughput, self.nef_throughput * weight + throughput * (1 - weight))
+        self._nef_completed = completed
+        self._sampled_at = now
+
+
+_client_id_header = settings.client_id_header.lower().encode("latin-1")
+
+
+def _client_key(scope: Scope) -> str:
+    # Without inbound authentication the header is whatever the caller sends, so it is
+    # only a client identity when a trusted gateway sets it.
+    if settings.admission_trust_client_id_header:
+        for name, value in scope["headers"]:
+            if name == _client_id_header:
+                return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware passing the requests under ``path_prefix`` through the admission
+    controller before they are read, answering rejected ones with a CAMARA error and
+    ``Retry-After``. Requests to ``exclude_paths`` are passed through.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str, exclude_paths: tuple[str, ...] = ()):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http" or not scope["path"].startswith(self.path_prefix)
+                or scope["path"] in self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        client = _client_key(scope)
+        # Handlers charge further tokens to the same client, e.g. per device of a batch.
+        scope.setdefault("state", {})["admission_client"] = client
+        try:
+            admission_controller.admit(client)
+        except RateLimitedException as exc:
+            response = await rate_limited_exception_handler(Request(scope), exc)
+            await response(scope, receive, send)
+            return
+        except OverloadedException as exc:
+            response = await overloaded_exception_handler(Request(scope), exc)
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission_controller.release()
+
+
+admission_controller = AdmissionController(
+    enabled=settings.admission_control_enabled,
+    deadline=settings.admission_deadline,
+    min_in_flight=settings.admission_min_in_flight,
+    max_in_flight=settings.admission_max_in_flight,
+    client_rate=settings.admission_client_rate,
+    client_burst=settings.admission_client_burst,
+    max_clients=settings.admission_max_clients,
+    throughput_decay=settings.nef_latency_decay,
+)
@@ -0,0 +1,281 @@
+"""
+Memory-mapped index of network area geometries.
+
+Maps cells, eNodeBs, tracking areas and PLMNs to the polygons they cover, so a NEF
+report carrying only network identifiers still resolves to a CAMARA area. The index
+is built once from a CSV export into a binary file laid out as arrays:
+
+    header            magic, version and section sizes
+    slots   uint32    open addressing hash table of entry numbers (0 is empty)
+    hashes  uint64    key hash of every entry
+    keys    uint64    offsets of every entry key in the key blob
+    vertices uint64   offsets of every entry polygon in the coordinate arrays
+    key blob          UTF-8 keys, concatenated
+    latitudes / longitudes float64
+
+Opening the file maps it and reads the header only, so startup does not depend on
+the number of areas, and a lookup hashes the key and probes a few slots.
+
+Build an index with:
+
+    python -m app.utils.cell_geometry_index build cells.csv cells.idx
+
+The CSV has the columns ``kind`` (cell, enodeb, tracking_area or plmn), ``id``,
+an optional ``plmn`` (MCC followed by MNC) and ``polygon`` as WKT, e.g.
+``POLYGON((23.70 37.90, 23.71 37.90, 23.71 37.91, 23.70 37.90))``.
+"""
+import argparse
+import csv
+import hashlib
+import mmap
+import re
+import struct
+import threading
+from typing import TYPE_CHECKING
+
+from app.utils.logger import get_app_logger
+from app.config import get_settings
+
+if TYPE_CHECKING:
+    import numpy as np
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+AREA_KINDS = ("cell", "enodeb", "tracking_area", "plmn")
+
+_MAGIC = b"CELLGEO\0"
+_VERSION = 1
+# magic, version, entry count, vertex count, slot count, key blob size
+_HEADER = struct.Struct("<8sIxxxxQQQQ")
+_HEADER_SIZE = 64
+
+_WKT_POLYGON = re.compile(r"^\s*POLYGON\s*\(\s*\(([^()]*)\)", re.IGNORECASE)
+
+
+def _index_key(kind: str, identifier: str, plmn: str | None) -> bytes:
+    return f"{kind}|{plmn or ''}|{identifier}".encode("utf-8")
+
+
+def _key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def parse_wkt_polygon(wkt: str) -> tuple[list[float], list[float]]:
+    """Returns the latitudes and longitudes of the outer ring of a WKT polygon, unclosed."""
+    match = _WKT_POLYGON.match(wkt)
+    if match is None:
+        raise ValueError(f"Not a WKT polygon: {wkt[:60]}")
+    longitudes, latitudes = [], []
+    for pair in match.group(1).split(","):
+        lon, lat = pair.split()
+        longitudes.append(float(lon))
+        latitudes.append(float(lat))
+    if len(latitudes) > 1 and latitudes[0] == latitudes[-1] and longitudes[0] == longitudes[-1]:
+        latitudes.pop()
+        longitudes.pop()
+    if len(latitudes) < 3:
+        raise ValueError(f"Polygon with fewer than 3 points: {wkt[:60]}")
+    return latitudes, longitudes
+
+
+def build_cell_geometry_index(csv_path: str, index_path: str) -> int:
+    """
+    Builds the binary index file from a CSV export of area polygons.
+
+    returns:
+        number of indexed areas.
+
+    raises:
+        ValueError: on unknown kinds, malformed polygons or duplicate areas.
+    """
+    import numpy as np
+
+    keys: list[bytes] = []
+    seen: set[bytes] = set()
+    vertex_offsets = [0]
+    latitudes: list[float] = []
+    longitudes: list[float] = []
+
+    with open(csv_path, newline="", encoding="utf-8") as csv_file:
+        for line, row in enumerate(csv.DictReader(csv_file), start=2):
+            kind = row["kind"].strip().lower()
+            if kind not in AREA_KINDS:
+                raise ValueError(f"{csv_path}:{line}: unknown area kind {kind!r}")
+            key = _index_key(kind, row["id"].strip(), (row.get("plmn") or "").strip())
+            if key in seen:
+                raise ValueError(f"{csv_path}:{line}: duplicate area {key.decode()}")
+            seen.add(key)
+            try:
+                polygon_latitudes, polygon_longitudes = parse_wkt_polygon(row["polygon"])
+            except ValueError as exc:
+                raise ValueError(f"{csv_path}:{line}: {exc}") from exc
+            keys.append(key)
+            latitudes.extend(polygon_latitudes)
+            longitudes.extend(polygon_longitudes)
+            vertex_offsets.append(len(latitudes))
+
+    entry_count = len(keys)
+    slot_count = 1 << max(entry_count * 2 - 1, 1).bit_length()
+    hashes = [_key_hash(key) for key in keys]
+    slots = [0] * slot_count
+    mask = slot_count - 1
+    for entry, key_hash in enumerate(hashes):
+        slot = key_hash & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = entry + 1
+
+    key_offsets = np.zeros(entry_count + 1, dtype=np.uint64)
+    np.cumsum([len(key) for key in keys], out=key_offsets[1:])
+    key_blob = b"".join(keys)
+
+    with open(index_path, "wb") as index_file:
+        index_file.write(_HEADER.pack(_MAGIC, _VERSION, entry_count, len(latitudes), slot_count, len(key_blob))
+                         .ljust(_HEADER_SIZE, b"\0"))
+        sections = (
+            np.asarray(slots, dtype=np.uint32).tobytes(),
+            np.asarray(hashes, dtype=np.uint64).tobytes(),
+            key_offsets.tobytes(),
+            np.asarray(vertex_offsets, dtype=np.uint64).tobytes(),
+            key_blob,
+            np.asarray(latitudes, dtype=np.float64).tobytes(),
+            np.asarray(longitudes, dtype=np.float64).tobytes(),
+        )
+        for section in sections:
+            index_file.write(section.ljust(_aligned(len(section)), b"\0"))
+    return entry_count
+
+
+class CellGeometryIndex:
+    """
+    Read-only lookups of area polygons in a memory-mapped index file.
+
+    The file is mapped on first use; pages are loaded by the OS as lookups touch them
+    and are shared between the processes mapping the same file.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._opened = False
+        self._mmap: mmap.mmap | None = None
+        self._entry_count = 0
+
+    def _open(self) -> None:
+        with self._lock:
+            if self._opened:
+                return
+            self._opened = True
+            if not self.path:
+                return
+            import numpy as np # loaded only when an index is configured
+
+            try:
+                with open(self.path, "rb") as index_file:
+                    mapped = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except OSError as exc:
+                log.error("Cannot open cell geometry index %s, locations without geographicArea will not resolve: %s",
+                          self.path, exc)
+                return
+
+            magic, version, entry_count, vertex_count, slot_count, key_blob_size = _HEADER.unpack_from(mapped)
+            if magic != _MAGIC or version != _VERSION:
+                log.error("%s is not a cell geometry index of version %d", self.path, _VERSION)
+                mapped.close()
+                return
+
+            offset = _HEADER_SIZE
+
+            def section(dtype: type, count: int) -> "np.ndarray":
+                nonlocal offset
+                array = np.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+                offset += _aligned(array.nbytes)
+                return array
+
+            self._slots = section(np.uint32, slot_count)
+            self._hashes = section(np.uint64, entry_count)
+            self._key_offsets = section(np.uint64, entry_count + 1)
+            self._vertex_offsets = section(np.uint64, entry_count + 1)
+            self._key_blob_offset = offset
+            offset += _aligned(key_blob_size)
+            self._latitudes = section(np.float64, vertex_count)
+            self._longitudes = section(np.float64, vertex_count)
+            self._mask = slot_count - 1
+            self._entry_count = entry_count
+            self._mmap = mapped
+            log.info("Opened cell geometry index %s with %d areas", self.path, entry_count)
+
+    def __len__(self) -> int:
+        if not self._opened:
+            self._open()
+        return self._entry_count
+
+    def lookup(self, kind: str, identifier: str, plmn: str | None = None) -> "tuple[np.ndarray, np.ndarray] | None":
+        """
+        Returns the latitudes and longitudes of the polygon of an area, if indexed.
+
+        An area indexed under a PLMN is only found with that PLMN, one indexed without
+        a PLMN with any.
+        """
+        if not self._opened:
+            self._open()
+        if self._mmap is None:
+            return None
+        for area_plmn in ((plmn, None) if plmn else (None,)):
+            polygon = self._probe(_index_key(kind, identifier, area_plmn))
+            if polygon is not None:
+                self.hits += 1
+                return polygon
+        self.misses += 1
+        return None
+
+    def _probe(self, key: bytes) -> "tuple[np.ndarray, np.ndarray] | None":
+        key_hash = _key_hash(key)
+        slot = key_hash & self._mask
+        while entry := int(self._slots[slot]):
+            entry -= 1
+            if int(self._hashes[entry]) == key_hash:
+                start = self._key_blob_offset + int(self._key_offsets[entry])
+                end = self._key_blob_offset + int(self._key_offsets[entry + 1])
+                if self._mmap[start:end] == key:
+                    first, last = int(self._vertex_offsets[entry]), int(self._vertex_offsets[entry + 1])
+                    return self._latitudes[first:last], self._longitudes[first:last]
+            slot = (slot + 1) & self._mask
+        return None
+
+
+cell_geometry_index = CellGeometryIndex(settings.cell_geometry_index_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Builds or queries a cell geometry index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build an index file from a CSV export")
+    build.add_argument("csv_path")
+    build.add_argument("index_path")
+    lookup = commands.add_parser("lookup", help="print the polygon of an area")
+    lookup.add_argument("index_path")
+    lookup.add_argument("kind", choices=AREA_KINDS)
+    lookup.add_argument("id")
+    lookup.add_argument("--plmn")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Indexed {build_cell_geometry_index(args.csv_path, args.index_path)} areas into {args.index_path}")
+    else:
+        polygon = CellGeometryIndex(args.index_path).lookup(args.kind, args.id, args.plmn)
+        if polygon is None:
+            raise SystemExit(f"{args.kind} {args.id} is not indexed")
+        for latitude, longitude in zip(*polygon):
+            print(f"{latitude} {longitude}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from enum import Enum
+from typing import TypeVar
+
+from app.utils.errors.exception_errors import CircuitOpenException, DeadlineExceededException
+from app.utils.logger import get_app_logger
+from app.config import get_settings
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker guarding calls to a dependency.
+
+    Outcomes are counted in one-second buckets over ``window`` seconds. Once at least
+    ``min_calls`` were made in the window and either the failure rate or the rate of
+    calls slower than ``slow_call_duration`` reaches its threshold, the circuit opens
+    and calls are rejected immediately with CircuitOpenException for
+    ``open_duration`` seconds. It then lets ``half_open_calls`` probes through: the
+    circuit closes when all of them succeed in time and opens again otherwise.
+
+    Only exceptions listed in ``failure_exceptions`` count as failures, any other
+    exception means the dependency answered. A call cut short by the deadline of its
+    request is recorded as neither, since it tells nothing about the dependency. The
+    breaker is thread safe, so it can guard the blocking CAPIF SDK calls made from the
+    threadpool too.
+    """
+
+    def __init__(self, name: str, failure_exceptions: tuple[type[BaseException], ...], enabled: bool,
+                 window: int, min_calls: int, error_rate: float, slow_call_duration: float,
+                 slow_call_rate: float, open_duration: float, half_open_calls: int):
+        self.name = name
+        self.failure_exceptions = failure_exceptions
+        self.enabled = enabled
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        # Per-second buckets of [second, calls, failures, slow calls].
+        self._buckets = [[0, 0, 0, 0] for _ in range(window)]
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.transitions: Counter[str] = Counter()
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def available(self) -> bool:
+        """Whether a call would be admitted now, without admitting it."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self._state is CircuitState.OPEN:
+                return self._opened_at + self.open_duration <= time.monotonic()
+            if self._state is CircuitState.HALF_OPEN:
+                return self._probes_in_flight < self.half_open_calls
+            return True
+
+    def before_call(self) -> None:
+        """Admits a call or raises CircuitOpenException if the circuit rejects it."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state is CircuitState.OPEN:
+                remaining = self._opened_at + self.open_duration - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenException(self.name, math.ceil(remaining))
+                self._transition(CircuitState.HALF_OPEN)
+
+            if self._state is CircuitState.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenException(self.name, 1)
+                self._probes_in_flight += 1
+
+    def record(self, duration: float, failed: bool) -> None:
+        """Records the outcome of an admitted call."""
+        if not self.enabled:
+            return
+        slow = duration >= self.slow_call_duration
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if failed or slow:
+                    self._open()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._reset_window()
+                    self._transition(CircuitState.CLOSED)
+                return
+            if self._state is CircuitState.OPEN:
+                return
+
+            bucket = self._current_bucket()
+            bucket[1] += 1
+            bucket[2] += failed
+            bucket[3] += slow
+            self._evaluate()
+
+    def release(self) -> None:
+        """Frees the probe slot of an admitted call that was abandoned without an outcome."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Runs a blocking call through the breaker."""
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except DeadlineExceededException:
+            self.release()
+            raise
+        except self.failure_exceptions:
+            self.record(time.monotonic() - started, failed=True)
+            raise
+        except Exception:
+            self.record(time.monotonic() - started, failed=False)
+            raise
+        self.record(time.monotonic() - started, failed=False)
+        return result
+
+    async def call_async(self, fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """Awaits a call through the breaker."""
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except DeadlineExceededException:
+            self.release()
+            raise
+        except self.failure_exceptions:
+            self.record(time.monotonic() - started, failed=True)
+            raise
+        except Exception:
+            self.record(time.monotonic() - started, failed=False)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record(time.monotonic() - started, failed=False)
+        return result
+
+    def _current_bucket(self) -> list[int]:
+        second = int(time.monotonic())
+        bucket = self._buckets[second % self.window]
+        if bucket[0] != second:
+            bucket[:] = [second, 0, 0, 0]
+        return bucket
+
+    def _evaluate(self) -> None:
+        oldest = int(time.monotonic()) - self.window
+        calls = failures = slow_calls = 0
+        for second, bucket_calls, bucket_failures, bucket_slow in self._buckets:
+            if second > oldest:
+                calls += bucket_calls
+                failures += bucket_failures
+                slow_calls += bucket_slow
+        if calls < self.min_calls:
+            return
+        if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_call_rate:
+            log.warning("Circuit %s tripped: %s failed and %s slow out of %s calls in %ss",
+                        self.name, failures, slow_calls, calls, self.window)
+            self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._transition(CircuitState.OPEN)
+
+    def _reset_window(self) -> None:
+        for bucket in self._buckets:
+            bucket[:] = [0, 0, 0, 0]
+
+    def _transition(self, state: CircuitState) -> None:
+        if state is self._state:
+            return
+        log.warning("Circuit %s changed from %s to %s", self.name, self._state.value, state.value)
+        self._state = state
+        self.transitions[state.value] += 1
+
+
+def _circuit_breaker(name: str, failure_exceptions: tuple[type[BaseException], ...]) -> CircuitBreaker:
+    return CircuitBreaker(
+        name=name,
+        failure_exceptions=failure_exceptions,
+        enabled=settings.circuit_breaker_enabled,
+        window=settings.circuit_breaker_window,
+        min_calls=settings.circuit_breaker_min_calls,
+        error_rate=settings.circuit_breaker_error_rate,
+        slow_call_duration=settings.circuit_breaker_slow_call_duration,
+        slow_call_rate=settings.circuit_breaker_slow_call_rate,
+        open_duration=settings.circuit_breaker_open_duration,
+        half_open_calls=settings.circuit_breaker_half_open_calls,
+    )
+
+# Any error raised by the CAPIF SDK means onboarding or token retrieval did not succeed.
+capif_circuit_breaker = _circuit_breaker("capif", (Exception,))
@@ -0,0 +1,387 @@
+"""
+Location cache kept in a few flat arrays instead of one model graph per device.
+
+A cached pydantic Location with a 15-point polygon is about 40 Python objects and
+10 kB; here a device costs its coordinates, a timestamp and a handful of integers:
+
+ - every device owns a slot, and the slot columns hold its key hash, lastLocationTime
+   in microseconds, where its coordinates and its key start and how long they are;
+ - the latitudes and longitudes of all devices are appended to two contiguous arrays,
+   each device addressing its run of points by offset and count;
+ - device keys are stored once, as UTF-8 bytes appended to one key arena;
+ - an open-addressing hash table with linear probing maps key hashes to slots.
+
+A Location is only materialized into CAMARA models when a lookup hits, and the
+models of the most recent hits are kept, so hot devices skip building them again.
+Coordinates and keys replaced or evicted leave garbage in their arrays, which are
+compacted once it outweighs the live data.
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.schemas.location_retrieval import LastLocationTime, Location, Polygon
+from app.utils.tf_helper_for_camara_loc import build_camara_polygon
+from app.utils.location_size import estimate_location_size
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EMPTY = -1
+# Slots (and hash table cells per slot, the table is kept at most half full) allocated up front.
+INITIAL_CAPACITY = 1024
+# Bytes of the slot columns of one device.
+_SLOT_BYTES = 8 + 8 + 8 + 8 + 1 + 1 + 2 + 1
+
+
+def _to_microseconds(timestamp: datetime) -> int:
+    return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+
+def _key_hash(key: str) -> int:
+    # The table lives in one process, so the salted str hash is as good as any.
+    return hash(key) & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def _gather(starts: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the positions of the runs (starts, counts) and the start of each run once packed."""
+    packed_starts = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=packed_starts[1:])
+    positions = np.repeat(starts - packed_starts, counts) + np.arange(int(counts.sum()), dtype=np.int64)
+    return positions, packed_starts
+
+
+class ColumnarLocationCache:
+    """
+    Bounded cache of the last CAMARA Location per device key, in columnar arrays.
+
+    Offers the interface of LocationCache for Polygon locations of at most 255
+    points. Entries are dropped on access once their lastLocationTime is older than
+    the TTL, and evicted in CLOCK order, an approximation of least-recently-used
+    needing one bit per device, so that neither the entry count nor the memory held
+    by the live entries exceeds its cap. Coordinates are stored as ``coordinate_dtype``:
+    float64 keeps them exact, float32 halves their memory at about 1 m of precision.
+
+    The ``decoded_entries`` most recently hit locations are also kept as built
+    models, so hits on hot devices skip building them; they count towards
+    ``max_bytes`` at the footprint of the objects layout and are dropped first when
+    it runs short.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int, coordinate_dtype: str = "float64",
+                 decoded_entries: int = 1024):
+        self.max_entries = max_entries
+        self.decoded_entries = decoded_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.coordinate_dtype = np.dtype(coordinate_dtype)
+        if self.coordinate_dtype not in (np.float32, np.float64):
+            raise ValueError(f"Unsupported coordinate dtype {coordinate_dtype!r}, expected float32 or float64")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._decoded: OrderedDict[str, Location] = OrderedDict()
+        self._decoded_bytes = 0
+        self.clear()
+
+    def clear(self) -> None:
+        capacity = min(INITIAL_CAPACITY, max(self.max_entries, 1))
+        self._hashes = np.zeros(capacity, dtype=np.int64)
+        self._times = np.zeros(capacity, dtype=np.int64)
+        self._point_starts = np.zeros(capacity, dtype=np.int64)
+        self._key_starts = np.zeros(capacity, dtype=np.int64)
+        self._point_counts = np.zeros(capacity, dtype=np.uint8)
+        self._point_room = np.zeros(capacity, dtype=np.uint8)
+        self._key_lengths = np.zeros(capacity, dtype=np.uint16)
+        self._referenced = np.zeros(capacity, dtype=np.bool_)
+        self._latitudes = np.zeros(capacity * 8, dtype=self.coordinate_dtype)
+        self._longitudes = np.zeros(capacity * 8, dtype=self.coordinate_dtype)
+        self._keys = bytearray()
+        self._index = np.full(self._table_size(capacity), _EMPTY, dtype=np.int32)
+        self._free_slots: list[int] = []
+        self._used_slots = 0
+        self._used_points = 0
+        self._live_points = 0
+        self._live_key_bytes = 0
+        self._entries = 0
+        self._clock_hand = 0
+        self._decoded.clear()
+        self._decoded_bytes = 0
+
+    def __len__(self) -> int:
+        return self._entries
+
+    @property
+    def current_bytes(self) -> int:
+        """Memory held by the live entries: their slot, table cells, coordinates, key and built models."""
+        point_bytes = 2 * self.coordinate_dtype.itemsize
+        table_bytes = 2 * self._index.itemsize
+        return (self._entries * (_SLOT_BYTES + table_bytes) + self._live_points * point_bytes
+                + self._live_key_bytes + self._decoded_bytes)
+
+    def allocated_bytes(self) -> int:
+        """Memory of the arrays, including their headroom and garbage not compacted yet."""
+        columns = (self._hashes, self._times, self._point_starts, self._key_starts, self._point_counts,
+                   self._point_room, self._key_lengths, self._referenced, self._latitudes, self._longitudes,
+                   self._index)
+        return sum(column.nbytes for column in columns) + len(self._keys)
+
+    def get(self, key: str, max_age: int | None = None) -> Location | None:
+        """
+        Returns the cached location of the device if it satisfies max_age.
+
+        args:
+            key: device key, see app.utils.device_identity.device_key.
+            max_age: maximum accepted age in seconds, None accepts any age within the TTL.
+
+        returns:
+            the cached Location, or None on a miss.
+        """
+        cell, slot = self._find(key)
+        if slot == _EMPTY:
+            self.misses += 1
+            return None
+
+        age = time.time() - int(self._times[slot]) / 1e6
+        if age > self.ttl:
+            self._remove(cell, slot, key)
+            self.misses += 1
+            return None
+        if max_age is not None and age > max_age:
+            self.misses += 1
+            return None
+
+        self._referenced[slot] = True
+        self.hits += 1
+        location = self._decoded.get(key)
+        if location is not None:
+            self._decoded.move_to_end(key)
+            return location
+        location = self._materialize(slot)
+        if self.decoded_entries > 0:
+            self._decoded[key] = location
+            self._decoded_bytes += estimate_location_size(location)
+            # Built models give way to the entries themselves when memory runs short.
+            while self._decoded and (len(self._decoded) > self.decoded_entries
+                                     or self.current_bytes > self.max_bytes):
+                self._decoded_bytes -= estimate_location_size(self._decoded.popitem(last=False)[1])
+        return location
+
+    def put(self, key: str, location: Location) -> None:
+        """Stores the location of the device unless a newer one is already cached."""
+        if not isinstance(location.area, Polygon) or len(location.area.boundary.root) > 255:
+            return
+        points = location.area.boundary.root
+        last_location_us = _to_microseconds(location.lastLocationTime.root)
+        cell, slot = self._find(key)
+        if slot != _EMPTY:
+            if int(self._times[slot]) > last_location_us:
+                return
+            self._forget_decoded(key)
+        else:
+            while self._entries and self._entries >= self.max_entries:
+                self._evict()
+            slot = self._new_slot()
+            cell, _ = self._find(key)
+            self._index[cell] = slot
+            self._hashes[slot] = _key_hash(key)
+            encoded = key.encode("utf-8")
+            self._key_starts[slot] = len(self._keys)
+            self._key_lengths[slot] = len(encoded)
+            self._keys += encoded
+            self._live_key_bytes += len(encoded)
+            if len(self._keys) > 2 * self._live_key_bytes + INITIAL_CAPACITY:
+                self._compact_keys()
+            self._entries += 1
+
+        count = len(points)
+        if count > int(self._point_room[slot]):
+            # The points outgrew their run, which is left as garbage.
+            self._live_points -= int(self._point_room[slot])
+            self._point_room[slot] = 0
+            self._point_starts[slot] = self._reserve_points(count)
+            self._point_room[slot] = count
+            self._live_points += count
+        start = int(self._point_starts[slot])
+        self._latitudes[start:start + count] = [point.latitude for point in points]
+        self._longitudes[start:start + count] = [point.longitude for point in points]
+        self._point_counts[slot] = count
+        self._times[slot] = last_location_us
+        self._referenced[slot] = True
+        while self._entries > 1 and self.current_bytes > self.max_bytes:
+            self._evict()
+
+    def invalidate(self, key: str) -> None:
+        """Drops the cached location of the device, if any."""
+        cell, slot = self._find(key)
+        if slot != _EMPTY:
+            self._remove(cell, slot, key)
+
+    def stats(self) -> dict:
+        """Returns the cache counters, e.g. for logging or metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _materialize(self, slot: int) -> Location:
+        start = int(self._point_starts[slot])
+        end = start + int(self._point_counts[slot])
+        latitudes = self._latitudes[start:end]
+        longitudes = self._longitudes[start:end]
+        if self.coordinate_dtype == np.float32:
+            # Rounded to the 0.1 m below float32 precision, so 37.9 is answered as 37.900002, not 37.900001525878906.
+            latitudes = latitudes.astype(np.float64).round(6)
+            longitudes = longitudes.astype(np.float64).round(6)
+        last_location_time = _EPOCH + timedelta(microseconds=int(self._times[slot]))
+        return Location.model_construct(
+            area=build_camara_polygon(latitudes.tolist(), longitudes.tolist()),
+            lastLocationTime=LastLocationTime.model_construct(last_location_time),
+        )
+
+    def _find(self, key: str) -> tuple[int, int]:
+        """Returns the table cell of the key and its slot, or the empty cell it would take and _EMPTY."""
+        key_hash = _key_hash(key)
+        mask = len(self._index) - 1
+        cell = key_hash & mask
+        encoded = None
+        while True:
+            slot = int(self._index[cell])
+            if slot == _EMPTY:
+                return cell, _EMPTY
+            if int(self._hashes[slot]) == key_hash:
+                if encoded is None:
+                    encoded = key.encode("utf-8")
+                start = int(self._key_starts[slot])
+                if self._keys[start:start + int(self._key_lengths[slot])] == encoded:
+                    return cell, slot
+            cell = (cell + 1) & mask
+
+    def _remove(self, cell: int, slot: int, key: str) -> None:
+        self._unindex(cell)
+        self._live_points -= int(self._point_room[slot])
+        self._live_key_bytes -= int(self._key_lengths[slot])
+        self._point_room[slot] = 0
+        self._point_counts[slot] = 0
+        self._key_lengths[slot] = 0
+        self._referenced[slot] = False
+        self._free_slots.append(slot)
+        self._entries -= 1
+        self._forget_decoded(key)
+
+    def _forget_decoded(self, key: str) -> None:
+        location = self._decoded.pop(key, None)
+        if location is not None:
+            self._decoded_bytes -= estimate_location_size(location)
+
+    def _unindex(self, cell: int) -> None:
+        """Empties a table cell, shifting back the entries probed past it so lookups still reach them."""
+        index, hashes = self._index, self._hashes
+        mask = len(index) - 1
+        hole = cell
+        probe = cell
+        while True:
+            probe = (probe + 1) & mask
+            slot = int(index[probe])
+            if slot == _EMPTY:
+                break
+            home = int(hashes[slot]) & mask
+            # The entry stays if its home lies cyclically after the hole, up to where it sits.
+            if (hole < probe and hole < home <= probe) or (hole > probe and (home > hole or home <= probe)):
+                continue
+            index[hole] = slot
+            hole = probe
+        index[hole] = _EMPTY
+
+    def _evict(self) -> None:
+        """Evicts the first device of the CLOCK hand not referenced since the hand last passed it."""
+        while True:
+            slot = self._clock_hand
+            self._clock_hand = (slot + 1) % self._used_slots
+            if self._key_lengths[slot] == 0:
+                continue
+            if self._referenced[slot]:
+                self._referenced[slot] = False
+                continue
+            start = int(self._key_starts[slot])
+            key = bytes(self._keys[start:start + int(self._key_lengths[slot])]).decode("utf-8")
+            cell, _ = self._find(key)
+            self._remove(cell, slot, key)
+            self.evictions += 1
+            return
+
+    def _new_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._used_slots == len(self._hashes):
+            self._grow_slots(min(2 * len(self._hashes), max(self.max_entries, len(self._hashes) + 1)))
+        self._used_slots += 1
+        return self._used_slots - 1
+
+    def _grow_slots(self, capacity: int) -> None:
+        for name in ("_hashes", "_times", "_point_starts", "_key_starts", "_point_counts", "_point_room",
+                     "_key_lengths", "_referenced"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+        if self._table_size(capacity) > len(self._index):
+            self._rehash(self._table_size(capacity))
+
+    def _rehash(self, table_size: int) -> None:
+        """Rebuilds the hash table, placing all entries at once with vectorized linear probing."""
+        index = np.full(table_size, _EMPTY, dtype=np.int32)
+        mask = table_size - 1
+        pending = np.flatnonzero(self._key_lengths[:self._used_slots]).astype(np.int32)
+        cells = self._hashes[pending] & mask
+        while len(pending):
+            free = np.flatnonzero(index[cells] == _EMPTY)
+            # Of the entries probing the same free cell, the first takes it and the others probe on.
+            _, first = np.unique(cells[free], return_index=True)
+            placed = free[first]
+            index[cells[placed]] = pending[placed]
+            waiting = np.ones(len(pending), dtype=np.bool_)
+            waiting[placed] = False
+            pending = pending[waiting]
+            cells = (cells[waiting] + 1) & mask
+        self._index = index
+
+    def _reserve_points(self, count: int) -> int:
+        if self._used_points + count > len(self._latitudes):
+            if self._used_points - self._live_points > self._live_points:
+                self._compact()
+            if self._used_points + count > len(self._latitudes):
+                capacity = max(2 * len(self._latitudes), self._used_points + count)
+                for name in ("_latitudes", "_longitudes"):
+                    column = getattr(self, name)
+                    grown = np.zeros(capacity, dtype=column.dtype)
+                    grown[:self._used_points] = column[:self._used_points]
+                    setattr(self, name, grown)
+        start = self._used_points
+        self._used_points += count
+        return start
+
+    def _compact(self) -> None:
+        """Packs the coordinates of the live entries, in slot order, dropping the garbage between them."""
+        slots = np.flatnonzero(self._point_room[:self._used_slots])
+        positions, starts = _gather(self._point_starts[slots], self._point_room[slots].astype(np.int64))
+        for name in ("_latitudes", "_longitudes"):
+            column = getattr(self, name)
+            column[:len(positions)] = column[positions]
+        self._point_starts[slots] = starts
+        self._used_points = len(positions)
+
+    def _compact_keys(self) -> None:
+        slots = np.flatnonzero(self._key_lengths[:self._used_slots])
+        positions, starts = _gather(self._key_starts[slots], self._key_lengths[slots].astype(np.int64))
+        self._keys = bytearray(np.frombuffer(self._keys, dtype=np.uint8)[positions].tobytes())
+        self._key_starts[slots] = starts
+
+    @staticmethod
+    def _table_size(capacity: int) -> int:
+        return 1 << (2 * capacity - 1).bit_length()
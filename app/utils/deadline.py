@@ -0,0 +1,137 @@
+import asyncio
+import math
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.errors.exception_errors import DeadlineExceededException
+from app.config import get_settings
+
+settings = get_settings()
+
+# Monotonic time by which the retrieval handled in the current context must be answered.
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+exceeded_stages: Counter[str] = Counter()
+abandoned_requests = 0
+
+
+def remaining() -> float | None:
+    """Seconds left before the deadline of the current request, None outside of a request."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def bounded_timeout(timeout: float) -> float:
+    """Shrinks a timeout so it does not outlast the deadline of the current request."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return max(min(timeout, left), 0.0)
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def deadline_exceeded(stage: str) -> DeadlineExceededException:
+    """Counts and returns the exception reporting that the deadline ran out in `stage`."""
+    exceeded_stages[stage] += 1
+    return DeadlineExceededException(stage)
+
+
+def check_deadline(stage: str) -> None:
+    """Raises DeadlineExceededException if the current request has no time left for `stage`."""
+    if expired():
+        raise deadline_exceeded(stage)
+
+
+_timeout_header = settings.request_timeout_header.lower().encode("latin-1")
+
+
+def _request_timeout(scope: Scope) -> float:
+    for name, value in scope["headers"]:
+        if name == _timeout_header:
+            try:
+                timeout = float(value)
+            except ValueError:
+                break
+            if math.isfinite(timeout) and timeout > 0:
+                return min(timeout, settings.request_max_timeout)
+            break
+    return settings.request_timeout
+
+
+class RequestDeadlineMiddleware:
+    """
+    ASGI middleware giving each request under ``path_prefix`` a deadline and
+    cancelling its handling when the client disconnects.
+
+    The deadline is ``request_timeout`` seconds after arrival, or the seconds of the
+    ``request_timeout_header`` header capped at ``request_max_timeout``; the stages
+    downstream read it through remaining() and check_deadline().
+
+    Once the request body was read, the connection is watched for a disconnect, and
+    a request whose client went away before its response started is cancelled. Work
+    shared with other requests carries on for them. A streamed response that already
+    started ends through the disconnect handling of the response itself.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        global abandoned_requests
+        token = _deadline.set(time.monotonic() + _request_timeout(scope))
+        task = asyncio.current_task()
+        disconnected = asyncio.Event()
+        watcher: asyncio.Task | None = None
+        response_started = False
+        abandoned = False
+
+        async def watch_disconnect() -> None:
+            nonlocal abandoned
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+            if not response_started:
+                abandoned = True
+                task.cancel()
+
+        async def receive_wrapper() -> Message:
+            nonlocal watcher
+            if watcher is not None:
+                # The watcher owns the connection once the body is read.
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                watcher = asyncio.get_running_loop().create_task(watch_disconnect())
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except asyncio.CancelledError:
+            if not abandoned or task.uncancel() > 0:
+                raise
+            abandoned_requests += 1
+        finally:
+            _deadline.reset(token)
+            if watcher is not None:
+                watcher.cancel()
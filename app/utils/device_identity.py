@@ -0,0 +1,42 @@
+from app.schemas.location_retrieval import Device
+
+
+def device_key(device: Device) -> str:
+    """
+    Returns a normalized key identifying the device towards the NEF.
+
+    The key is built from the identifier the NEF subscription is resolved with, in
+    the order msisdn, external identifier, IPv4 address, IPv6 address, so requests
+    naming the same subscriber share one key regardless of formatting (e.g. the
+    leading '+' of the phone number).
+
+    args:
+        device: CAMARA device object, at least one identifier is guaranteed by its validator.
+
+    returns:
+        string key such as "msisdn:306912345678".
+    """
+    if device.phoneNumber is not None:
+        return "msisdn:" + device.phoneNumber.root.lstrip("+")
+    if device.networkAccessIdentifier is not None:
+        return "extid:" + device.networkAccessIdentifier.root.lower()
+    if device.ipv4Address is not None:
+        ipv4 = device.ipv4Address.root
+        private_address = ipv4.privateAddress.root if ipv4.privateAddress is not None else ""
+        public_port = ipv4.publicPort.root if ipv4.publicPort is not None else ""
+        return f"ipv4:{ipv4.publicAddress.root}/{private_address}/{public_port}"
+    return "ipv6:" + device.ipv6Address.root.compressed
+
+
+def report_device_key(msisdn: str | None, external_id: str | None) -> str | None:
+    """
+    Returns the device key of a NEF monitoring event report, if it names the UE.
+
+    Reports identify the UE by msisdn or external identifier only, so the key is
+    aligned with device_key for devices addressed by those identifiers.
+    """
+    if msisdn:
+        return "msisdn:" + msisdn.lstrip("+")
+    if external_id:
+        return "extid:" + external_id.lower()
+    return None
@@ -1,29 +1,130 @@
-from fastapi import Request
+from functools import lru_cache
+from fastapi import Request, Response
 from fastapi.exceptions import RequestValidationError
-from app.schemas.location_retrieval import BadRequestError,NotFound404, UnauthorizedError
-from app.utils.errors.exception_errors import BadRequestException,LocationInfoNotFoundException,NotFoundException, UnauthorizedException, CoreUnauthorizedException
+from app.schemas.location_retrieval import BadRequestError,NotFound404, UnauthorizedError, ForbiddenError, UnprocessableEntityError, ServiceUnavailableError, TooManyRequestsError, GatewayTimeoutError, ErrorInfo
+from app.schemas.monitoring_event import LocationFailureCause
+from app.utils.errors.exception_errors import LocationInfoNotFoundException, LocationFailureException, CoreUnauthorizedException, LocationMaxAgeNotFulfilledException, LocationMaxSurfaceNotFulfilledException, NetworkPlatformError, CircuitOpenException, OverloadedException, RateLimitedException, DeadlineExceededException
 from app.utils.logger import get_app_logger
+from app.utils.response_encoding import encode_json, APPLICATION_JSON
 
 logger = get_app_logger(__name__)
 
-def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.error("Validation error: %s",exc)
+BAD_REQUEST_ERROR = BadRequestError.model_validate({'status': 400, 'code': 'INVALID_ARGUMENT', 'message': 'Client specified an invalid argument, request body or query param.'})
+NOT_FOUND_ERROR = NotFound404.model_validate({'status': 404, 'code': 'IDENTIFIER_NOT_FOUND', 'message': 'Device identifier not found.'})
+FORBIDDEN_ERROR = ForbiddenError.model_validate({'status': 403, 'code': 'PERMISSION_DENIED', 'message': 'Client does not have sufficient permissions to perform this action.'})
+SERVICE_NOT_APPLICABLE_ERROR = UnprocessableEntityError.model_validate({'status': 422, 'code': 'SERVICE_NOT_APPLICABLE', 'message': 'Service is not available for the provided identifier.'})
+UNAUTHORIZED_ERROR = UnauthorizedError.model_validate({'status': 401, 'code': 'UNAUTHENTICATED', 'message': 'Request not authenticated due to missing, invalid, or expired credentials.'})
+MAX_AGE_ERROR = UnprocessableEntityError.model_validate({'status': 422, 'code': 'LOCATION_RETRIEVAL.UNABLE_TO_FULFILL_MAX_AGE', 'message': 'Unable to provide expected freshness for location'})
+MAX_SURFACE_ERROR = UnprocessableEntityError.model_validate({'status': 422, 'code': 'LOCATION_RETRIEVAL.UNABLE_TO_FULFILL_MAX_SURFACE', 'message': 'Unable to provide accurate acceptable surface for location.'})
+TOO_MANY_REQUESTS_ERROR = TooManyRequestsError.model_validate({'status': 429, 'code': 'TOO_MANY_REQUESTS', 'message': 'Rate limit reached.'})
+SERVICE_UNAVAILABLE_ERROR = ServiceUnavailableError.model_validate({'status': 503, 'code': 'UNAVAILABLE', 'message': 'Service Unavailable.'})
+GATEWAY_TIMEOUT_ERROR = GatewayTimeoutError.model_validate({'status': 504, 'code': 'TIMEOUT', 'message': 'Request timeout exceeded.'})
+INTERNAL_ERROR = ErrorInfo.model_validate({'status': 500, 'code': 'INTERNAL', 'message': 'Unknown server error. Typically a server bug.'})
 
-    error_response_instance = BadRequestError.model_validate({'status': 400, 'code': 'INVALID_ARGUMENT', 'message': 'Client specified an invalid argument, request body or query param.'})
+# CAMARA error of a device the NEF could not locate, by failure cause; the other causes are answered NOT_FOUND_ERROR.
+_ERRORS_BY_FAILURE_CAUSE: dict[str, ErrorInfo] = {
+    LocationFailureCause.position_denied.value: FORBIDDEN_ERROR,
+    LocationFailureCause.unsupported_by_ue.value: SERVICE_NOT_APPLICABLE_ERROR,
+}
 
-    raise BadRequestException(error_response_instance)
+_ERRORS_BY_EXCEPTION: dict[type[Exception], ErrorInfo] = {
+    RequestValidationError: BAD_REQUEST_ERROR,
+    LocationInfoNotFoundException: NOT_FOUND_ERROR,
+    CoreUnauthorizedException: UNAUTHORIZED_ERROR,
+    LocationMaxAgeNotFulfilledException: MAX_AGE_ERROR,
+    LocationMaxSurfaceNotFulfilledException: MAX_SURFACE_ERROR,
+    RateLimitedException: TOO_MANY_REQUESTS_ERROR,
+    DeadlineExceededException: GATEWAY_TIMEOUT_ERROR,
+    NetworkPlatformError: SERVICE_UNAVAILABLE_ERROR,
+}
 
+def error_info_from_exception(exc: Exception) -> ErrorInfo:
+    """
+    Returns the CAMARA error the given exception is answered with.
 
-def location_info_exception_handler(request: Request, exc: LocationInfoNotFoundException):
-    logger.error("Location info not found: %s",exc)
+    Used where an error is reported inside a response body instead of through the
+    registered exception handlers, e.g. per device in a batch retrieval.
+    """
+    if isinstance(exc, LocationFailureException):
+        return location_failure_error(exc.cause)
+    for exc_type, error_info in _ERRORS_BY_EXCEPTION.items():
+        if isinstance(exc, exc_type):
+            return error_info
+    return INTERNAL_ERROR
 
-    error_response_instance = NotFound404.model_validate({'status': 404, 'code': 'IDENTIFIER_NOT_FOUND', 'message': 'Device identifier not found.'})
+def location_failure_error(cause: str) -> ErrorInfo:
+    """Returns the CAMARA error a device the NEF could not locate for `cause` is answered with."""
+    return _ERRORS_BY_FAILURE_CAUSE.get(cause, NOT_FOUND_ERROR)
 
-    raise NotFoundException(error_response_instance)
+@lru_cache(maxsize=None)
+def _encoded_error_detail(message: str) -> bytes:
+    return encode_json({"detail": message})
 
-def unauthorized_exception_handler(request: Request, exc: CoreUnauthorizedException):
+def camara_error_response(error_info: ErrorInfo, retry_after: int | None = None) -> Response:
+    """
+    Response of a CAMARA error, as sent for the corresponding CAMARA HTTPException.
+
+    The bodies of the few CAMARA errors are encoded once and reused.
+    """
+    headers = {"code": error_info.code}
+    if retry_after is not None:
+        headers["Retry-After"] = str(retry_after)
+    return Response(_encoded_error_detail(error_info.message), status_code=error_info.status,
+                    headers=headers, media_type=APPLICATION_JSON)
+
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    logger.info("Validation error: %s",exc)
+
+    return camara_error_response(BAD_REQUEST_ERROR)
+
+
+async def location_info_exception_handler(request: Request, exc: LocationInfoNotFoundException):
+    logger.info("Location info not found: %s",exc)
+
+    return camara_error_response(NOT_FOUND_ERROR)
+
+async def location_failure_exception_handler(request: Request, exc: LocationFailureException):
+    logger.info("Location failure: %s",exc)
+
+    return camara_error_response(location_failure_error(exc.cause))
+
+async def unauthorized_exception_handler(request: Request, exc: CoreUnauthorizedException):
     logger.error("Unauthorized access: %s",exc)
-    
-    error_response_instance = UnauthorizedError.model_validate({'status': 401, 'code': 'UNAUTHENTICATED', 'message': 'Request not authenticated due to missing, invalid, or expired credentials.'})
 
-    raise UnauthorizedException(error_response_instance)
\ No newline at end of file
+    return camara_error_response(UNAUTHORIZED_ERROR)
+
+async def max_age_exception_handler(request: Request, exc: LocationMaxAgeNotFulfilledException):
+    logger.info("Location freshness not fulfilled: %s",exc)
+
+    return camara_error_response(MAX_AGE_ERROR)
+
+async def max_surface_exception_handler(request: Request, exc: LocationMaxSurfaceNotFulfilledException):
+    logger.info("Location surface not fulfilled: %s",exc)
+
+    return camara_error_response(MAX_SURFACE_ERROR)
+
+
+async def network_platform_exception_handler(request: Request, exc: NetworkPlatformError):
+    logger.error("Network platform unavailable: %s",exc)
+
+    return camara_error_response(SERVICE_UNAVAILABLE_ERROR)
+
+async def circuit_open_exception_handler(request: Request, exc: CircuitOpenException):
+    logger.warning("Failing fast: %s",exc)
+
+    return camara_error_response(SERVICE_UNAVAILABLE_ERROR, retry_after=exc.retry_after)
+
+async def overloaded_exception_handler(request: Request, exc: OverloadedException):
+    logger.warning("Shedding load: %s",exc)
+
+    return camara_error_response(SERVICE_UNAVAILABLE_ERROR, retry_after=exc.retry_after)
+
+async def rate_limited_exception_handler(request: Request, exc: RateLimitedException):
+    logger.info("Rate limited: %s",exc)
+
+    return camara_error_response(TOO_MANY_REQUESTS_ERROR, retry_after=exc.retry_after)
+
+async def deadline_exceeded_exception_handler(request: Request, exc: DeadlineExceededException):
+    logger.info("Deadline exceeded: %s",exc)
+
+    return camara_error_response(GATEWAY_TIMEOUT_ERROR)
@@ -1,5 +1,5 @@
 from fastapi import HTTPException
-from app.schemas.location_retrieval import BadRequestError, UnauthorizedError,ForbiddenError,NotFound404,UnprocessableEntityError
+from app.schemas.location_retrieval import BadRequestError, UnauthorizedError,ForbiddenError,NotFound404,UnprocessableEntityError,ServiceUnavailableError
 
 
 ## Core Level Exceptions
@@ -9,12 +9,50 @@ class CoreHttpError(Exception):
 
 class NetworkPlatformError(Exception):
     pass
+
+class CircuitOpenException(NetworkPlatformError):
+    def __init__(self, dependency: str, retry_after: int):
+        super().__init__(f"Circuit for {dependency} is open, retry after {retry_after}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+class OverloadedException(NetworkPlatformError):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class RateLimitedException(Exception):
+    def __init__(self, client: str, retry_after: int):
+        super().__init__(f"Client {client} exceeded its request rate, retry after {retry_after}s")
+        self.client = client
+        self.retry_after = retry_after
+
+class DeadlineExceededException(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded before or during {stage}")
+        self.stage = stage
+
 class LocationInfoNotFoundException(Exception):
     pass
 
+# Failure causes of LocationFailureException besides the NEF locFailureCause values.
+NEF_NOT_FOUND = "NEF_NOT_FOUND"
+NO_LOCATION_INFO = "NO_LOCATION_INFO"
+
+class LocationFailureException(LocationInfoNotFoundException):
+    def __init__(self, cause: str, message: str | None = None):
+        super().__init__(message or f"Device could not be located: {cause}")
+        self.cause = cause
+
 class CoreUnauthorizedException(Exception):
     pass
 
+class LocationMaxAgeNotFulfilledException(Exception):
+    pass
+
+class LocationMaxSurfaceNotFulfilledException(Exception):
+    pass
+
 ### CAMARA Exceptions
 class BadRequestException(HTTPException):
     def __init__(self, bad_request_error: BadRequestError):
@@ -35,3 +73,11 @@ class NotFoundException(HTTPException):
 class UnprocessableEntityException(HTTPException):
     def __init__(self, unprocessable_entity_error: UnprocessableEntityError):
         super().__init__(status_code=unprocessable_entity_error.status, detail=unprocessable_entity_error.message, headers={"code": unprocessable_entity_error.code})
+
+
+class ServiceUnavailableException(HTTPException):
+    def __init__(self, service_unavailable_error: ServiceUnavailableError, retry_after: int | None = None):
+        headers = {"code": service_unavailable_error.code}
+        if retry_after is not None:
+            headers["Retry-After"] = str(retry_after)
+        super().__init__(status_code=service_unavailable_error.status, detail=service_unavailable_error.message, headers=headers)
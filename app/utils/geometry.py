@@ -0,0 +1,319 @@
+"""
+Surface, simplification and enclosing circles of location areas.
+
+Polygons are handled as NumPy arrays of latitudes and longitudes in degrees, so the
+surfaces of many polygons are computed in a single vectorized pass.
+"""
+import math
+import random
+from collections.abc import Sequence
+
+import numpy as np
+
+from app.schemas.location_retrieval import Area, Circle, Polygon
+
+# Mean Earth radius (IUGG) in meters.
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def polygon_areas(
+    latitudes: Sequence[float] | np.ndarray,
+    longitudes: Sequence[float] | np.ndarray,
+    offsets: Sequence[int] | np.ndarray,
+) -> np.ndarray:
+    """
+    Computes the surfaces of several polygons on a spherical Earth.
+
+    The vertices of all polygons are given as one flat array, polygon ``i`` starting
+    at vertex ``offsets[i]`` and ending where the next one starts. Each polygon is
+    closed implicitly and may cross the antimeridian, but must not enclose a pole.
+
+    args:
+        latitudes: vertex latitudes in degrees.
+        longitudes: vertex longitudes in degrees.
+        offsets: index of the first vertex of every polygon, in increasing order.
+
+    returns:
+        surface of every polygon in square meters.
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    starts = np.asarray(offsets, dtype=np.intp)
+    ends = np.append(starts[1:], lat.size)
+
+    # Index of the vertex following each vertex, wrapping around within its polygon.
+    following = np.arange(1, lat.size + 1)
+    following[ends - 1] = starts
+
+    # Integral of sin(latitude) along the edges, with longitude steps taken the short
+    # way around so polygons crossing the antimeridian are measured correctly.
+    sin_lat = np.sin(lat)
+    dlon = np.remainder(lon[following] - lon + np.pi, 2 * np.pi) - np.pi
+    edge_terms = dlon * (sin_lat + sin_lat[following])
+    return np.abs(np.add.reduceat(edge_terms, starts)) * (EARTH_RADIUS_M ** 2 / 2)
+
+
+def polygon_area(latitudes: Sequence[float] | np.ndarray, longitudes: Sequence[float] | np.ndarray) -> float:
+    """Surface in square meters of one polygon, see polygon_areas."""
+    return float(polygon_areas(latitudes, longitudes, (0,))[0])
+
+
+def area_surface(area: Area) -> float:
+    """Surface in square meters of a CAMARA area."""
+    if isinstance(area, Polygon):
+        points = area.boundary.root
+        return polygon_area([point.latitude for point in points], [point.longitude for point in points])
+    if isinstance(area, Circle):
+        return math.pi * area.radius ** 2
+    raise ValueError(f"Unsupported area type {area.areaType}")
+
+
+def _convex_hull(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Indices of the convex hull vertices in counter-clockwise order (monotone chain)."""
+    order = np.lexsort((y, x))
+
+    def cross(o: int, a: int, b: int) -> float:
+        return (x[a] - x[o]) * (y[b] - y[o]) - (y[a] - y[o]) * (x[b] - x[o])
+
+    lower: list[int] = []
+    for index in order:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], index) <= 0:
+            lower.pop()
+        lower.append(index)
+    upper: list[int] = []
+    for index in order[::-1]:
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], index) <= 0:
+            upper.pop()
+        upper.append(index)
+    return np.array(lower[:-1] + upper[:-1], dtype=np.intp)
+
+
+def _remove_edges(x: np.ndarray, y: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces a convex counter-clockwise polygon to max_points vertices, enclosing it.
+
+    Every step replaces the two ends of one edge by the intersection of the lines of
+    the neighbouring edges, choosing the edge whose replacement adds the least area.
+    """
+    while x.size > max_points:
+        # Edge i runs from vertex i to vertex i + 1, between edges i - 1 and i + 1.
+        x_next, y_next = np.roll(x, -1), np.roll(y, -1)
+        edge_x, edge_y = x_next - x, y_next - y
+        before_x, before_y = np.roll(edge_x, 1), np.roll(edge_y, 1)
+        after_x, after_y = np.roll(edge_x, -1), np.roll(edge_y, -1)
+
+        turn = before_x * after_y - before_y * after_x
+        with np.errstate(divide="ignore", invalid="ignore"):
+            reach = (edge_x * after_y - edge_y * after_x) / turn
+        apex_x, apex_y = x + reach * before_x, y + reach * before_y
+        added_area = np.abs((apex_x - x) * edge_y - (apex_y - y) * edge_x) / 2
+        # The neighbouring edges only meet beyond the edge when they turn by less than
+        # half a revolution together.
+        added_area[~(turn > 0)] = np.inf
+
+        edge = int(np.argmin(added_area))
+        if not np.isfinite(added_area[edge]):
+            raise ValueError("Polygon cannot be reduced while enclosing it")
+        following = (edge + 1) % x.size
+        x[edge], y[edge] = apex_x[edge], apex_y[edge]
+        x, y = np.delete(x, following), np.delete(y, following)
+    return x, y
+
+
+def enclosing_polygon(
+    latitudes: Sequence[float] | np.ndarray,
+    longitudes: Sequence[float] | np.ndarray,
+    max_points: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Simplifies a polygon to at most max_points vertices while still enclosing it.
+
+    The vertices are projected on an equirectangular plane centred on the polygon,
+    replaced by their convex hull, and the hull edges adding the least area are
+    collapsed until few enough vertices remain. For cell-sized polygons the plane
+    edges stay within centimetres of the geodesic ones.
+
+    args:
+        latitudes: vertex latitudes in degrees.
+        longitudes: vertex longitudes in degrees.
+        max_points: maximum number of vertices of the result, at least 5.
+
+    returns:
+        latitudes and longitudes of the enclosing polygon, counter-clockwise.
+    """
+    lat = np.asarray(latitudes, dtype=np.float64)
+    lon = np.asarray(longitudes, dtype=np.float64)
+    lat0, lon0 = lat.mean(), lon[0]
+    scale = np.cos(np.radians(lat0))
+
+    # Longitudes are unwrapped around the first vertex so the antimeridian is not a seam.
+    x = (np.remainder(lon - lon0 + 180, 360) - 180) * scale
+    y = lat - lat0
+
+    hull = _convex_hull(x, y)
+    if hull.size < 3:
+        raise ValueError("Polygon has no surface")
+    x, y = _remove_edges(x[hull], y[hull], max_points)
+
+    result_lon = np.remainder(x / scale + lon0 + 180, 360) - 180
+    return y + lat0, result_lon
+
+
+# Relative slack when testing whether a point lies in a circle, absorbing rounding errors.
+_CIRCLE_TOLERANCE = 1e-9
+
+
+def _from_tangent_plane(x: float, y: float, lat0: float, lon0: float) -> tuple[float, float]:
+    latitude = lat0 + math.degrees(y / EARTH_RADIUS_M)
+    longitude = lon0 + math.degrees(x / (EARTH_RADIUS_M * math.cos(math.radians(lat0))))
+    return latitude, (longitude + 180) % 360 - 180
+
+
+def _circumcircle(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> tuple[float, float, float]:
+    d = 2 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if d == 0:
+        # Collinear points: the circle over the two farthest apart.
+        return max(
+            ((ax + bx) / 2, (ay + by) / 2, math.hypot(ax - bx, ay - by) / 2),
+            ((ax + cx) / 2, (ay + cy) / 2, math.hypot(ax - cx, ay - cy) / 2),
+            ((bx + cx) / 2, (by + cy) / 2, math.hypot(bx - cx, by - cy) / 2),
+            key=lambda circle: circle[2],
+        )
+    a2, b2, c2 = ax * ax + ay * ay, bx * bx + by * by, cx * cx + cy * cy
+    ux = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    uy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    return ux, uy, math.hypot(ax - ux, ay - uy)
+
+
+def _circumcircles(
+    ax: np.ndarray, ay: np.ndarray, bx: np.ndarray, by: np.ndarray, cx: np.ndarray, cy: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized _circumcircle."""
+    d = 2 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    a2, b2, c2 = ax * ax + ay * ay, bx * bx + by * by, cx * cx + cy * cy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ux = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+        uy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    radius = np.hypot(ax - ux, ay - uy)
+    collinear = d == 0
+    if collinear.any():
+        for polygon in np.flatnonzero(collinear):
+            ux[polygon], uy[polygon], radius[polygon] = _circumcircle(
+                ax[polygon], ay[polygon], bx[polygon], by[polygon], cx[polygon], cy[polygon])
+    return ux, uy, radius
+
+
+def minimum_enclosing_circle(
+    latitudes: Sequence[float] | np.ndarray,
+    longitudes: Sequence[float] | np.ndarray,
+) -> tuple[float, float, float]:
+    """
+    Computes the smallest circle enclosing a polygon, on the plane tangent to it.
+
+    Welzl's randomized incremental algorithm takes expected linear time: after the
+    vertices are shuffled, a vertex outside the circle so far is on the new circle,
+    which is rebuilt from the vertices seen before it.
+
+    args:
+        latitudes: vertex latitudes in degrees.
+        longitudes: vertex longitudes in degrees.
+
+    returns:
+        latitude and longitude of the centre in degrees, and radius in metres.
+    """
+    # Plain floats: for the few vertices of a location polygon they beat NumPy overheads.
+    latitudes, longitudes = list(map(float, latitudes)), list(map(float, longitudes))
+    lat0, lon0 = sum(latitudes) / len(latitudes), longitudes[0]
+    x_scale = math.radians(EARTH_RADIUS_M * math.cos(math.radians(lat0)))
+    y_scale = math.radians(EARTH_RADIUS_M)
+    points = [
+        (((longitude - lon0 + 180) % 360 - 180) * x_scale, (latitude - lat0) * y_scale)
+        for latitude, longitude in zip(latitudes, longitudes)
+    ]
+    random.shuffle(points)
+
+    slack = (1 + _CIRCLE_TOLERANCE) ** 2
+    cx, cy, r2 = points[0][0], points[0][1], 0.0
+    for i, (ix, iy) in enumerate(points):
+        if (ix - cx) ** 2 + (iy - cy) ** 2 <= r2 * slack:
+            continue
+        cx, cy, r2 = ix, iy, 0.0
+        for j in range(i):
+            jx, jy = points[j]
+            if (jx - cx) ** 2 + (jy - cy) ** 2 <= r2 * slack:
+                continue
+            cx, cy, r2 = (ix + jx) / 2, (iy + jy) / 2, ((ix - jx) ** 2 + (iy - jy) ** 2) / 4
+            for k in range(j):
+                kx, ky = points[k]
+                if (kx - cx) ** 2 + (ky - cy) ** 2 > r2 * slack:
+                    cx, cy, radius = _circumcircle(ix, iy, jx, jy, kx, ky)
+                    r2 = radius * radius
+    circle = (cx, cy, math.sqrt(r2))
+
+    latitude, longitude = _from_tangent_plane(circle[0], circle[1], lat0, lon0)
+    return latitude, longitude, circle[2]
+
+
+def minimum_enclosing_circles(
+    latitudes: Sequence[float] | np.ndarray,
+    longitudes: Sequence[float] | np.ndarray,
+    offsets: Sequence[int] | np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes the smallest enclosing circles of several polygons at once.
+
+    Runs the incremental algorithm of minimum_enclosing_circle on all polygons in
+    lockstep, each step updating the circles of the polygons it applies to, which
+    suits the few vertices of location polygons. Polygons are given as for
+    polygon_areas.
+
+    returns:
+        centre latitudes and longitudes in degrees, and radii in metres.
+    """
+    lat = np.asarray(latitudes, dtype=np.float64)
+    lon = np.asarray(longitudes, dtype=np.float64)
+    starts = np.asarray(offsets, dtype=np.intp)
+    counts = np.diff(np.append(starts, lat.size))
+    width = int(counts.max())
+
+    # Polygons padded to the same vertex count by repeating their first vertex, which
+    # leaves their enclosing circle unchanged.
+    # The vertex order is shuffled like in minimum_enclosing_circle.
+    positions = np.random.permutation(width)
+    vertex = np.where(positions < counts[:, None], starts[:, None] + positions, starts[:, None])
+    lat0 = np.add.reduceat(lat, starts) / counts
+    lon0 = lon[starts]
+    x = np.radians(np.remainder(lon[vertex] - lon0[:, None] + 180, 360) - 180) * (
+        EARTH_RADIUS_M * np.cos(np.radians(lat0))[:, None])
+    y = np.radians(lat[vertex] - lat0[:, None]) * EARTH_RADIUS_M
+
+    cx, cy, r = x[:, 0].copy(), y[:, 0].copy(), np.zeros(len(starts))
+
+    def outside(polygons: np.ndarray, column: int) -> np.ndarray:
+        """The polygons whose vertex in the column lies outside their current circle."""
+        distance = np.hypot(x[polygons, column] - cx[polygons], y[polygons, column] - cy[polygons])
+        return polygons[distance > r[polygons] * (1 + _CIRCLE_TOLERANCE)]
+
+    # Each loop level only works on the polygons whose circle it rebuilds, which get
+    # fewer as vertices are added, so the work per polygon stays close to linear.
+    every = np.arange(len(starts))
+    for i in range(1, width):
+        at_i = outside(every, i)
+        if not at_i.size:
+            continue
+        cx[at_i], cy[at_i], r[at_i] = x[at_i, i], y[at_i, i], 0.0
+        for j in range(i):
+            at_j = outside(at_i, j)
+            if not at_j.size:
+                continue
+            ix, iy, jx, jy = x[at_j, i], y[at_j, i], x[at_j, j], y[at_j, j]
+            cx[at_j], cy[at_j], r[at_j] = (ix + jx) / 2, (iy + jy) / 2, np.hypot(ix - jx, iy - jy) / 2
+            for k in range(j):
+                at_k = outside(at_j, k)
+                if at_k.size:
+                    cx[at_k], cy[at_k], r[at_k] = _circumcircles(
+                        x[at_k, i], y[at_k, i], x[at_k, j], y[at_k, j], x[at_k, k], y[at_k, k])
+
+    centre_lat = lat0 + np.degrees(cy / EARTH_RADIUS_M)
+    centre_lon = lon0 + np.degrees(cx / (EARTH_RADIUS_M * np.cos(np.radians(lat0))))
+    return centre_lat, np.remainder(centre_lon + 180, 360) - 180, r
@@ -0,0 +1,153 @@
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from app.schemas.location_retrieval import Location, Polygon
+from app.config import get_settings
+from app.utils.shared_location_cache import SharedLocationCache
+from app.utils.location_size import estimate_location_size
+from app.utils.logger import get_app_logger
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+def location_age_seconds(location: Location, now: datetime | None = None) -> float:
+    """Returns the seconds elapsed since the location's lastLocationTime."""
+    now = now or datetime.now(timezone.utc)
+    return (now - location.lastLocationTime.root).total_seconds()
+
+
+@dataclass(slots=True)
+class _CacheEntry:
+    location: Location
+    size: int
+
+
+class LocationCache:
+    """
+    Bounded LRU cache of the last CAMARA Location built per device key.
+
+    Entries are evicted in least-recently-used order once either the entry count or
+    the estimated memory footprint exceeds its cap, and are dropped on access once
+    their lastLocationTime is older than the TTL.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, max_age: int | None = None) -> Location | None:
+        """
+        Returns the cached location of the device if it satisfies max_age.
+
+        args:
+            key: device key, see app.utils.device_identity.device_key.
+            max_age: maximum accepted age in seconds, None accepts any age within the TTL.
+
+        returns:
+            the cached Location, or None on a miss.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        age = location_age_seconds(entry.location)
+        if age > self.ttl:
+            self._remove(key)
+            self.misses += 1
+            return None
+        if max_age is not None and age > max_age:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.location
+
+    def put(self, key: str, location: Location) -> None:
+        """Stores the location of the device unless a newer one is already cached."""
+        current = self._entries.get(key)
+        if current is not None and current.location.lastLocationTime.root > location.lastLocationTime.root:
+            return
+        if current is not None:
+            self._remove(key)
+
+        entry = _CacheEntry(location=location, size=estimate_location_size(location))
+        self._entries[key] = entry
+        self.current_bytes += entry.size
+        self._evict()
+
+    def invalidate(self, key: str) -> None:
+        """Drops the cached location of the device, if any."""
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters, e.g. for logging or metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes):
+            key, entry = self._entries.popitem(last=False)
+            self.current_bytes -= entry.size
+            self.evictions += 1
+
+
+if settings.location_cache_layout not in ("objects", "columnar"):
+    raise ValueError(f"Unknown location cache layout {settings.location_cache_layout!r}, expected objects or columnar")
+
+if settings.workers > 1:
+    if settings.location_cache_layout != "objects":
+        log.warning("LOCATION_CACHE_LAYOUT=%s is ignored with %d workers, which share one location cache",
+                    settings.location_cache_layout, settings.workers)
+    # Every worker serves the locations any of them fetched.
+    location_cache = SharedLocationCache(
+        path=os.path.join(settings.shared_state_dir, "location_cache.bin"),
+        max_entries=settings.location_cache_max_entries,
+        max_bytes=settings.location_cache_max_bytes,
+        ttl=settings.location_cache_ttl,
+        decoded_entries=settings.location_cache_decoded_entries,
+    )
+elif settings.location_cache_layout == "columnar":
+    from app.utils.columnar_location_cache import ColumnarLocationCache # loads numpy
+
+    location_cache = ColumnarLocationCache(
+        max_entries=settings.location_cache_max_entries,
+        max_bytes=settings.location_cache_max_bytes,
+        ttl=settings.location_cache_ttl,
+        coordinate_dtype=settings.location_cache_coordinates,
+        decoded_entries=settings.location_cache_decoded_entries,
+    )
+else:
+    location_cache = LocationCache(
+        max_entries=settings.location_cache_max_entries,
+        max_bytes=settings.location_cache_max_bytes,
+        ttl=settings.location_cache_ttl,
+    )
@@ -0,0 +1,13 @@
+from app.schemas.location_retrieval import Location, Polygon
+
+# Rough in-memory footprint of a cached Location, measured with tracemalloc on
+# pydantic 2.11: a fixed cost for the Location/area/time objects plus each Point.
+ENTRY_BASE_BYTES = 1800
+POINT_BYTES = 540
+
+
+def estimate_location_size(location: Location) -> int:
+    """Returns the approximate bytes a built Location model holds in memory."""
+    if isinstance(location.area, Polygon):
+        return ENTRY_BASE_BYTES + POINT_BYTES * len(location.area.boundary.root)
+    return ENTRY_BASE_BYTES + POINT_BYTES
@@ -1,44 +1,176 @@
+import atexit
+import copy
+import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from app.config import get_settings
 
 
 settings = get_settings()
 
+_LOG_FORMAT = '%(asctime)s,%(msecs)03d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s'
+_LOG_DATE_FORMAT = '%Y-%m-%d:%H:%M:%S'
+
+_pipeline_lock = threading.Lock()
+_queue_handler: QueueHandler | None = None
+_queue_listener: QueueListener | None = None
+
+
 def check_log_path_exists() -> None:
     """Ensure the log directory exists."""
     if not os.path.exists(settings.log_directory_path):
         os.makedirs(settings.log_directory_path)
 
 
-def get_app_logger(logger_name: str) -> logging.Logger:
-    """Return a singleton application logger with file and stream handlers."""
-    check_log_path_exists()
-    logger = logging.getLogger(logger_name)
-    if not logger.handlers:
-        logger.setLevel(logging.DEBUG)
-        formatter = logging.Formatter(
-            '%(asctime)s,%(msecs)03d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
-            datefmt='%Y-%m-%d:%H:%M:%S'
-        )
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, _LOG_DATE_FORMAT) + f",{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class CallSiteRateLimitFilter(logging.Filter):
+    """
+    Samples high-volume DEBUG/INFO records per call site.
+
+    At most ``max_per_second`` records of each logging call site (file and line) pass
+    per second; the number of records dropped is appended to the next one that passes.
+    WARNING and above are never dropped.
+    """
+
+    def __init__(self, max_per_second: int):
+        super().__init__()
+        self.max_per_second = max_per_second
+        self._windows: dict[tuple[str, int], list[int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        second = int(record.created)
+        window = self._windows.setdefault((record.pathname, record.lineno), [second, 0, 0])
+        if window[0] != second:
+            window[0] = second
+            window[1] = 0
+        if window[1] >= self.max_per_second:
+            window[2] += 1
+            return False
+        window[1] += 1
+        if window[2]:
+            record.msg = f"{record.msg} (+{window[2]} similar messages sampled out)"
+            window[2] = 0
+        return True
+
+
+class _DeferredFormatQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without formatting them on the caller's thread.
+
+    Only the message arguments are merged, so later mutations of the arguments do not
+    change the logged text; timestamps, layout and tracebacks are formatted by the
+    listener's handlers.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _build_formatter() -> logging.Formatter:
+    if settings.log_json:
+        return JsonFormatter()
+    return logging.Formatter(_LOG_FORMAT, datefmt=_LOG_DATE_FORMAT)
+
+
+def _log_file_path() -> str:
+    # Rotation renames the file, so several worker processes must not rotate the same one.
+    if settings.workers > 1:
+        return f"{settings.log_filename_path}.{os.getpid()}.log"
+    return settings.log_filename_path + ".log"
+
+
+def _get_queue_handler() -> QueueHandler:
+    """Starts the process-wide logging pipeline on first use and returns its queue handler."""
+    global _queue_handler, _queue_listener
+    with _pipeline_lock:
+        if _queue_handler is not None:
+            return _queue_handler
+
+        check_log_path_exists()
+        formatter = _build_formatter()
         file_handler = RotatingFileHandler(
-            settings.log_filename_path + ".log",
+            _log_file_path(),
             maxBytes=10*1024*1024,
             backupCount=5
         )
-        
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
-        
+
         stream_handler = logging.StreamHandler()
         stream_handler.setLevel(logging.INFO)
         stream_handler.setFormatter(formatter)
-        
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _queue_listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+        _queue_listener.start()
+        atexit.register(stop_logging_pipeline)
+
+        _queue_handler = _DeferredFormatQueueHandler(log_queue)
+        if settings.log_sample_per_second > 0:
+            _queue_handler.addFilter(CallSiteRateLimitFilter(settings.log_sample_per_second))
+        return _queue_handler
+
+
+class _DeferredPipelineHandler(logging.Handler):
+    """
+    Hands records to the logging pipeline, starting it with the first record.
+
+    Importing a module that creates a logger therefore neither creates the log
+    directory and file nor starts the writer thread.
+    """
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        return _get_queue_handler().handle(record)
+
+
+_deferred_handler = _DeferredPipelineHandler()
+
+
+def stop_logging_pipeline() -> None:
+    """Flushes the queued records and stops the writer thread."""
+    global _queue_listener
+    with _pipeline_lock:
+        if _queue_listener is not None:
+            _queue_listener.stop()
+            _queue_listener = None
+
+
+def get_app_logger(logger_name: str) -> logging.Logger:
+    """
+    Return an application logger feeding the process-wide logging pipeline.
+
+    All application loggers share one queue handler; a single writer thread drains
+    the queue into one rotating file handler and the console, so requests never wait
+    on disk I/O for logging. The pipeline is started by the first logged record.
+    """
+    logger = logging.getLogger(logger_name)
+    if not logger.handlers:
+        logger.setLevel(settings.log_level)
+        logger.addHandler(_deferred_handler)
         logger.propagate = False
-        
-        return logger
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,258 @@
+import functools
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labelnames: tuple[str, ...], labelvalues: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}",
+                *self._samples()]
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter; label values are passed positionally in labelnames order."""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Gauge that can go up and down."""
+    metric_type = "gauge"
+
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        self._values[labelvalues] = value
+
+
+class CallbackMetric(_Metric):
+    """Metric whose samples are read from a callback at scrape time, e.g. counters kept by another component."""
+
+    def __init__(self, name: str, documentation: str, metric_type: str,
+                 callback: Callable[[], dict[tuple[str, ...], float]], labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.metric_type = metric_type
+        self.callback = callback
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in self.callback().items()]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; observing costs one bisect and two additions."""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Per label set: per-bucket (non-cumulative) counts with a trailing +Inf slot, and the sum.
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        counts = self._counts.get(labelvalues)
+        if counts is None:
+            counts = self._counts[labelvalues] = [0] * (len(self.buckets) + 1)
+            self._sums[labelvalues] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labelvalues] += value
+
+    def _samples(self) -> list[str]:
+        samples = []
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for upper_bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_format_value(upper_bound)}"'
+                samples.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            samples.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(self._sums[labels])}")
+            samples.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.register(Counter(
+    "camara_location_requests_total", "HTTP requests by route and outcome.", ("route", "outcome")))
+REQUEST_DURATION = registry.register(Histogram(
+    "camara_location_request_duration_seconds", "HTTP request latency by route.", ("route",)))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "camara_location_requests_in_flight", "HTTP requests currently being served."))
+STAGE_DURATION = registry.register(Histogram(
+    "camara_location_stage_duration_seconds", "Latency of the location retrieval stages.", ("stage",)))
+NEF_REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "camara_location_nef_requests_in_flight", "NEF requests currently in flight."))
+NEF_ERRORS = registry.register(Counter(
+    "camara_location_nef_errors_total", "Failed NEF requests by error type.", ("type",)))
+
+
+def register_callback(name: str, documentation: str, metric_type: str,
+                      callback: Callable[[], dict[tuple[str, ...], float]], labelnames: tuple[str, ...] = ()) -> None:
+    """Exposes values kept by another component, read at scrape time."""
+    registry.register(CallbackMetric(name, documentation, metric_type, callback, labelnames))
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Observes the duration of the enclosed block in the stage latency histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started, stage)
+
+
+@dataclass(slots=True)
+class _RequestTimings:
+    started: float
+    handler_started: float = 0.0
+    handler_finished: float = 0.0
+
+
+_request_timings: ContextVar[_RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def instrument_endpoint(endpoint):
+    """
+    Marks when a route endpoint starts and returns.
+
+    The time before the endpoint starts is spent reading and validating the request,
+    the time between its return and the response start is spent serializing the
+    response; MetricsMiddleware observes both as stages. Endpoints that encode their
+    response themselves call endpoint_finished() before encoding it.
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.handler_started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if timings is not None and not timings.handler_finished:
+                timings.handler_finished = time.perf_counter()
+    return wrapper
+
+
+def endpoint_finished() -> None:
+    """Marks the end of the current endpoint's work, before it serializes its response."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.handler_finished = time.perf_counter()
+
+
+# Status recorded for requests whose client disconnected before the response, as nginx logs them.
+CLIENT_CLOSED_REQUEST = 499
+
+
+def _outcome(status_code: int) -> str:
+    if status_code >= 500:
+        return "5xx"
+    return str(status_code)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests by outcome and timing validation and serialization."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = _RequestTimings(started=time.perf_counter())
+        token = _request_timings.set(timings)
+        status_code = 500
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                if timings.handler_started:
+                    STAGE_DURATION.observe(timings.handler_started - timings.started, "request_validation")
+                if timings.handler_finished:
+                    STAGE_DURATION.observe(time.perf_counter() - timings.handler_finished, "response_serialization")
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+            if not response_started:
+                # Handling was cancelled because the client went away.
+                status_code = CLIENT_CLOSED_REQUEST
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            _request_timings.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            REQUESTS.inc(route_path, _outcome(status_code))
+            REQUEST_DURATION.observe(time.perf_counter() - timings.started, route_path)
@@ -0,0 +1,183 @@
+import bisect
+import hashlib
+import math
+import random
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from app.utils.circuit_breaker import CircuitBreaker, _circuit_breaker
+from app.utils.errors.exception_errors import CircuitOpenException, CoreHttpError, DeadlineExceededException
+from app.config import NefBackendSettings, get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+ROUTING_LEAST_LOADED = "least_loaded"
+ROUTING_HASH = "hash"
+# Points each backend owns on the hash ring, enough to spread devices evenly over a few backends.
+VIRTUAL_NODES = 100
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class NefBackend:
+    """
+    One NEF instance of the pool, with its own circuit breaker and load figures.
+
+    ``outstanding`` counts the calls in flight and ``latency`` is a peak-sensitive,
+    time-decayed average of the call durations: a slower call raises it at once, while
+    faster calls and idle time lower it with a time constant of ``latency_decay``
+    seconds, so a backend that was slow gets tried again once it had time to recover.
+    A failed call counts as lasting at least the slow-call duration of the breaker.
+    """
+
+    def __init__(self, name: str, base_url: str, scs_as_id: str, project_api_name: str | None,
+                 latency_decay: float):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.scs_as_id = scs_as_id
+        if project_api_name is None or project_api_name == "":
+            api = "3gpp-monitoring-event"
+        else:
+            api = "3gpp-monitoring-event-" + project_api_name
+        self.subscriptions_url = f"{self.base_url}/{api}/v1/{scs_as_id}/subscriptions"
+        self.breaker: CircuitBreaker = _circuit_breaker(name, (CoreHttpError,))
+        self.latency_decay = latency_decay
+        self.outstanding = 0
+        self.requests: Counter[str] = Counter()
+        self._latency = 0.0
+        self._latency_at = time.monotonic()
+
+    def subscription_url(self, session_id: str) -> str:
+        return f"{self.subscriptions_url}/{session_id}"
+
+    def latency(self, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        return self._latency * math.exp(-(now - self._latency_at) / self.latency_decay)
+
+    def load(self, now: float) -> float:
+        """Expected wait of one more call: the average latency times the calls it queues behind."""
+        latency = self.latency(now)
+        if latency == 0.0:
+            # Without a measured call yet the backend is tried once, not flooded.
+            return math.inf if self.outstanding else 0.0
+        return latency * (self.outstanding + 1)
+
+    async def call(self, fn: Callable[..., Awaitable[T]], *args) -> T:
+        """Awaits a call to this backend through its circuit breaker."""
+        self.outstanding += 1
+        started = time.monotonic()
+        try:
+            result = await self.breaker.call_async(fn, *args)
+        except CircuitOpenException:
+            self.requests["rejected"] += 1
+            raise
+        except DeadlineExceededException:
+            # The caller ran out of time, which says little about the latency of the backend.
+            self.requests["deadline"] += 1
+            raise
+        except CoreHttpError:
+            self.requests["error"] += 1
+            self._observe(max(time.monotonic() - started, self.breaker.slow_call_duration))
+            raise
+        except Exception:
+            # The NEF answered, e.g. with 401 or 404.
+            self.requests["ok"] += 1
+            self._observe(time.monotonic() - started)
+            raise
+        finally:
+            self.outstanding -= 1
+        self.requests["ok"] += 1
+        self._observe(time.monotonic() - started)
+        return result
+
+    def _observe(self, duration: float) -> None:
+        now = time.monotonic()
+        weight = math.exp(-(now - self._latency_at) / self.latency_decay)
+        self._latency = max(duration, self._latency * weight + duration * (1 - weight))
+        self._latency_at = now
+
+
+class NefPool:
+    """
+    Routes NEF calls over several NEF instances.
+
+    With ``least_loaded`` routing a new subscription goes to the backend with the
+    lowest ``latency * (outstanding + 1)``, ties broken at random. With ``hash``
+    routing it goes to the owner of the device on a consistent-hash ring, so the
+    same device keeps reaching the same NEF and its caches, and only the devices of
+    a removed backend move. Calls on an existing subscription go to the backend the
+    subscription link points at.
+
+    Ejection is passive: a backend whose circuit breaker is open is skipped until
+    the breaker lets probes through again, and the backend is re-admitted once they
+    succeed. When every backend is ejected the call goes to the preferred one
+    anyway, so its breaker rejects it with a ``Retry-After``.
+    """
+
+    def __init__(self, backends: list[NefBackend], routing: str, virtual_nodes: int = VIRTUAL_NODES):
+        if not backends:
+            raise ValueError("At least one NEF backend is required")
+        if routing not in (ROUTING_LEAST_LOADED, ROUTING_HASH):
+            raise ValueError(f"Unknown NEF routing {routing!r}, expected {ROUTING_LEAST_LOADED} or {ROUTING_HASH}")
+        self.backends = backends
+        self.routing = routing
+        ring = sorted((_ring_hash(f"{backend.name}#{node}"), index)
+                      for index, backend in enumerate(backends) for node in range(virtual_nodes))
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_backends = [index for _, index in ring]
+
+    def breakers(self) -> list[CircuitBreaker]:
+        return [backend.breaker for backend in self.backends]
+
+    def pick(self, routing_key: str | None = None) -> NefBackend:
+        """Returns the backend a new subscription, for the device `routing_key` if known, is created on."""
+        if len(self.backends) == 1:
+            return self.backends[0]
+        if self.routing == ROUTING_HASH and routing_key is not None:
+            return self._pick_hashed(routing_key)
+        return self._pick_least_loaded()
+
+    def backend_for_link(self, subscription_link: str) -> NefBackend:
+        """Returns the backend owning a subscription, the first one for links without a known host."""
+        if subscription_link.startswith(("http://", "https://")):
+            owners = [backend for backend in self.backends if subscription_link.startswith(backend.base_url + "/")]
+            if owners:
+                return max(owners, key=lambda backend: len(backend.base_url))
+        return self.backends[0]
+
+    def _pick_least_loaded(self) -> NefBackend:
+        now = time.monotonic()
+        candidates = [backend for backend in self.backends if backend.breaker.available()] or self.backends
+        return min(candidates, key=lambda backend: (backend.load(now), backend.outstanding, random.random()))
+
+    def _pick_hashed(self, routing_key: str) -> NefBackend:
+        start = bisect.bisect(self._ring_hashes, _ring_hash(routing_key))
+        points = len(self._ring_backends)
+        for offset in range(points):
+            backend = self.backends[self._ring_backends[(start + offset) % points]]
+            if backend.breaker.available():
+                return backend
+        return self.backends[self._ring_backends[start % points]]
+
+
+def _build_pool() -> NefPool:
+    configured = settings.nef_backends or [NefBackendSettings(name="nef", base_url=settings.base_url)]
+    backends = [
+        NefBackend(
+            name=backend.name,
+            base_url=backend.base_url,
+            scs_as_id=backend.scs_as_id or settings.scs_as_id,
+            project_api_name=backend.project_api_name or settings.project_api_name,
+            latency_decay=settings.nef_latency_decay,
+        )
+        for backend in configured
+    ]
+    return NefPool(backends, settings.nef_routing)
+
+nef_pool = _build_pool()
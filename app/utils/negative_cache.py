@@ -0,0 +1,75 @@
+import time
+from collections import Counter, OrderedDict
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class NegativeCache:
+    """
+    Bounded LRU cache of the devices the NEF recently could not locate.
+
+    Each entry remembers the failure cause of the device for the TTL of that cause
+    in ``ttls``, so the retrievals of an unknown, unregistered or denied device are
+    answered its CAMARA error without another NEF round trip until then. Causes
+    without a positive TTL are not cached. At most ``max_entries`` devices are kept,
+    the least recently failed are evicted first.
+    """
+
+    def __init__(self, ttls: dict[str, float], max_entries: int):
+        self.ttls = {cause: ttl for cause, ttl in ttls.items() if ttl > 0}
+        self.max_entries = max_entries
+        # Per-device (expires at, failure cause).
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.hits: Counter[str] = Counter()
+        self.stores: Counter[str] = Counter()
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> str | None:
+        """
+        Returns the failure cause of the device while it is negatively cached.
+
+        args:
+            key: device key, see app.utils.device_identity.device_key.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, cause = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self.hits[cause] += 1
+        return cause
+
+    def put(self, key: str, cause: str) -> None:
+        """Caches the failure of the device for the TTL of its cause, if that cause is cached."""
+        ttl = self.ttls.get(cause)
+        if ttl is None:
+            return
+        self._entries[key] = (time.monotonic() + ttl, cause)
+        self._entries.move_to_end(key)
+        self.stores[cause] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Forgets the failure of a device that was located since."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+negative_cache = NegativeCache(
+    ttls=settings.negative_cache_ttls,
+    max_entries=settings.negative_cache_max_entries,
+)
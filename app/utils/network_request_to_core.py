@@ -1,10 +1,17 @@
+import asyncio
+import json
+from dataclasses import dataclass, field
 
-import requests
+import httpx
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
-from app.utils.errors.exception_errors import CoreHttpError, LocationInfoNotFoundException, NetworkPlatformError, CoreUnauthorizedException
+from app.utils.errors.exception_errors import CoreHttpError, LocationFailureException, NEF_NOT_FOUND, NetworkPlatformError, CoreUnauthorizedException, CircuitOpenException
 from app.utils.logger import get_app_logger
-from app.invoker_onboarding.invoker_capif_connector import onboard_invoker
+from app.invoker_onboarding.invoker_capif_connector import credential_manager
+from app.utils.nef_pool import NefBackend, nef_pool
+from app.utils.deadline import check_deadline, deadline_exceeded, expired, remaining
+from app.utils.metrics import stage_timer, NEF_ERRORS, NEF_REQUESTS_IN_FLIGHT
 from app.config import get_settings
 
 log = get_app_logger(__name__)
@@ -12,8 +19,130 @@ settings = get_settings()
 
 APPLICATION_JSON = "application/json"
 
-def _make_request(method: str, url: str, data=None):
-    jwt_token = onboard_invoker()
+_nef_client: httpx.AsyncClient | None = None
+
+_NEF_TIMEOUT = httpx.Timeout(
+    connect=settings.nef_connect_timeout,
+    read=settings.nef_read_timeout,
+    write=settings.nef_read_timeout,
+    pool=settings.nef_pool_timeout,
+)
+
+@dataclass(slots=True)
+class NefResponse:
+    """
+    Raw NEF response body along with the Location header of created resources.
+
+    The body is kept as received so it can be validated straight into a model; it is
+    decoded to a dict only when ``body`` is read. ``backend`` is the NEF backend that
+    created the subscription, which relative subscription links are resolved against.
+    """
+    content: bytes
+    location: str | None = None
+    backend: NefBackend | None = None
+    _decoded_body: dict | None = field(default=None, init=False, repr=False)
+
+    @property
+    def body(self) -> dict | None:
+        if self._decoded_body is None and self.content:
+            self._decoded_body = json.loads(self.content)
+        return self._decoded_body
+
+def get_nef_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide NEF HTTP client, creating it on first use.
+
+    The client keeps a pool of keep-alive connections to the NEF so consecutive
+    retrievals reuse established TCP/TLS sessions instead of opening one per call.
+    """
+    global _nef_client
+    if _nef_client is None:
+        _nef_client = httpx.AsyncClient(
+            http2=settings.nef_http2,
+            limits=httpx.Limits(
+                max_connections=settings.nef_max_connections,
+                max_keepalive_connections=settings.nef_max_keepalive_connections,
+                keepalive_expiry=settings.nef_keepalive_expiry,
+            ),
+            timeout=_NEF_TIMEOUT,
+        )
+    return _nef_client
+
+async def warm_nef_connections(count: int) -> int:
+    """
+    Opens up to ``count`` pooled connections to each NEF backend ahead of the first retrievals.
+
+    Concurrent HEAD requests to the NEF root make the pool establish one TCP/TLS
+    session each, kept alive afterwards; any HTTP status means the connection is up.
+
+    returns:
+        number of connections opened.
+    """
+    client = get_nef_client()
+
+    async def connect(base_url: str) -> bool:
+        try:
+            await client.head(base_url)
+            return True
+        except httpx.HTTPError as exc:
+            log.warning("Could not open a connection to the NEF at %s: %s", base_url, exc)
+            return False
+
+    per_backend = min(count, max(settings.nef_max_keepalive_connections // len(nef_pool.backends), 1))
+    opened = await asyncio.gather(*(connect(backend.base_url) for backend in nef_pool.backends
+                                    for _ in range(per_backend)))
+    return sum(opened)
+
+async def close_nef_client() -> None:
+    """Closes the NEF HTTP client and its pooled connections."""
+    global _nef_client
+    if _nef_client is not None:
+        await _nef_client.aclose()
+        _nef_client = None
+
+async def _get_access_token() -> str:
+    with stage_timer("token_acquisition"):
+        jwt_token = credential_manager.cached_token()
+        if jwt_token is None:
+            check_deadline("token_acquisition")
+            # Onboarding and token retrieval use the blocking CAPIF SDK.
+            jwt_token = await run_in_threadpool(credential_manager.get_token)
+    return jwt_token
+
+async def _make_request(backend: NefBackend, method: str, url: str, data=None):
+    jwt_token = await _get_access_token()
+    check_deadline("nef_" + method.lower())
+    try:
+        return await backend.call(_send_request, method, url, jwt_token, data)
+    except CoreUnauthorizedException:
+        log.warning("NEF rejected the cached CAPIF token, fetching a new one and retrying once")
+        credential_manager.invalidate(jwt_token)
+        return await backend.call(_send_request, method, url, await _get_access_token(), data)
+    except CircuitOpenException:
+        NEF_ERRORS.inc("circuit_open")
+        raise
+
+def _request_timeout(method: str) -> httpx.Timeout:
+    """
+    The NEF client timeouts, shrunk to the time left before the deadline of the current request.
+
+    A POST keeps the full read and write timeouts once it is being sent: the NEF may
+    create the subscription anyway, and only a completed POST tells which one to
+    release. Its caller stops waiting at the deadline instead.
+    """
+    left = remaining()
+    if left is None:
+        return _NEF_TIMEOUT
+    left = max(left, 0.0)
+    sent_timeout = settings.nef_read_timeout if method == "POST" else min(settings.nef_read_timeout, left)
+    return httpx.Timeout(
+        connect=min(settings.nef_connect_timeout, left),
+        read=sent_timeout,
+        write=sent_timeout,
+        pool=min(settings.nef_pool_timeout, left),
+    )
+
+async def _send_request(method: str, url: str, jwt_token: str, data=None):
     try:
         headers = None
         if method == "POST" or method == "PUT":
@@ -22,43 +151,104 @@ def _make_request(method: str, url: str, data=None):
                 "accept": APPLICATION_JSON,
                 "Authorization": "Bearer " + jwt_token
             }
-        elif method == "GET":
+        elif method == "GET" or method == "DELETE":
             headers = {
                 "accept": APPLICATION_JSON,
                 "Authorization": "Bearer " + jwt_token
             }
-        log.info("Making %s request to %s with headers %s and data %s",method, url, headers, data)
-        response = requests.request(method, url, headers=headers, data=data, timeout=10)
+        log.debug("Making %s request to %s with data %s", method, url, data)
+        NEF_REQUESTS_IN_FLIGHT.inc()
+        try:
+            with stage_timer("nef_" + method.lower()):
+                response = await get_nef_client().request(method, url, headers=headers, content=data,
+                                                          timeout=_request_timeout(method))
+        finally:
+            NEF_REQUESTS_IN_FLIGHT.dec()
         response.raise_for_status()
-        if response.content:
-            return response.json()
-    except requests.exceptions.HTTPError as e:
+        return NefResponse(response.content, response.headers.get("location"))
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 401:
+            NEF_ERRORS.inc("unauthorized")
             raise CoreUnauthorizedException(e) from e
         elif e.response.status_code == 404:
-            raise LocationInfoNotFoundException(e) from e
+            NEF_ERRORS.inc("not_found")
+            raise LocationFailureException(NEF_NOT_FOUND, str(e)) from e
+        NEF_ERRORS.inc("http_" + str(e.response.status_code))
         raise CoreHttpError(e) from e
-    except requests.exceptions.ConnectionError as e:
+    except httpx.TimeoutException as e:
+        if expired():
+            NEF_ERRORS.inc("deadline")
+            raise deadline_exceeded("nef_" + method.lower()) from e
+        NEF_ERRORS.inc("timeout")
+        raise CoreHttpError("timeout") from e
+    except httpx.TransportError as e:
+        NEF_ERRORS.inc("connection_error")
         raise CoreHttpError("connection error") from e
     
-def monitoring_event_post_request(
-    base_url: str, scs_as_id: str, model_payload: BaseModel
-) -> dict:
+async def monitoring_event_post_request(
+    model_payload: BaseModel, routing_key: str | None = None
+) -> NefResponse:
+    """
+    Creates a Monitoring Event subscription on the NEF backend picked for the device
+    `routing_key`. The response remembers that backend, so relative subscription
+    links resolve against it and later calls on the subscription reach it again.
+    """
     data = model_payload.model_dump_json(exclude_none=True, by_alias=True)
-    url = _monitoring_event_build_url(base_url, scs_as_id)
+    backend = nef_pool.pick(routing_key)
     try:
-        return _make_request("POST", url, data=data)
+        response = await _make_request(backend, "POST", backend.subscriptions_url, data=data)
     except CoreHttpError as exc:
-        log.error("Failed to post monitoring event: %s", exc)
+        log.error("Failed to post monitoring event to %s: %s", backend.name, exc)
         raise NetworkPlatformError("Failed to post monitoring event") from exc
+    response.backend = backend
+    response.location = resolve_subscription_link(response, response.location)
+    return response
+
+async def monitoring_event_put_request(
+    subscription_link: str, model_payload: BaseModel
+) -> NefResponse:
+    data = model_payload.model_dump_json(exclude_none=True, by_alias=True)
+    backend, url = _subscription_resource(subscription_link)
+    try:
+        return await _make_request(backend, "PUT", url, data=data)
+    except CoreHttpError as exc:
+        log.error("Failed to update monitoring event subscription %s: %s", subscription_link, exc)
+        raise NetworkPlatformError("Failed to update monitoring event subscription") from exc
+
+async def monitoring_event_delete_request(subscription_link: str) -> None:
+    backend, url = _subscription_resource(subscription_link)
+    try:
+        await _make_request(backend, "DELETE", url)
+    except CoreHttpError as exc:
+        log.error("Failed to delete monitoring event subscription %s: %s", subscription_link, exc)
+        raise NetworkPlatformError("Failed to delete monitoring event subscription") from exc
+
+def subscription_self_link(response: NefResponse) -> str | None:
+    """
+    Returns the link of the subscription resource created or described by a NEF response.
+
+    The ``self`` attribute of the subscription body is preferred, falling back to the
+    Location header of a 201 response.
+    """
+    if response.body:
+        self_link = response.body.get("self") or response.body.get("self_link")
+        if self_link:
+            return resolve_subscription_link(response, self_link)
+    return response.location
+
+def resolve_subscription_link(response: NefResponse, subscription_link: str | None) -> str | None:
+    """Resolves a relative subscription link of a NEF response against the backend that created it."""
+    if subscription_link is None or response.backend is None:
+        return subscription_link
+    return _absolute_link(response.backend, subscription_link)
+
+def _absolute_link(backend: NefBackend, subscription_link: str) -> str:
+    """Resolves a relative subscription link against the backend that created it."""
+    if subscription_link.startswith(("http://", "https://")):
+        return subscription_link
+    return backend.subscription_url(subscription_link.rsplit("/", 1)[-1])
 
-def _monitoring_event_build_url(base_url: str, scs_as_id: str, session_id: str = None):
-    if settings.project_api_name is None or settings.project_api_name == "":
-        url = f"{base_url}/3gpp-monitoring-event/v1/{scs_as_id}/subscriptions"
-    else:
-        url= f"{base_url}" + "/3gpp-monitoring-event-" + settings.project_api_name + "/v1/"+ f"{scs_as_id}/subscriptions"
-    if session_id is not None and len(session_id) > 0:
-        return f"{url}/{session_id}"
-    else:
-        return url
-    
\ No newline at end of file
+def _subscription_resource(subscription_link: str) -> tuple[NefBackend, str]:
+    """Returns the backend owning a subscription and the URL of the subscription resource."""
+    backend = nef_pool.backend_for_link(subscription_link)
+    return backend, _absolute_link(backend, subscription_link)
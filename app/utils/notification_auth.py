@@ -0,0 +1,58 @@
+import functools
+import hmac
+import os
+import secrets
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.utils.logger import get_app_logger
+from app.config import get_settings
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+# Query parameter of notificationDestination carrying the token.
+TOKEN_PARAMETER = "token"
+
+
+@functools.cache
+def notification_token() -> str:
+    """
+    Returns the secret the NEF notifications must carry.
+
+    Unless ``notification_token`` is set, a token is generated once and kept in
+    ``shared_state_dir``, so every worker and the next run accept the notifications
+    of the subscriptions created with it.
+    """
+    if settings.notification_token:
+        return settings.notification_token
+    path = os.path.join(settings.shared_state_dir, "notification_token")
+    os.makedirs(settings.shared_state_dir, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}"
+    with open(temporary_path, "w", encoding="utf-8") as token_file:
+        token_file.write(secrets.token_urlsafe(32))
+    os.chmod(temporary_path, 0o600)
+    try:
+        # Publishes the token unless another worker already did, whose token is then used.
+        os.link(temporary_path, path)
+        log.info("Generated the notification token in %s", path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(temporary_path)
+    with open(path, encoding="utf-8") as token_file:
+        return token_file.read().strip()
+
+
+def notification_destination() -> str | None:
+    """Returns the notificationDestination of new subscriptions, carrying the notification token."""
+    if settings.notification_destination is None:
+        return None
+    parts = urlsplit(settings.notification_destination)
+    query = [(name, value) for name, value in parse_qsl(parts.query) if name != TOKEN_PARAMETER]
+    query.append((TOKEN_PARAMETER, notification_token()))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def is_authentic(token: str | None) -> bool:
+    """Tells whether a notification carries the token of the subscriptions created by this service."""
+    return token is not None and hmac.compare_digest(token.encode(), notification_token().encode())
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from app.schemas.monitoring_event import MonitoringEventReport
+from app.config import get_settings
+from app.utils.logger import get_app_logger
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+
+def subscription_key(subscription_link: str) -> str:
+    """
+    Returns the key a subscription is correlated by.
+
+    Only the path of the link is kept, so the NEF may advertise a different host
+    (e.g. its internal address) in the notification than in the POST response.
+    """
+    return urlsplit(str(subscription_link)).path.rstrip("/")
+
+
+def first_usable_report(reports: list[MonitoringEventReport] | None) -> MonitoringEventReport | None:
+    """Returns the first report carrying locationInfo, or the locFailureCause it could not be located for, if any."""
+    for report in reports or []:
+        if report.locationInfo is not None or report.locFailureCause is not None:
+            return report
+    return None
+
+
+class NotificationCorrelator:
+    """
+    Matches incoming MonitoringNotification reports to the retrievals awaiting them.
+
+    A retrieval in CURRENT_LOCATION mode waits on the subscription link returned by
+    the NEF; the first usable report notified for that link resolves it. Reports may
+    reach the notification endpoint before the POST response reaches the waiter, so
+    unclaimed usable reports are kept for a short time and handed out on arrival.
+    """
+
+    def __init__(self, unclaimed_ttl: float, max_unclaimed: int):
+        self.unclaimed_ttl = unclaimed_ttl
+        self.max_unclaimed = max_unclaimed
+        self._pending: dict[str, asyncio.Future] = {}
+        self._unclaimed: OrderedDict[str, tuple[float, MonitoringEventReport]] = OrderedDict()
+        self.matched = 0
+        self.unmatched = 0
+        self.timeouts = 0
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def wait_for_report(self, subscription_link: str, timeout: float) -> MonitoringEventReport:
+        """
+        Waits for the first usable report notified for the subscription.
+
+        args:
+            subscription_link: self link of the NEF subscription.
+            timeout: seconds to wait before giving up.
+
+        returns:
+            the first notified report carrying locationInfo.
+
+        raises:
+            TimeoutError: if no usable report arrived in time.
+        """
+        key = subscription_key(subscription_link)
+        early_report = self._claim_unclaimed(key)
+        if early_report is not None:
+            return early_report
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def dispatch(self, subscription_link: str, reports: list[MonitoringEventReport] | None) -> bool:
+        """
+        Hands the notified reports to the retrieval waiting on the subscription.
+
+        returns:
+            True if a waiting retrieval was resolved.
+        """
+        report = first_usable_report(reports)
+        if report is None:
+            return False
+
+        key = subscription_key(subscription_link)
+        future = self._pending.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(report)
+            self.matched += 1
+            return True
+
+        self.unmatched += 1
+        self._keep_unclaimed(key, report)
+        return False
+
+    def take_unclaimed(self, subscription_link: str) -> MonitoringEventReport | None:
+        """Returns the report notified for the subscription before anyone waited on it, if any."""
+        return self._claim_unclaimed(subscription_key(subscription_link))
+
+    def _claim_unclaimed(self, key: str) -> MonitoringEventReport | None:
+        entry = self._unclaimed.pop(key, None)
+        if entry is None:
+            return None
+        received_at, report = entry
+        if time.monotonic() - received_at > self.unclaimed_ttl:
+            return None
+        return report
+
+    def _keep_unclaimed(self, key: str, report: MonitoringEventReport) -> None:
+        now = time.monotonic()
+        self._unclaimed[key] = (now, report)
+        self._unclaimed.move_to_end(key)
+        while self._unclaimed:
+            oldest_key, (received_at, _) = next(iter(self._unclaimed.items()))
+            if len(self._unclaimed) <= self.max_unclaimed and now - received_at <= self.unclaimed_ttl:
+                break
+            del self._unclaimed[oldest_key]
+
+
+notification_correlator = NotificationCorrelator(
+    unclaimed_ttl=settings.notification_unclaimed_ttl,
+    max_unclaimed=settings.notification_max_unclaimed,
+)
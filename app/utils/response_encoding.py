@@ -0,0 +1,41 @@
+"""
+Pre-encoded JSON response bodies.
+
+Routes answer with the bytes produced here instead of returning models for FastAPI
+to validate against the response model and encode again. The encoding is the one
+of Starlette's JSONResponse, so the bodies are byte-for-byte the same as those
+FastAPI would send.
+"""
+import json
+from typing import Any
+
+from fastapi import Response
+
+from app.schemas.location_retrieval import Location, BatchRetrievalLocationResponse
+
+APPLICATION_JSON = "application/json"
+
+
+def encode_json(content: Any) -> bytes:
+    """Encodes JSON-compatible content exactly like Starlette's JSONResponse."""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def location_response(location: Location, x_correlator: str) -> Response:
+    """Response carrying a CAMARA Location, without its unset optional fields."""
+    response = Response(
+        encode_json(location.model_dump(mode="json", exclude_unset=True)), media_type=APPLICATION_JSON
+    )
+    response.headers["x-correlator"] = x_correlator
+    return response
+
+
+def batch_location_response(batch_response: BatchRetrievalLocationResponse, x_correlator: str) -> Response:
+    """Response carrying per-device batch results, without their empty fields."""
+    response = Response(
+        encode_json(batch_response.model_dump(mode="json", exclude_none=True)), media_type=APPLICATION_JSON
+    )
+    response.headers["x-correlator"] = x_correlator
+    return response
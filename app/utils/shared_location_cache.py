@@ -0,0 +1,290 @@
+"""
+Location cache shared by the worker processes of one host.
+
+The cache lives in a memory-mapped file of fixed-size records, so a location fetched
+by one worker is served by all of them. The records form a set-associative table:
+the hash of a device key selects a bucket of ``WAYS`` records and a location is
+stored in the record of its key, in a free record or in place of the oldest location
+of the bucket.
+
+Writers lock the byte range of the bucket with ``fcntl.lockf`` (and a thread lock
+against the other threads of the worker). Readers take no lock: each record carries
+a sequence number that writers make odd while they change the record, and a reader
+that sees it odd or changed by the time it copied the record treats the lookup as a
+miss.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+from app.schemas.location_retrieval import LastLocationTime, Location, Polygon
+from app.utils.location_size import ENTRY_BASE_BYTES, POINT_BYTES, estimate_location_size
+from app.utils.logger import get_app_logger
+from app.utils.tf_helper_for_camara_loc import CAMARA_MAX_BOUNDARY_POINTS, build_camara_polygon
+
+if TYPE_CHECKING:
+    import numpy as np
+
+log = get_app_logger(__name__)
+
+WAYS = 4
+MAX_KEY_BYTES = 120
+
+_MAGIC = b"LOCCACHE"
+_VERSION = 1
+# magic, version, ways, bucket count, record size
+_HEADER = struct.Struct("<8sIIQQ")
+_HEADER_SIZE = 64
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# seq, points, key hash, lastLocationTime in microseconds, key, latitudes, longitudes
+_RECORD = struct.Struct(f"<IIQq{MAX_KEY_BYTES}s{CAMARA_MAX_BOUNDARY_POINTS}d{CAMARA_MAX_BOUNDARY_POINTS}d")
+_RECORD_PREFIX = struct.Struct(f"<IIQq{MAX_KEY_BYTES}s")
+_RECORD_BODY = struct.Struct(_RECORD.format.replace("<I", "<", 1))
+_COORDINATES = struct.Struct(f"<{2 * CAMARA_MAX_BOUNDARY_POINTS}d")
+_SEQ = struct.Struct("<I")
+_KEY_HASH = struct.Struct("<Q")
+_KEY_HASH_OFFSET = 8
+_EMPTY_COORDINATES = (0.0,) * CAMARA_MAX_BOUNDARY_POINTS
+# Largest footprint of a decoded location, reserved out of max_bytes per decoded entry.
+_DECODED_MAX_SIZE = ENTRY_BASE_BYTES + POINT_BYTES * CAMARA_MAX_BOUNDARY_POINTS
+
+
+def _key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _to_microseconds(timestamp: datetime) -> int:
+    return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+
+class SharedLocationCache:
+    """
+    Fixed-capacity location cache in a file mapped by every worker.
+
+    Offers the interface of LocationCache. Capacity is the smaller of ``max_entries``
+    and what fits in ``max_bytes``, rounded down to a power-of-two number of buckets;
+    only Polygon locations with keys of at most MAX_KEY_BYTES bytes are cached. Each
+    worker also keeps the models of the ``decoded_entries`` locations it served most
+    recently, reused as long as their record is unchanged; the memory they may take
+    is reserved out of ``max_bytes``.
+    The hit, miss and eviction counters are those of the worker, the entry count and
+    size those of the shared file plus the decoded models of the worker.
+    """
+
+    def __init__(self, path: str, max_entries: int, max_bytes: int, ttl: int, decoded_entries: int = 1024):
+        self.path = path
+        self.ttl = ttl
+        self.decoded_entries = decoded_entries
+        decoded_max_bytes = decoded_entries * _DECODED_MAX_SIZE
+        capacity = max(min(max_entries, (max_bytes - decoded_max_bytes) // _RECORD.size), WAYS)
+        # Rounded down to a power of two, so the file stays within max_entries and max_bytes.
+        self.bucket_count = 1 << ((capacity // WAYS).bit_length() - 1)
+        self.max_entries = self.bucket_count * WAYS
+        self.max_bytes = self.max_entries * _RECORD.size + decoded_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._fd: int | None = None
+        self._mmap: mmap.mmap | None = None
+        self._records: "np.ndarray | None" = None
+        self._decoded: OrderedDict[str, tuple[int, int, Location]] = OrderedDict()
+        self._decoded_bytes = 0
+
+    def _open(self) -> None:
+        with self._lock:
+            if self._mmap is not None:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            size = _HEADER_SIZE + self.max_entries * _RECORD.size
+            header = _HEADER.pack(_MAGIC, _VERSION, WAYS, self.bucket_count, _RECORD.size)
+            # Workers starting together agree on the layout under an exclusive lock.
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size != size or os.pread(fd, _HEADER.size, 0) != header:
+                    log.info("Creating shared location cache %s with %d entries", self.path, self.max_entries)
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, header, 0)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+            import numpy as np
+
+            # The fields whole-file scans read.
+            fields = np.dtype({"names": ["points"], "formats": [np.uint32], "offsets": [4], "itemsize": _RECORD.size})
+            self._records = np.frombuffer(mmap.mmap(fd, size), dtype=fields, count=self.max_entries,
+                                          offset=_HEADER_SIZE)
+            self._fd = fd
+            self._mmap = self._records.base
+
+    def __len__(self) -> int:
+        if self._mmap is None:
+            self._open()
+        return int((self._records["points"] != 0).sum())
+
+    @property
+    def current_bytes(self) -> int:
+        return len(self) * _RECORD.size + self._decoded_bytes
+
+    def get(self, key: str, max_age: int | None = None) -> Location | None:
+        """
+        Returns the cached location of the device if it satisfies max_age.
+
+        args:
+            key: device key, see app.utils.device_identity.device_key.
+            max_age: maximum accepted age in seconds, None accepts any age within the TTL.
+
+        returns:
+            the cached Location, or None on a miss.
+        """
+        if self._mmap is None:
+            self._open()
+        encoded = key.encode("utf-8")
+        key_hash = _key_hash(encoded)
+        mapped = self._mmap
+        bucket_offset = self._bucket_offset(key_hash)
+        for offset in range(bucket_offset, bucket_offset + WAYS * _RECORD.size, _RECORD.size):
+            seq, points, stored_hash, last_location_us, stored_key = _RECORD_PREFIX.unpack_from(mapped, offset)
+            if stored_hash != key_hash or not points or stored_key.rstrip(b"\0") != encoded:
+                continue
+
+            last_location_time = _EPOCH + timedelta(microseconds=last_location_us)
+            age = (datetime.now(timezone.utc) - last_location_time).total_seconds()
+            if age > self.ttl or (max_age is not None and age > max_age):
+                break
+
+            decoded = self._decoded.get(key)
+            if decoded is not None and decoded[0] == offset and decoded[1] == seq:
+                location = decoded[2]
+            else:
+                coordinates = _COORDINATES.unpack_from(mapped, offset + _RECORD_PREFIX.size)
+                location = Location.model_construct(
+                    area=build_camara_polygon(coordinates[:points], coordinates[CAMARA_MAX_BOUNDARY_POINTS:][:points]),
+                    lastLocationTime=LastLocationTime.model_construct(last_location_time),
+                )
+            if seq & 1 or _SEQ.unpack_from(mapped, offset)[0] != seq:
+                break # being written, the caller fetches the location itself
+            if decoded is None or decoded[2] is not location:
+                self._remember(key, offset, seq, location)
+            self.hits += 1
+            return location
+        self.misses += 1
+        return None
+
+    def put(self, key: str, location: Location) -> None:
+        """Stores the location of the device unless a newer one is already cached."""
+        encoded = key.encode("utf-8")
+        if (len(encoded) > MAX_KEY_BYTES or not isinstance(location.area, Polygon)
+                or len(location.area.boundary.root) > CAMARA_MAX_BOUNDARY_POINTS):
+            return
+        if self._mmap is None:
+            self._open()
+        key_hash = _key_hash(encoded)
+        last_location_us = _to_microseconds(location.lastLocationTime.root)
+        points = location.area.boundary.root
+        padding = _EMPTY_COORDINATES[len(points):]
+        latitudes = [point.latitude for point in points]
+        longitudes = [point.longitude for point in points]
+        mapped = self._mmap
+        bucket_offset = self._bucket_offset(key_hash)
+
+        with self._locked_bucket(bucket_offset):
+            target = free = oldest = None
+            oldest_us = None
+            for offset in range(bucket_offset, bucket_offset + WAYS * _RECORD.size, _RECORD.size):
+                _, stored_points, stored_hash, stored_us, stored_key = _RECORD_PREFIX.unpack_from(mapped, offset)
+                if not stored_points:
+                    free = offset if free is None else free
+                elif stored_hash == key_hash and stored_key.rstrip(b"\0") == encoded:
+                    if stored_us > last_location_us:
+                        return
+                    target = offset
+                    break
+                elif oldest_us is None or stored_us < oldest_us:
+                    oldest, oldest_us = offset, stored_us
+            if target is None:
+                target = free
+            if target is None:
+                target = oldest
+                self.evictions += 1
+
+            seq = _SEQ.unpack_from(mapped, target)[0]
+            _SEQ.pack_into(mapped, target, seq + 1)
+            _RECORD_BODY.pack_into(mapped, target + _SEQ.size, len(points), key_hash, last_location_us, encoded,
+                                   *latitudes, *padding, *longitudes, *padding)
+            _SEQ.pack_into(mapped, target, seq + 2)
+        self._remember(key, target, seq + 2, location)
+
+    def invalidate(self, key: str) -> None:
+        """Drops the cached location of the device, if any."""
+        if self._mmap is None:
+            self._open()
+        encoded = key.encode("utf-8")
+        key_hash = _key_hash(encoded)
+        mapped = self._mmap
+        bucket_offset = self._bucket_offset(key_hash)
+        with self._locked_bucket(bucket_offset):
+            for offset in range(bucket_offset, bucket_offset + WAYS * _RECORD.size, _RECORD.size):
+                _, stored_points, stored_hash, _, stored_key = _RECORD_PREFIX.unpack_from(mapped, offset)
+                if stored_points and stored_hash == key_hash and stored_key.rstrip(b"\0") == encoded:
+                    self._clear_record(offset)
+
+    def clear(self) -> None:
+        if self._mmap is None:
+            self._open()
+        with self._locked_bucket(_HEADER_SIZE, self.bucket_count):
+            for index in self._records["points"].nonzero()[0]:
+                self._clear_record(_HEADER_SIZE + int(index) * _RECORD.size)
+
+    def stats(self) -> dict:
+        """Returns the cache counters, e.g. for logging or metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, key: str, offset: int, seq: int, location: Location) -> None:
+        if self.decoded_entries <= 0:
+            return
+        previous = self._decoded.pop(key, None)
+        if previous is not None:
+            self._decoded_bytes -= estimate_location_size(previous[2])
+        self._decoded[key] = (offset, seq, location)
+        self._decoded_bytes += estimate_location_size(location)
+        if len(self._decoded) > self.decoded_entries:
+            self._decoded_bytes -= estimate_location_size(self._decoded.popitem(last=False)[1][2])
+
+    def _bucket_offset(self, key_hash: int) -> int:
+        return _HEADER_SIZE + (key_hash & (self.bucket_count - 1)) * WAYS * _RECORD.size
+
+    def _clear_record(self, offset: int) -> None:
+        seq = _SEQ.unpack_from(self._mmap, offset)[0]
+        _SEQ.pack_into(self._mmap, offset, seq + 1)
+        self._mmap[offset + _SEQ.size:offset + _RECORD.size] = bytes(_RECORD.size - _SEQ.size)
+        _SEQ.pack_into(self._mmap, offset, seq + 2)
+
+    @contextmanager
+    def _locked_bucket(self, offset: int, buckets: int = 1) -> Iterator[None]:
+        length = buckets * WAYS * _RECORD.size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
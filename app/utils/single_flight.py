@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+from app.utils.deadline import deadline_exceeded, remaining
+from app.utils.logger import get_app_logger
+
+log = get_app_logger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into a single execution.
+
+    The first caller for a key starts the call as a task, callers arriving while it
+    is in flight await the same task and receive the same result or exception. Each
+    waiter awaits the task through asyncio.shield, so a cancelled waiter (e.g. a
+    disconnected client) does not cancel the call shared with the others; the call
+    is cancelled once the last of its waiters is.
+
+    The call runs in a fresh context, without the request deadline of the caller
+    that started it. Every waiter instead stops waiting at its own deadline, raising
+    DeadlineExceededException, so a caller with a short deadline does not fail the
+    others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def in_flight(self) -> int:
+        """Returns the number of keys with a call currently in flight."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs fn for key unless a call for the same key is already in flight.
+
+        args:
+            key: hashable identifying the shared call.
+            fn: zero-argument coroutine function performing the call.
+
+        returns:
+            the result of the shared call.
+
+        raises:
+            DeadlineExceededException: if the deadline of the caller ran out first.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(fn(), context=contextvars.Context())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+            log.debug("Coalescing %s call for %s into the one in flight", self.name, key)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), remaining())
+        except TimeoutError as exc:
+            if task.done():
+                raise
+            raise deadline_exceeded("single_flight") from exc
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Every waiter gave up on the call.
+                    log.debug("Cancelling %s call for %s, no caller waits for it", self.name, key)
+                    task.cancel()
+                    self.cancelled += 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled.
+            task.exception()
@@ -0,0 +1,108 @@
+"""
+Measures the cold start of the API and breaks its import time down by module.
+
+Each run imports the application in a fresh interpreter, as a new worker or replica
+does. The breakdown comes from ``python -X importtime``, summed per top-level package
+and listed for the slowest modules.
+
+    python -m app.utils.startup_profile
+    python -m app.utils.startup_profile --runs 10 --budget-ms 800
+
+With ``--budget-ms`` the command exits with status 1 when the median import time
+exceeds the budget, so it can guard cold start in CI.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+def _measure_import(module: str) -> tuple[float, float]:
+    """Returns the import time of the module and the wall time of the whole process, in seconds."""
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1]), time.perf_counter() - started
+
+
+def import_breakdown(module: str) -> list[tuple[str, int, int]]:
+    """Returns the (module, self µs, cumulative µs) of every module imported with the given one."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            check=True, capture_output=True, text=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def profile(module: str, runs: int, top: int) -> dict:
+    # The first import compiles the bytecode caches, as the first start of an image does.
+    _measure_import(module)
+    import_seconds, process_seconds = zip(*(_measure_import(module) for _ in range(runs)))
+
+    modules = import_breakdown(module)
+    packages: dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        packages[name.split(".")[0]] += self_us
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": {
+            "median": statistics.median(import_seconds) * 1000,
+            "min": min(import_seconds) * 1000,
+            "max": max(import_seconds) * 1000,
+        },
+        "process_ms_median": statistics.median(process_seconds) * 1000,
+        "packages_ms": {
+            package: self_us / 1000
+            for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "slowest_modules_ms": [
+            {"module": name, "self": self_us / 1000, "cumulative": cumulative_us / 1000}
+            for name, self_us, cumulative_us in sorted(modules, key=lambda item: item[1], reverse=True)[:top]
+        ],
+    }
+
+
+def _print_report(report: dict) -> None:
+    import_ms = report["import_ms"]
+    print(f"import {report['module']}: median {import_ms['median']:.1f} ms "
+          f"(min {import_ms['min']:.1f}, max {import_ms['max']:.1f}) over {report['runs']} runs, "
+          f"process {report['process_ms_median']:.1f} ms")
+    print("\nself time by package (ms)")
+    for package, milliseconds in report["packages_ms"].items():
+        print(f"  {milliseconds:8.1f}  {package}")
+    print("\nslowest modules, self / cumulative (ms)")
+    for entry in report["slowest_modules_ms"]:
+        print(f"  {entry['self']:8.1f}  {entry['cumulative']:8.1f}  {entry['module']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main", help="module whose import is measured")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="packages and modules listed")
+    parser.add_argument("--budget-ms", type=float, help="fail when the median import time exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = profile(args.module, args.runs, args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+    if args.budget_ms is not None and report["import_ms"]["median"] > args.budget_ms:
+        print(f"Cold start over budget: {report['import_ms']['median']:.1f} ms > {args.budget_ms:.1f} ms",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import asyncio
+import fcntl
+import glob
+import os
+import time
+
+from app.utils.network_request_to_core import monitoring_event_delete_request
+from app.utils.errors.exception_errors import NetworkPlatformError, LocationInfoNotFoundException, CoreUnauthorizedException
+from app.utils.logger import get_app_logger
+from app.config import get_settings
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+_JOURNAL_ADDED = "+"
+_JOURNAL_REMOVED = "-"
+
+
+class SubscriptionReaper:
+    """
+    Deletes released NEF subscriptions in the background.
+
+    Released subscription links are queued and deleted in batches of up to
+    ``batch_size``, at most ``rate`` deletes per second, retrying failed deletes with
+    exponential backoff up to ``max_attempts``. Every release and completed delete is
+    appended to a journal file, so subscriptions still outstanding when the process
+    dies are deleted at the next startup.
+
+    With ``per_worker`` journals every worker process appends to its own journal,
+    ``journal_path`` suffixed with its pid, and holds a lock on it while it runs. A
+    starting worker adopts the subscriptions of the journals no running worker holds.
+    """
+
+    def __init__(self, journal_path: str, batch_size: int, rate: float, max_attempts: int, retry_backoff: float,
+                 per_worker: bool = False):
+        self.journal_path = journal_path
+        self.per_worker = per_worker
+        self._own_journal_path = f"{journal_path}.{os.getpid()}" if per_worker else journal_path
+        self.batch_size = batch_size
+        self.rate = rate
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue: asyncio.Queue[tuple[str, int]] | None = None
+        self._outstanding: set[str] = set()
+        self._journal = None
+        self._journal_lines = 0
+        self._task: asyncio.Task | None = None
+        self._retry_tasks: set[asyncio.Task] = set()
+        self.deleted = 0
+        self.failed = 0
+
+    def outstanding(self) -> int:
+        return len(self._outstanding)
+
+    def release(self, subscription_link: str) -> None:
+        """Schedules the deletion of a subscription that is no longer needed."""
+        if self._queue is None:
+            log.warning("Subscription reaper is not running, %s is left on the NEF", subscription_link)
+            return
+        if subscription_link in self._outstanding:
+            return
+        self._outstanding.add(subscription_link)
+        self._append_journal(_JOURNAL_ADDED, subscription_link)
+        self._queue.put_nowait((subscription_link, 1))
+
+    async def start(self) -> None:
+        """Replays the journal of the previous run and starts the delete loop."""
+        self._queue = asyncio.Queue()
+        orphans = self._adopt_journals()
+        self._open_journal(orphans)
+        if orphans:
+            log.info("Releasing %s NEF subscriptions left over by the previous run", len(orphans))
+        for subscription_link in orphans:
+            self._outstanding.add(subscription_link)
+            self._queue.put_nowait((subscription_link, 1))
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, drain_timeout: float) -> None:
+        """Waits up to drain_timeout for queued deletes, then stops; leftovers stay journaled."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except TimeoutError:
+            log.warning("Stopping with %s NEF subscriptions still to delete", len(self._outstanding))
+        self._task.cancel()
+        for task in self._retry_tasks:
+            task.cancel()
+        await asyncio.gather(self._task, *self._retry_tasks, return_exceptions=True)
+        self._task = None
+        self._queue = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            if self.per_worker and not self._outstanding:
+                os.remove(self._own_journal_path)
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            started = time.monotonic()
+            results = await asyncio.gather(*(self._delete(link, attempt) for link, attempt in batch),
+                                           return_exceptions=True)
+            for (subscription_link, _), result in zip(batch, results):
+                # _delete handles its own failures, anything else must not stop the loop.
+                if isinstance(result, Exception):
+                    log.error("Unexpected failure releasing subscription %s", subscription_link, exc_info=result)
+                self._queue.task_done()
+
+            # Spread deletes so that at most `rate` of them reach the NEF per second.
+            pause = len(batch) / self.rate - (time.monotonic() - started)
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+    async def _delete(self, subscription_link: str, attempt: int) -> None:
+        try:
+            await monitoring_event_delete_request(subscription_link)
+        except LocationInfoNotFoundException:
+            log.debug("Subscription %s was already gone", subscription_link)
+        except Exception as exc:
+            # NEF and CAPIF failures as well as unexpected ones (e.g. a malformed link) are retried, then given up.
+            if not isinstance(exc, (NetworkPlatformError, CoreUnauthorizedException)):
+                log.warning("Unexpected error deleting subscription %s: %r", subscription_link, exc)
+            if attempt < self.max_attempts:
+                self._schedule_retry(subscription_link, attempt + 1)
+                return
+            log.error("Giving up deleting subscription %s after %s attempts: %r", subscription_link, attempt, exc)
+            self.failed += 1
+            self._finish(subscription_link)
+            return
+        self.deleted += 1
+        self._finish(subscription_link)
+
+    def _schedule_retry(self, subscription_link: str, attempt: int) -> None:
+        delay = self.retry_backoff * 2 ** (attempt - 2)
+
+        async def requeue() -> None:
+            await asyncio.sleep(delay)
+            self._queue.put_nowait((subscription_link, attempt))
+
+        task = asyncio.get_running_loop().create_task(requeue())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    def _finish(self, subscription_link: str) -> None:
+        self._outstanding.discard(subscription_link)
+        self._append_journal(_JOURNAL_REMOVED, subscription_link)
+        # Compact once the journal is mostly made of completed entries.
+        if self._journal_lines > 1000 and self._journal_lines > 4 * len(self._outstanding):
+            self._open_journal(self._outstanding)
+
+    def _load_journal(self, journal_path: str) -> list[str]:
+        if not os.path.exists(journal_path):
+            return []
+        outstanding: dict[str, None] = {}
+        with open(journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                marker, _, subscription_link = line.rstrip("\n").partition(" ")
+                if not subscription_link:
+                    continue
+                if marker == _JOURNAL_ADDED:
+                    outstanding[subscription_link] = None
+                elif marker == _JOURNAL_REMOVED:
+                    outstanding.pop(subscription_link, None)
+        return list(outstanding)
+
+    def _adopt_journals(self) -> list[str]:
+        """Takes over the journals of the previous run and of stopped workers."""
+        outstanding: dict[str, None] = {}
+        for journal_path in [self.journal_path, *glob.glob(glob.escape(self.journal_path) + ".*")]:
+            try:
+                fd = os.open(journal_path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Another starting worker may have adopted and removed it meanwhile.
+                if os.fstat(fd).st_nlink == 0:
+                    continue
+                outstanding.update(dict.fromkeys(self._load_journal(journal_path)))
+                os.remove(journal_path)
+            except BlockingIOError:
+                continue # a running worker's journal
+            finally:
+                os.close(fd)
+        return list(outstanding)
+
+    def _open_journal(self, outstanding) -> None:
+        """Rewrites the journal with only the outstanding subscriptions and keeps it open for appends."""
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self._own_journal_path) or ".", exist_ok=True)
+            self._journal = open(self._own_journal_path, "a", encoding="utf-8", buffering=1)
+            fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX)
+        self._journal.truncate(0)
+        self._journal_lines = 0
+        for subscription_link in outstanding:
+            self._append_journal(_JOURNAL_ADDED, subscription_link)
+
+    def _append_journal(self, marker: str, subscription_link: str) -> None:
+        if self._journal is None:
+            return
+        self._journal.write(f"{marker} {subscription_link}\n")
+        self._journal_lines += 1
+
+
+subscription_reaper = SubscriptionReaper(
+    journal_path=settings.subscription_journal_path,
+    batch_size=settings.subscription_reaper_batch_size,
+    rate=settings.subscription_reaper_rate,
+    max_attempts=settings.subscription_reaper_max_attempts,
+    retry_backoff=settings.subscription_reaper_retry_backoff,
+    per_worker=settings.workers > 1,
+)
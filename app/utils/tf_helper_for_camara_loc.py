@@ -3,18 +3,27 @@ from datetime import datetime, timedelta, timezone
 from app.schemas.location_retrieval import (   
     Area,
     AreaType,
+    Circle,
+    LastLocationTime,
+    Location,
     Point,
     PointList,
     Polygon
 )
 
 from app.schemas.monitoring_event import (
+    LocationInfo,
     MonitoringEventReport
 )
+from app.utils.cell_geometry_index import cell_geometry_index
+from app.utils.errors.exception_errors import LocationInfoNotFoundException
 from app.utils.logger import get_app_logger
 
 log = get_app_logger(__name__)
 
+# Maximum number of points of a CAMARA PointList.
+CAMARA_MAX_BOUNDARY_POINTS = 15
+
 def _compute_camara_last_location_time(
     event_time: datetime, age_of_location_info_min: int = None
 ) -> datetime:
@@ -46,21 +55,123 @@ def build_camara_last_location_time(monitoring_event_report : MonitoringEventRep
     last_location_time = _compute_camara_last_location_time(
         report_event_time, age_of_location_info
     )
-    log.info(f"Extracted camara-specific last_location_time value: {last_location_time}")
+    log.debug("Extracted camara-specific last_location_time value: %s", last_location_time)
     return last_location_time
 
+def _network_area_polygon(location_info: LocationInfo) -> tuple[list[float], list[float]]:
+    """
+    Looks up the polygon of the most precise network area a location names.
+
+    raises:
+        LocationInfoNotFoundException: if none of its areas is in the cell geometry index.
+    """
+    plmn = None
+    if location_info.plmnId is not None:
+        plmn = location_info.plmnId.mcc + location_info.plmnId.mnc
+    areas = (
+        ("cell", location_info.cellId),
+        ("enodeb", location_info.enodeBId),
+        ("tracking_area", location_info.trackingAreaId),
+        ("plmn", plmn),
+    )
+    for kind, identifier in areas:
+        if identifier is None:
+            continue
+        polygon = cell_geometry_index.lookup(kind, identifier, plmn)
+        if polygon is not None:
+            log.debug("Resolved location area from %s %s", kind, identifier)
+            return polygon[0].tolist(), polygon[1].tolist()
+    raise LocationInfoNotFoundException(
+        "Location information carries neither a geographic area nor an indexed network area"
+    )
+
 def build_camara_area(monitoring_event_report: MonitoringEventReport) -> Area:
-    geo_area = monitoring_event_report.locationInfo.geographicArea
+    """
+    Maps the polygon of a monitoring event report to a CAMARA Polygon.
+
+    The report was validated when parsed, so the CAMARA models are constructed without
+    validating them again; only the coordinate ranges CAMARA adds are checked. Reports
+    without a geographic area are mapped to the polygon of their cell, eNodeB, tracking
+    area or PLMN in the cell geometry index. Polygons with more points than a CAMARA
+    boundary allows are replaced by an enclosing polygon with few enough points.
+    """
+    location_info = monitoring_event_report.locationInfo
+    geo_area = location_info.geographicArea
+    if geo_area is not None and geo_area.polygon is not None:
+        coords = geo_area.polygon.point_list.geographical_coords
+        latitudes = [point.lat for point in coords]
+        longitudes = [point.lon for point in coords]
+    else:
+        latitudes, longitudes = _network_area_polygon(location_info)
+    if len(latitudes) > CAMARA_MAX_BOUNDARY_POINTS:
+        from app.utils.geometry import enclosing_polygon # numpy is loaded on first use
+
+        log.debug("Simplifying polygon of %d points", len(latitudes))
+        latitudes, longitudes = enclosing_polygon(latitudes, longitudes, CAMARA_MAX_BOUNDARY_POINTS)
+        latitudes, longitudes = latitudes.tolist(), longitudes.tolist()
+
+    area = build_camara_polygon(latitudes, longitudes)
+
+    log.debug("Extracted camara-specific area value: %s", area)
+
+    return area
+
+def build_camara_polygon(latitudes: list[float], longitudes: list[float]) -> Polygon:
+    """
+    Constructs a CAMARA Polygon from at most CAMARA_MAX_BOUNDARY_POINTS coordinates.
+
+    raises:
+        ValueError: if a coordinate is out of range.
+    """
     camara_point_list: list[Point] = []
-    for point in geo_area.polygon.point_list.geographical_coords:
+    for latitude, longitude in zip(latitudes, longitudes):
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(f"NEF coordinates out of range: lat={latitude}, lon={longitude}")
         camara_point_list.append(
-            Point(latitude=point.lat, longitude=point.lon)
+            Point.model_construct(latitude=latitude, longitude=longitude)
         )
-    area = Polygon(
+    return Polygon.model_construct(
         areaType=AreaType.polygon,
-        boundary=PointList(camara_point_list),
+        boundary=PointList.model_construct(camara_point_list),
+    )
+
+def build_camara_location(monitoring_event_report: MonitoringEventReport) -> Location:
+    """
+    Maps a monitoring event report carrying locationInfo to a CAMARA Location.
+
+    args:
+        monitoring_event_report: NEF report whose locationInfo is not None.
+
+    returns:
+        CAMARA Location built from the report area and event time.
+    """
+    area = build_camara_area(monitoring_event_report)
+    last_location_time = build_camara_last_location_time(monitoring_event_report)
+
+    return Location.model_construct(
+        area=area, lastLocationTime=LastLocationTime.model_construct(last_location_time)
     )
 
-    log.info(f"Extracted camara-specific area value: {area}")
+def build_camara_circle_location(location: Location) -> Location:
+    """
+    Maps a CAMARA Location with a Polygon area to one with the smallest Circle enclosing it.
 
-    return area
\ No newline at end of file
+    args:
+        location: CAMARA Location whose area is a Polygon.
+
+    returns:
+        CAMARA Location with the same lastLocationTime and a Circle area.
+    """
+    from app.utils.geometry import minimum_enclosing_circle # numpy is loaded on first use
+
+    points = location.area.boundary.root
+    latitude, longitude, radius = minimum_enclosing_circle(
+        [point.latitude for point in points], [point.longitude for point in points]
+    )
+    circle = Circle.model_construct(
+        areaType=AreaType.circle,
+        center=Point.model_construct(latitude=latitude, longitude=longitude),
+        # CAMARA circles are at least one metre wide.
+        radius=max(radius, 1.0),
+    )
+    return Location.model_construct(area=circle, lastLocationTime=location.lastLocationTime)
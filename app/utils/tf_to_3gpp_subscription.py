@@ -11,6 +11,7 @@ from app.schemas.monitoring_event import (
     DurationSec
 )
 
+from app.utils.notification_auth import notification_destination
 from app.config import get_settings
 
 settings = get_settings()
@@ -32,7 +33,7 @@ def _add_core_specific_location_parameters(
     if settings.location_type == "current_location":
         return MonitoringEventSubscriptionRequest(
             msisdn=retrieve_location_request.device.phoneNumber.root.lstrip("+"),
-            notificationDestination=settings.notification_destination,
+            notificationDestination=notification_destination(),
             monitoringType=MonitoringType.LOCATION_REPORTING,
             locationType=LocationType.CURRENT_LOCATION,
             maximumNumberOfReports=3,
@@ -41,7 +42,7 @@ def _add_core_specific_location_parameters(
     else:
         return MonitoringEventSubscriptionRequest(
             msisdn=retrieve_location_request.device.phoneNumber.root.lstrip("+"),
-            notificationDestination=settings.notification_destination,
+            notificationDestination=notification_destination(),
             monitoringType=MonitoringType.LOCATION_REPORTING,
             locationType=LocationType.LAST_KNOWN
         )
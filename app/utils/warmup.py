@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from starlette.concurrency import run_in_threadpool
+
+from app.schemas.location_retrieval import RetrievalLocationRequest
+from app.schemas.monitoring_event import MonitoringEventReportResponse
+from app.invoker_onboarding.invoker_capif_connector import credential_manager
+from app.utils.network_request_to_core import warm_nef_connections
+from app.utils.response_encoding import location_response
+from app.utils.tf_helper_for_camara_loc import build_camara_circle_location, build_camara_location
+from app.utils.tf_to_3gpp_subscription import build_monitoring_event_subscription
+from app.utils.logger import get_app_logger
+from app.config import get_settings
+
+log = get_app_logger(__name__)
+settings = get_settings()
+
+_SAMPLE_REQUEST = {"device": {"phoneNumber": "+306900000000"}, "maxAge": 60, "maxSurface": 1_000_000}
+
+
+def _sample_report() -> bytes:
+    coordinates = [{"lat": 37.98 + 0.001 * index, "lon": 23.72 + 0.002 * (index % 3)} for index in range(20)]
+    return json.dumps({
+        "monitoringType": "LOCATION_REPORTING",
+        "eventTime": datetime.now(timezone.utc).isoformat(),
+        "locationInfo": {
+            "ageOfLocationInfo": {"duration": 1},
+            "geographicArea": {"polygon": {"point_list": {"geographical_coords": coordinates}}},
+        },
+    }).encode()
+
+
+def _exercise_models() -> None:
+    """Runs a sample retrieval through the request, subscription, report and Location models."""
+    from app.utils.geometry import area_surface
+
+    request = RetrievalLocationRequest.model_validate(_SAMPLE_REQUEST)
+    build_monitoring_event_subscription(request).model_dump_json(exclude_none=True, by_alias=True)
+    report = MonitoringEventReportResponse.model_validate_json(_sample_report())
+    location = build_camara_location(report)
+    circle_location = build_camara_circle_location(location)
+    area_surface(location.area)
+    area_surface(circle_location.area)
+    location_response(location, "warm-up")
+    location_response(circle_location, "warm-up")
+
+
+class WarmUp:
+    """
+    Startup work done before the API reports itself ready.
+
+    Onboards the invoker and fetches the CAPIF token, retrying every
+    ``retry_interval`` seconds until CAPIF answers, opens ``nef_connections`` pooled
+    connections to each NEF backend and runs a sample retrieval through the models, so the
+    first requests after a deploy or scale-out are served at steady-state latency.
+    An unreachable NEF does not hold readiness back, the circuit breaker answers for
+    it.
+    """
+
+    def __init__(self, enabled: bool, nef_connections: int, retry_interval: float):
+        self.enabled = enabled
+        self.nef_connections = nef_connections
+        self.retry_interval = retry_interval
+        self.ready = not enabled
+        self.steps: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Starts the warm-up in the background, the server accepts connections meanwhile."""
+        if self.enabled:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        started = time.monotonic()
+        await self._step("models", self._warm_models)
+        await asyncio.gather(self._step("capif_token", self._fetch_token),
+                             self._step("nef_connections", self._connect_nef))
+        self.ready = True
+        log.info("Warm-up finished in %.2f s, ready to serve", time.monotonic() - started)
+
+    async def _step(self, name: str, step) -> None:
+        started = time.monotonic()
+        await step()
+        self.steps[name] = time.monotonic() - started
+
+    async def _fetch_token(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(credential_manager.get_token)
+                return
+            except Exception as exc: # CAPIF may still be starting, the API is not ready without a token
+                log.error("Warm-up could not obtain a CAPIF token, retrying in %s s: %s", self.retry_interval, exc)
+                await asyncio.sleep(self.retry_interval)
+
+    async def _connect_nef(self) -> None:
+        opened = await warm_nef_connections(self.nef_connections)
+        log.info("Opened %s of %s NEF connections", opened, self.nef_connections)
+
+    async def _warm_models(self) -> None:
+        try:
+            # Imports numpy and builds the models for the first time, off the event loop serving requests.
+            await run_in_threadpool(_exercise_models)
+        except Exception as exc: # a failing sample must not keep the API unready
+            log.error("Warm-up of the models failed: %s", exc)
+
+
+warm_up = WarmUp(
+    enabled=settings.warmup_enabled,
+    nef_connections=settings.warmup_nef_connections,
+    retry_interval=settings.warmup_retry_interval,
+)
@@ -0,0 +1,68 @@
+"""
+Payload size and encode cost of Circle against Polygon location areas.
+
+Builds CAMARA Locations from random NEF-like polygons and reports, per location, the
+cost of deriving the enclosing Circle (one at a time and batched) and the size and
+encode time of the response body for both area types.
+
+    python -m benchmarks.area_encoding_bench --locations 10000 --points 15
+"""
+import argparse
+import gzip
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.schemas.location_retrieval import AreaType, LastLocationTime, Location, Point, PointList, Polygon
+from app.utils.geometry import minimum_enclosing_circles
+from app.utils.response_encoding import encode_json
+from app.utils.tf_helper_for_camara_loc import build_camara_circle_location
+from benchmarks.geometry_bench import best_of, random_polygons
+
+
+def polygon_locations(latitudes: np.ndarray, longitudes: np.ndarray, offsets: np.ndarray) -> list[Location]:
+    last_location_time = LastLocationTime.model_construct(datetime.now(timezone.utc))
+    locations = []
+    for lat, lon in zip(np.split(latitudes, offsets[1:]), np.split(longitudes, offsets[1:])):
+        boundary = PointList.model_construct([
+            Point.model_construct(latitude=latitude, longitude=longitude)
+            for latitude, longitude in zip(lat.tolist(), lon.tolist())
+        ])
+        area = Polygon.model_construct(areaType=AreaType.polygon, boundary=boundary)
+        locations.append(Location.model_construct(area=area, lastLocationTime=last_location_time))
+    return locations
+
+
+def encode(locations: list[Location]) -> list[bytes]:
+    return [encode_json(location.model_dump(mode="json", exclude_unset=True)) for location in locations]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, default=10_000)
+    parser.add_argument("--points", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    latitudes, longitudes, offsets = random_polygons(args.locations, args.points)
+    polygons = polygon_locations(latitudes, longitudes, offsets)
+    circles = [build_camara_circle_location(location) for location in polygons]
+    per_location = 1e6 / args.locations
+
+    one_by_one = best_of(args.repeat, lambda: [build_camara_circle_location(location) for location in polygons])
+    batched = best_of(args.repeat, lambda: minimum_enclosing_circles(latitudes, longitudes, offsets))
+    print(f"enclosing circle of {args.locations} polygons of {args.points} points")
+    print(f"  one by one  {one_by_one * per_location:8.2f} us/location")
+    print(f"  batched     {batched * per_location:8.2f} us/location")
+
+    print(f"{'area':8} {'encode us':>10} {'bytes':>8} {'gzip bytes':>11}")
+    for name, locations in (("POLYGON", polygons), ("CIRCLE", circles)):
+        elapsed = best_of(args.repeat, lambda: encode(locations))
+        bodies = encode(locations)
+        size = sum(map(len, bodies)) / len(bodies)
+        compressed = sum(len(gzip.compress(body)) for body in bodies[:1000]) / min(len(bodies), 1000)
+        print(f"{name:8} {elapsed * per_location:10.2f} {size:8.0f} {compressed:11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Runs the CAMARA API with CAPIF onboarding replaced by a local stub.
+
+The stub hands out an unsigned JWT valid for one hour instead of onboarding the
+invoker and discovering services, so benchmarks measure the API and the NEF only.
+Settings are taken from the environment as usual (e.g. BASE_URL of the NEF stub).
+
+    python -m benchmarks.capif_stub --port 8080
+    python -m benchmarks.capif_stub --port 8080 --workers 4
+"""
+import argparse
+import os
+import time
+
+import jwt
+import uvicorn
+
+
+class StubServiceDiscoverer:
+    """Stands in for opencapif_sdk.service_discoverer after onboarding."""
+
+    def __init__(self):
+        self.invoker_capif_details = {"registered_security_contexes": []}
+        self.token = None
+
+    def get_tokens(self) -> None:
+        self.token = jwt.encode({"sub": "benchmark", "exp": int(time.time()) + 3600}, "benchmark-secret", algorithm="HS256")
+
+
+def install_capif_stub() -> None:
+    """Replaces CAPIF onboarding and discovery in the process-wide credential manager."""
+    from app.invoker_onboarding.invoker_capif_connector import CapifCredentialManager
+
+    CapifCredentialManager._onboard_and_discover = lambda self: StubServiceDiscoverer()
+
+
+def create_app():
+    """Returns the API with CAPIF stubbed, the factory every uvicorn worker process calls."""
+    install_capif_stub()
+    from app.main import app
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    # The workers read it from the environment they inherit to share their state.
+    os.environ["WORKERS"] = str(args.workers)
+    if args.workers > 1:
+        uvicorn.run("benchmarks.capif_stub:create_app", factory=True, host=args.host, port=args.port,
+                    workers=args.workers, log_level="warning")
+    else:
+        uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark of the area surface and polygon simplification code.
+
+Compares the vectorized surface computation of a whole batch of polygons with
+computing them one polygon at a time, and times the enclosing simplification of
+NEF polygons exceeding the CAMARA boundary size.
+
+    python -m benchmarks.geometry_bench --polygons 10000 --points 15
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.geometry import enclosing_polygon, polygon_area, polygon_areas
+
+
+def random_polygons(count: int, points: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Star-shaped polygons of about one kilometre around random European locations."""
+    rng = np.random.default_rng(seed)
+    centre_lat = rng.uniform(35, 60, (count, 1))
+    centre_lon = rng.uniform(-10, 30, (count, 1))
+    angles = np.sort(rng.uniform(0, 2 * np.pi, (count, points)), axis=1)
+    radius = 0.01 * (1 + 0.3 * rng.random((count, points)))
+    latitudes = centre_lat + radius * np.sin(angles)
+    longitudes = centre_lon + radius * np.cos(angles) / np.cos(np.radians(centre_lat))
+    offsets = np.arange(count) * points
+    return latitudes.ravel(), longitudes.ravel(), offsets
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polygons", type=int, default=10_000)
+    parser.add_argument("--points", type=int, default=15)
+    parser.add_argument("--simplify-points", type=int, nargs="+", default=[30, 100, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    latitudes, longitudes, offsets = random_polygons(args.polygons, args.points)
+    lat_lists = np.split(latitudes, offsets[1:])
+    lon_lists = np.split(longitudes, offsets[1:])
+
+    batch = best_of(args.repeat, lambda: polygon_areas(latitudes, longitudes, offsets))
+    single = best_of(args.repeat, lambda: [polygon_area(lat, lon) for lat, lon in zip(lat_lists, lon_lists)])
+    print(f"surface of {args.polygons} polygons of {args.points} points")
+    print(f"  batch       {batch * 1e3:9.2f} ms  {batch / args.polygons * 1e6:8.3f} us/polygon")
+    print(f"  one by one  {single * 1e3:9.2f} ms  {single / args.polygons * 1e6:8.3f} us/polygon")
+
+    for points in args.simplify_points:
+        lat, lon, _ = random_polygons(1, points, seed=points)
+        elapsed = best_of(args.repeat, lambda: enclosing_polygon(lat, lon, 15))
+        simplified_lat, simplified_lon = enclosing_polygon(lat, lon, 15)
+        growth = polygon_area(simplified_lat, simplified_lon) / polygon_area(lat, lon) - 1
+        print(f"enclosing 15-point polygon of {points:4d} points  {elapsed * 1e6:9.1f} us  area +{growth:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+End-to-end open-loop load benchmark of the location retrieval API.
+
+Starts the NEF stand-in and the CAMARA API with CAPIF stubbed out as local
+processes, offers POST /retrieve requests at a fixed Poisson arrival rate that does
+not slow down when the API does (latency is measured from each request's intended
+start, so queueing is not hidden), and reports throughput, latency percentiles and
+API CPU time per request as JSON.
+
+    python -m benchmarks.load_test --rate 200 --duration 30 --output bench.json
+    python -m benchmarks.load_test --rate 200 --duration 30 --baseline bench.json
+
+With ``--nef-backends`` several NEF stand-ins are started and the API routes over
+them with ``--nef-routing``; ``--nef-latency`` may then list one latency per backend,
+comma separated, and the result shows the subscriptions each backend received.
+
+With ``--baseline``, the run is compared to a stored result and the command exits
+with status 1 if throughput dropped or p99 latency grew by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+RETRIEVE_PATH = "/location-retrieval/v0.5/retrieve"
+READY_PATH = "/ready"
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float | None:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def process_cpu_seconds(pid: int) -> float | None:
+    """User plus system CPU time of a process, read from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def start_process(module: str, args: list[str], env: dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", module, *args], env={**os.environ, **env})
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def request_body(device_index: int, max_age: int | None) -> dict:
+    body = {"device": {"phoneNumber": f"+3069{device_index:08d}"}}
+    if max_age is not None:
+        body["maxAge"] = max_age
+    return body
+
+
+async def run_open_loop(api_url: str, rate: float, duration: float, devices: int, max_age: int | None,
+                        timeout: float) -> dict:
+    """Offers requests at `rate` per second for `duration` seconds and collects their outcomes."""
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=1000)
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=timeout) as client:
+
+        async def send(intended_start: float, device_index: int) -> None:
+            try:
+                response = await client.post(RETRIEVE_PATH, json=request_body(device_index, max_age))
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as exc:
+                statuses[type(exc).__name__] += 1
+            latencies.append(time.perf_counter() - intended_start)
+
+        tasks = []
+        started = time.perf_counter()
+        next_start = started
+        while next_start < started + duration:
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(next_start, random.randrange(devices))))
+            next_start += random.expovariate(rate)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(tasks),
+        "elapsed_seconds": elapsed,
+        "throughput_rps": statuses["200"] / elapsed,
+        "status_counts": dict(statuses),
+        "latency_ms": {
+            name: (value * 1000 if value is not None else None)
+            for name, value in (
+                ("p50", percentile(latencies, 0.50)),
+                ("p95", percentile(latencies, 0.95)),
+                ("p99", percentile(latencies, 0.99)),
+                ("p99.9", percentile(latencies, 0.999)),
+                ("max", latencies[-1] if latencies else None),
+            )
+        },
+    }
+
+
+def compare_to_baseline(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns the regressions of result against baseline, if any."""
+    regressions = []
+    current, previous = result["results"], baseline["results"]
+    if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {current['throughput_rps']:.1f} rps < baseline {previous['throughput_rps']:.1f} rps")
+    for name in ("p50", "p99"):
+        now, before = current["latency_ms"][name], previous["latency_ms"][name]
+        if now is not None and before is not None and now > before * (1 + tolerance):
+            regressions.append(f"{name} {now:.2f} ms > baseline {before:.2f} ms")
+    now, before = current.get("cpu_ms_per_request"), previous.get("cpu_ms_per_request")
+    if now is not None and before is not None and now > before * (1 + tolerance):
+        regressions.append(f"CPU {now:.3f} ms/request > baseline {before:.3f} ms/request")
+    return regressions
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    nef_urls = [f"http://127.0.0.1:{args.nef_port + index}" for index in range(args.nef_backends)]
+    nef_latencies = args.nef_latency.split(",")
+    state_dir = tempfile.mkdtemp(prefix="camara-bench-")
+    api_env = {
+        "BASE_URL": nef_urls[0],
+        "LOG_DIRECTORY_PATH": state_dir + "/",
+        "LOG_FILENAME_PATH": state_dir + "/bench",
+        "LOG_LEVEL": "WARNING",
+        "SUBSCRIPTION_JOURNAL_PATH": state_dir + "/subscription_journal.log",
+        "LOCATION_CACHE_ENABLED": str(args.cache).lower(),
+    }
+    if args.nef_backends > 1:
+        api_env["NEF_BACKENDS"] = json.dumps([{"name": f"nef{index}", "base_url": nef_url}
+                                              for index, nef_url in enumerate(nef_urls)])
+        api_env["NEF_ROUTING"] = args.nef_routing
+    nefs = [
+        start_process("benchmarks.nef_stub", [
+            "--port", str(args.nef_port + index), "--latency", nef_latencies[min(index, len(nef_latencies) - 1)],
+            "--error-rate", str(args.nef_error_rate), "--polygon-points", str(args.polygon_points),
+        ], {})
+        for index in range(args.nef_backends)
+    ]
+    api = start_process("benchmarks.capif_stub", ["--port", str(args.api_port)], api_env)
+    try:
+        for nef_url in nef_urls:
+            await wait_until_ready(nef_url + "/stats")
+        await wait_until_ready(api_url + READY_PATH)
+        if args.warmup > 0:
+            await run_open_loop(api_url, args.rate, args.warmup, args.devices, args.max_age, args.timeout)
+
+        cpu_before = process_cpu_seconds(api.pid)
+        results = await run_open_loop(api_url, args.rate, args.duration, args.devices, args.max_age, args.timeout)
+        cpu_after = process_cpu_seconds(api.pid)
+        if cpu_before is not None and cpu_after is not None and results["requests"]:
+            results["cpu_ms_per_request"] = (cpu_after - cpu_before) * 1000 / results["requests"]
+        if args.nef_backends > 1:
+            async with httpx.AsyncClient() as client:
+                results["nef_posts"] = [(await client.get(nef_url + "/stats")).json()["post"] for nef_url in nef_urls]
+    finally:
+        for process in (api, *nefs):
+            process.terminate()
+            process.wait(timeout=10)
+
+    return {
+        "config": {name: value for name, value in vars(args).items() if name not in ("output", "baseline")},
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=100.0, help="offered requests per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before the run")
+    parser.add_argument("--devices", type=int, default=1000, help="distinct phone numbers requested")
+    parser.add_argument("--max-age", type=int, default=None, help="maxAge sent with every request")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=False,
+                        help="enable the API location cache")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout in seconds")
+    parser.add_argument("--nef-latency", default="lognormal:0.02:0.4",
+                        help="NEF stub delay: const:<s>, uniform:<min>:<max> or lognormal:<median>:<sigma>, "
+                             "comma separated per backend")
+    parser.add_argument("--nef-backends", type=int, default=1, help="NEF stand-ins started on consecutive ports")
+    parser.add_argument("--nef-routing", default="least_loaded", help="least_loaded or hash")
+    parser.add_argument("--nef-error-rate", type=float, default=0.0)
+    parser.add_argument("--polygon-points", type=int, default=15)
+    parser.add_argument("--api-port", type=int, default=18080)
+    parser.add_argument("--nef-port", type=int, default=18000)
+    parser.add_argument("--output", help="write the result JSON to this file")
+    parser.add_argument("--baseline", help="compare against this stored result JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative regression tolerated against the baseline")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(result, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare_to_baseline(result, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION:", regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
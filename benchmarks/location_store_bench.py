@@ -0,0 +1,157 @@
+"""
+Memory footprint of the location cache layouts for a whole subscriber base.
+
+Fills the ``objects`` cache (pydantic models per device) and the ``columnar`` cache
+with distinct polygons for every device, and reports the resident memory each grew
+by, the bytes the cache accounts for itself, and the put and get costs. Every layout
+and size runs in a process of its own, so one measurement does not inherit the heap
+of another.
+
+An objects cache holds about 10 kB per 15-point location, so it is measured at
+``--objects-sample`` devices and extrapolated linearly to the larger sizes.
+
+    python -m benchmarks.location_store_bench --devices 1000000 10000000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.geometry_bench import random_polygons
+
+# Distinct locations generated at once, and reused in rotation by the columnar cache, which copies them.
+CHUNK = 10_000
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _locations(count: int, points: int, seed: int) -> list:
+    from app.schemas.location_retrieval import LastLocationTime, Location
+    from app.utils.tf_helper_for_camara_loc import build_camara_polygon
+
+    latitudes, longitudes, _ = random_polygons(count, points, seed=seed)
+    latitudes = latitudes.reshape(count, points).tolist()
+    longitudes = longitudes.reshape(count, points).tolist()
+    last_location_time = LastLocationTime.model_construct(datetime.now(timezone.utc))
+    return [Location.model_construct(area=build_camara_polygon(lat, lon), lastLocationTime=last_location_time)
+            for lat, lon in zip(latitudes, longitudes)]
+
+
+def _device_key(index: int) -> str:
+    return f"msisdn:3069{index:08d}"
+
+
+def measure(layout: str, devices: int, points: int, coordinates: str, lookups: int) -> dict:
+    """Fills one cache of `layout` with `devices` locations and measures it, in this process."""
+    from app.utils.location_cache import LocationCache
+    from app.utils.columnar_location_cache import ColumnarLocationCache
+
+    pool = _locations(CHUNK, points, seed=0) if layout == "columnar" else None
+    if layout == "columnar":
+        cache = ColumnarLocationCache(max_entries=devices, max_bytes=1 << 62, ttl=86_400,
+                                      coordinate_dtype=coordinates)
+    else:
+        cache = LocationCache(max_entries=devices, max_bytes=1 << 62, ttl=86_400)
+
+    rss_before = _rss_bytes()
+    put_seconds = 0.0
+    for chunk_start in range(0, devices, CHUNK):
+        count = min(CHUNK, devices - chunk_start)
+        locations = pool if pool is not None else _locations(count, points, seed=chunk_start // CHUNK + 1)
+        started = time.perf_counter()
+        for offset in range(count):
+            cache.put(_device_key(chunk_start + offset), locations[offset])
+        put_seconds += time.perf_counter() - started
+        del locations
+    rss_grown = _rss_bytes() - rss_before
+
+    keys = [_device_key(random.randrange(devices)) for _ in range(lookups)]
+    started = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    get_seconds = time.perf_counter() - started
+
+    result = {
+        "layout": layout,
+        "devices": devices,
+        "rss_bytes": rss_grown,
+        "rss_bytes_per_device": rss_grown / devices,
+        "accounted_bytes": cache.current_bytes,
+        "put_us": put_seconds / devices * 1e6,
+        "get_us": get_seconds / lookups * 1e6,
+    }
+    if layout == "columnar":
+        result["coordinates"] = coordinates
+        result["allocated_bytes"] = cache.allocated_bytes()
+    return result
+
+
+def _run_isolated(layout: str, devices: int, points: int, coordinates: str, lookups: int) -> dict:
+    command = [sys.executable, "-m", "benchmarks.location_store_bench", "--measure", layout,
+               "--devices", str(devices), "--points", str(points), "--coordinates", coordinates,
+               "--lookups", str(lookups)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        reason = "killed, out of memory" if completed.returncode == -9 else completed.stderr.strip()[-500:]
+        return {"layout": layout, "devices": devices, "coordinates": coordinates, "error": reason}
+    return json.loads([line for line in completed.stdout.splitlines() if line.startswith("{")][-1])
+
+
+def _gib(size: float) -> str:
+    return f"{size / (1 << 30):8.2f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--points", type=int, default=15)
+    parser.add_argument("--coordinates", nargs="+", default=["float64", "float32"], choices=["float64", "float32"])
+    parser.add_argument("--objects-sample", type=int, default=100_000,
+                        help="devices the objects cache is measured at before extrapolating")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--output", help="write the result JSON to this file")
+    parser.add_argument("--measure", choices=["objects", "columnar"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure is not None:
+        print(json.dumps(measure(args.measure, args.devices[0], args.points, args.coordinates[0], args.lookups)))
+        return
+
+    sample = _run_isolated("objects", args.objects_sample, args.points, "float64", min(args.lookups, args.objects_sample))
+    results = []
+    for devices in args.devices:
+        if "error" in sample:
+            results.append({**sample, "devices": devices})
+        else:
+            scale = devices / args.objects_sample
+            results.append({**sample, "devices": devices, "rss_bytes": sample["rss_bytes"] * scale,
+                            "accounted_bytes": sample["accounted_bytes"] * scale,
+                            "extrapolated_from": args.objects_sample})
+        for coordinates in args.coordinates:
+            results.append(_run_isolated("columnar", devices, args.points, coordinates, args.lookups))
+
+    print(f"location cache of {args.points}-point polygons")
+    print(f"{'layout':18} {'devices':>10} {'RSS GiB':>8} {'B/device':>9} {'put us':>7} {'get us':>7}")
+    for result in results:
+        name = result["layout"] + (f" {result['coordinates']}" if result["layout"] == "columnar" else "")
+        if "error" in result:
+            print(f"{name:18} {result['devices']:10d} {result['error']}")
+            continue
+        note = " (extrapolated)" if "extrapolated_from" in result else ""
+        print(f"{name:18} {result['devices']:10d} {_gib(result['rss_bytes'])} {result['rss_bytes_per_device']:9.0f} "
+              f"{result['put_us']:7.2f} {result['get_us']:7.2f}{note}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"points": args.points, "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Local NEF stand-in serving the Monitoring Event API for benchmarks.
+
+Run with e.g.::
+
+    python -m benchmarks.nef_stub --port 8000 --latency lognormal:0.02:0.5 --error-rate 0.01 --polygon-points 15
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+
+def parse_latency(spec: str):
+    """
+    Returns a sampler of response delays in seconds.
+
+    Supported specs: ``const:<s>``, ``uniform:<min>:<max>``, ``lognormal:<median>:<sigma>``.
+    """
+    kind, *params = spec.split(":")
+    values = [float(param) for param in params]
+    if kind == "const":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution {spec}")
+
+
+def build_polygon(points: int, lat: float = 37.98, lon: float = 23.72, radius_deg: float = 0.01) -> list[dict]:
+    return [
+        {"lat": lat + radius_deg * math.sin(2 * math.pi * i / points),
+         "lon": lon + radius_deg * math.cos(2 * math.pi * i / points)}
+        for i in range(points)
+    ]
+
+
+def create_app(latency: str, error_rate: float, polygon_points: int, age_minutes: int) -> FastAPI:
+    app = FastAPI()
+    sample_latency = parse_latency(latency)
+    polygon = build_polygon(polygon_points)
+    subscription_ids = itertools.count(1)
+    app.state.stats = {"post": 0, "delete": 0, "put": 0, "errors": 0}
+
+    async def delay_or_fail() -> Response | None:
+        await asyncio.sleep(sample_latency())
+        if random.random() < error_rate:
+            app.state.stats["errors"] += 1
+            return Response(status_code=500)
+        return None
+
+    async def create_subscription(request: Request, scs_as_id: str) -> Response:
+        app.state.stats["post"] += 1
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        subscription = json.loads(await request.body())
+        self_link = f"{request.base_url}3gpp-monitoring-event/v1/{scs_as_id}/subscriptions/{next(subscription_ids)}"
+        report = {
+            "msisdn": subscription.get("msisdn"),
+            "externalId": subscription.get("externalId"),
+            "monitoringType": "LOCATION_REPORTING",
+            "eventTime": datetime.now(timezone.utc).isoformat(),
+            "locationInfo": {
+                "ageOfLocationInfo": {"duration": age_minutes},
+                "geographicArea": {"polygon": {"point_list": {"geographical_coords": polygon}}},
+            },
+        }
+        return Response(content=json.dumps(report), status_code=201, media_type="application/json",
+                        headers={"Location": self_link})
+
+    async def delete_subscription(scs_as_id: str, subscription_id: str) -> Response:
+        app.state.stats["delete"] += 1
+        failure = await delay_or_fail()
+        return failure or Response(status_code=204)
+
+    async def update_subscription(request: Request, scs_as_id: str, subscription_id: str) -> Response:
+        app.state.stats["put"] += 1
+        failure = await delay_or_fail()
+        return failure or Response(content=await request.body(), media_type="application/json")
+
+    async def stats() -> dict:
+        return app.state.stats
+
+    for prefix in ("/3gpp-monitoring-event/v1", "/3gpp-monitoring-event-{project_api_name}/v1"):
+        app.add_api_route(prefix + "/{scs_as_id}/subscriptions", create_subscription, methods=["POST"])
+        app.add_api_route(prefix + "/{scs_as_id}/subscriptions/{subscription_id}", delete_subscription, methods=["DELETE"])
+        app.add_api_route(prefix + "/{scs_as_id}/subscriptions/{subscription_id}", update_subscription, methods=["PUT"])
+    app.add_api_route("/stats", stats, methods=["GET"])
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="const:0.005", help="const:<s>, uniform:<min>:<max> or lognormal:<median>:<sigma>")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--polygon-points", type=int, default=8)
+    parser.add_argument("--age-minutes", type=int, default=0, help="ageOfLocationInfo of the reports")
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.error_rate, args.polygon_points, args.age_minutes)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
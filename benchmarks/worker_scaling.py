@@ -0,0 +1,161 @@
+"""
+Worker scaling benchmark of the location retrieval API.
+
+Runs the API with CAPIF stubbed out for each worker count from 1 to ``--max-workers``
+against the NEF stand-in, saturates it with ``--concurrency`` clients that send the
+next request as soon as the previous one returned, and reports throughput, latency
+percentiles, API CPU time per request (summed over the worker processes) and scaling
+efficiency, i.e. throughput relative to the single-worker throughput times the
+number of workers, as JSON.
+
+    python -m benchmarks.worker_scaling --max-workers 4 --duration 20 --output scaling.json
+
+Workers share the CAPIF token and, with ``--cache``, the location cache, so the
+cache hit ratio stays that of a single process as workers are added.
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.load_test import (
+    READY_PATH, RETRIEVE_PATH, percentile, process_cpu_seconds, request_body, start_process, wait_until_ready,
+)
+
+
+def process_tree_cpu_seconds(pid: int) -> float | None:
+    """CPU time of a process and its children, read from /proc (Linux only)."""
+    total = process_cpu_seconds(pid)
+    if total is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as children:
+            child_pids = [int(child) for child in children.read().split()]
+    except OSError:
+        return total
+    return total + sum(process_tree_cpu_seconds(child) or 0.0 for child in child_pids)
+
+
+async def run_closed_loop(api_url: str, concurrency: int, duration: float, devices: int, max_age: int | None,
+                          timeout: float) -> dict:
+    """Keeps `concurrency` requests in flight for `duration` seconds and collects their outcomes."""
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+
+        async def client_loop() -> None:
+            while time.perf_counter() < deadline:
+                sent = time.perf_counter()
+                try:
+                    response = await client.post(RETRIEVE_PATH, json=request_body(random.randrange(devices), max_age))
+                    statuses[str(response.status_code)] += 1
+                except httpx.HTTPError as exc:
+                    statuses[type(exc).__name__] += 1
+                latencies.append(time.perf_counter() - sent)
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "elapsed_seconds": elapsed,
+        "throughput_rps": statuses["200"] / elapsed,
+        "status_counts": dict(statuses),
+        "latency_ms": {
+            name: (value * 1000 if value is not None else None)
+            for name, value in (
+                ("p50", percentile(latencies, 0.50)),
+                ("p99", percentile(latencies, 0.99)),
+            )
+        },
+    }
+
+
+async def run_workers(args: argparse.Namespace, workers: int) -> dict:
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    state_dir = tempfile.mkdtemp(prefix="camara-scaling-")
+    api = start_process("benchmarks.capif_stub", ["--port", str(args.api_port), "--workers", str(workers)], {
+        "BASE_URL": f"http://127.0.0.1:{args.nef_port}",
+        "LOG_DIRECTORY_PATH": state_dir + "/",
+        "LOG_FILENAME_PATH": state_dir + "/bench",
+        "LOG_LEVEL": "WARNING",
+        "SUBSCRIPTION_JOURNAL_PATH": state_dir + "/subscription_journal.log",
+        "SHARED_STATE_DIR": state_dir + "/shared",
+        "LOCATION_CACHE_ENABLED": str(args.cache).lower(),
+    })
+    try:
+        await wait_until_ready(api_url + READY_PATH)
+        if args.warmup > 0:
+            await run_closed_loop(api_url, args.concurrency, args.warmup, args.devices, args.max_age, args.timeout)
+        cpu_before = process_tree_cpu_seconds(api.pid)
+        results = await run_closed_loop(api_url, args.concurrency, args.duration, args.devices, args.max_age,
+                                        args.timeout)
+        cpu_after = process_tree_cpu_seconds(api.pid)
+        if cpu_before is not None and cpu_after is not None and results["requests"]:
+            results["cpu_ms_per_request"] = (cpu_after - cpu_before) * 1000 / results["requests"]
+    finally:
+        api.terminate()
+        api.wait(timeout=30)
+    return {"workers": workers, **results}
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    nef = start_process("benchmarks.nef_stub", [
+        "--port", str(args.nef_port), "--latency", args.nef_latency, "--polygon-points", str(args.polygon_points),
+    ], {})
+    runs = []
+    try:
+        await wait_until_ready(f"http://127.0.0.1:{args.nef_port}/stats")
+        for workers in range(1, args.max_workers + 1):
+            runs.append(await run_workers(args, workers))
+    finally:
+        nef.terminate()
+        nef.wait(timeout=10)
+
+    single_worker_rps = runs[0]["throughput_rps"]
+    for run in runs:
+        run["scaling_efficiency"] = (run["throughput_rps"] / (single_worker_rps * run["workers"])
+                                     if single_worker_rps else None)
+    return {
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "runs": runs,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=64, help="requests kept in flight")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each run")
+    parser.add_argument("--devices", type=int, default=1000, help="distinct phone numbers requested")
+    parser.add_argument("--max-age", type=int, default=None, help="maxAge sent with every request")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=False,
+                        help="enable the API location cache")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout in seconds")
+    parser.add_argument("--nef-latency", default="const:0.005",
+                        help="NEF stub delay: const:<s>, uniform:<min>:<max> or lognormal:<median>:<sigma>")
+    parser.add_argument("--polygon-points", type=int, default=15)
+    parser.add_argument("--api-port", type=int, default=18080)
+    parser.add_argument("--nef-port", type=int, default=18000)
+    parser.add_argument("--output", help="write the result JSON to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(result, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# The application reads its settings once, at import: point its state and logs at a
+# scratch directory and keep the lifespan from onboarding to a CAPIF that is not there.
+_state_dir = tempfile.mkdtemp(prefix="camara-tests-")
+os.environ.setdefault("LOG_DIRECTORY_PATH", _state_dir)
+os.environ.setdefault("LOG_FILENAME_PATH", os.path.join(_state_dir, "app_logger"))
+os.environ.setdefault("SHARED_STATE_DIR", os.path.join(_state_dir, "shared"))
+os.environ.setdefault("SUBSCRIPTION_JOURNAL_PATH", os.path.join(_state_dir, "subscription_journal.log"))
+os.environ.setdefault("WARMUP_ENABLED", "false")
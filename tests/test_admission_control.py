@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.config import get_settings
+from app.main import app, uri_prefix
+from app.utils import admission_control as admission
+from app.utils.admission_control import AdmissionController
+from app.utils.deadline import _deadline
+from app.utils.errors.exception_errors import RateLimitedException
+
+settings = get_settings()
+
+
+def controller(**overrides) -> AdmissionController:
+    options = dict(enabled=True, deadline=5.0, min_in_flight=2, max_in_flight=2, client_rate=1.0,
+                   client_burst=20, max_clients=100, throughput_decay=10.0)
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+@pytest.fixture
+def admission_controller(monkeypatch) -> AdmissionController:
+    admission_controller = controller(max_in_flight=0, min_in_flight=64)
+    monkeypatch.setattr(admission, "admission_controller", admission_controller)
+    monkeypatch.setattr("app.routers.location_retrieval.admission_controller", admission_controller)
+    return admission_controller
+
+
+def post_batch(devices: int) -> httpx.Response:
+    body = {"devices": [{"phoneNumber": f"+3469{index:07d}"} for index in range(devices)]}
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(f"{uri_prefix}/retrieve/batch", json=body)
+
+    return asyncio.run(post())
+
+
+def test_oversized_batch_is_rejected_before_it_is_charged(admission_controller, monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_devices", 5)
+    response = post_batch(50)
+
+    assert response.status_code == 400
+    # Only the token of the request itself was taken.
+    (tokens, _), = admission_controller._buckets.values()
+    assert tokens == pytest.approx(admission_controller.client_burst - 1, abs=0.1)
+    assert admission_controller.in_flight == 0
+
+
+def test_batch_devices_are_charged_to_the_client():
+    admission_controller = controller()
+    admission_controller.admit("client")
+    admission_controller.charge("client", 30)
+
+    assert admission_controller._buckets["client"][0] == pytest.approx(20 - 1 - 30, abs=0.1)
+    with pytest.raises(RateLimitedException):
+        admission_controller.admit("client")
+
+
+def test_acquire_waits_for_a_released_slot():
+    admission_controller = controller()
+
+    async def main():
+        assert admission_controller.try_acquire() and admission_controller.try_acquire()
+        waiter = asyncio.create_task(admission_controller.acquire())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+        started = time.monotonic()
+        admission_controller.release()
+        assert await waiter
+        # Woken by the release rather than by the next throughput sample.
+        assert time.monotonic() - started < admission.THROUGHPUT_SAMPLE_INTERVAL / 2
+
+    asyncio.run(main())
+    assert admission_controller.in_flight == 2
+    assert not admission_controller._slot_waiters
+
+
+def test_acquire_gives_up_at_the_deadline():
+    admission_controller = controller()
+
+    async def main():
+        admission_controller.try_acquire()
+        admission_controller.try_acquire()
+        _deadline.set(time.monotonic() + 0.05)
+        started = time.monotonic()
+        assert not await admission_controller.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) < admission.THROUGHPUT_SAMPLE_INTERVAL / 2
+    assert admission_controller.in_flight == 2
+    assert not admission_controller._slot_waiters
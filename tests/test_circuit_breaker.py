@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils.circuit_breaker import CircuitBreaker, CircuitState
+from app.utils.errors.exception_errors import CircuitOpenException, CoreHttpError, DeadlineExceededException
+
+
+def breaker(**overrides) -> CircuitBreaker:
+    options = dict(name="test", failure_exceptions=(CoreHttpError,), enabled=True, window=30, min_calls=4,
+                   error_rate=0.5, slow_call_duration=3.0, slow_call_rate=0.8, open_duration=0.05,
+                   half_open_calls=1)
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+async def succeed():
+    return "ok"
+
+
+async def fail():
+    raise CoreHttpError("timeout")
+
+
+async def run_out_of_time():
+    raise DeadlineExceededException("nef_post")
+
+
+async def call(circuit: CircuitBreaker, fn):
+    try:
+        return await circuit.call_async(fn)
+    except (CoreHttpError, DeadlineExceededException):
+        return None
+
+
+def window_counts(circuit: CircuitBreaker) -> tuple[int, int]:
+    return sum(bucket[1] for bucket in circuit._buckets), sum(bucket[2] for bucket in circuit._buckets)
+
+
+def test_opens_on_error_rate_and_closes_after_successful_probe():
+    circuit = breaker()
+
+    async def main():
+        for fn in (succeed, fail, fail, succeed):
+            await call(circuit, fn)
+        assert circuit.state is CircuitState.OPEN
+        with pytest.raises(CircuitOpenException):
+            await circuit.call_async(succeed)
+
+        await asyncio.sleep(0.06)
+        assert await circuit.call_async(succeed) == "ok"
+
+    asyncio.run(main())
+    assert circuit.state is CircuitState.CLOSED
+
+
+def test_deadline_exceeded_counts_as_neither_success_nor_failure():
+    circuit = breaker()
+
+    async def main():
+        for _ in range(10):
+            await call(circuit, run_out_of_time)
+        assert window_counts(circuit) == (0, 0)
+
+        for fn in (fail, fail, run_out_of_time, run_out_of_time, succeed):
+            await call(circuit, fn)
+
+    asyncio.run(main())
+    # Two failures out of three answered calls, still under min_calls.
+    assert window_counts(circuit) == (3, 2)
+    assert circuit.state is CircuitState.CLOSED
+
+
+def test_deadline_exceeded_probe_frees_its_slot():
+    circuit = breaker()
+    circuit._open()
+    circuit._opened_at = time.monotonic() - 1
+
+    async def main():
+        await call(circuit, run_out_of_time)
+        assert circuit.state is CircuitState.HALF_OPEN
+        assert circuit.available()
+        assert await circuit.call_async(succeed) == "ok"
+
+    asyncio.run(main())
+    assert circuit.state is CircuitState.CLOSED
+
+
+def test_blocking_call_with_deadline_exceeded_is_not_recorded():
+    circuit = breaker()
+
+    def blocking():
+        raise DeadlineExceededException("token_acquisition")
+
+    with pytest.raises(DeadlineExceededException):
+        circuit.call(blocking)
+    assert window_counts(circuit) == (0, 0)
@@ -0,0 +1,129 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.schemas.location_retrieval import LastLocationTime, Location, Point, PointList, Polygon
+from app.utils.columnar_location_cache import ColumnarLocationCache
+from app.utils.location_cache import LocationCache
+from tests.test_location_cache import polygon_location
+
+NOW = datetime.now(timezone.utc)
+
+
+def random_location(rng: random.Random, last_location_time: datetime | None = None) -> Location:
+    return Location(
+        area=Polygon(
+            areaType="POLYGON",
+            boundary=PointList([Point(latitude=rng.uniform(-90, 90), longitude=rng.uniform(-180, 180))
+                                for _ in range(rng.randint(3, 15))]),
+        ),
+        lastLocationTime=LastLocationTime(last_location_time or NOW - timedelta(seconds=rng.randint(0, 300))),
+    )
+
+
+def coordinates(location: Location) -> list[tuple[float, float]]:
+    return [(point.latitude, point.longitude) for point in location.area.boundary.root]
+
+
+def assert_same_location(served: Location, expected: Location) -> None:
+    assert coordinates(served) == coordinates(expected)
+    assert served.lastLocationTime.root == expected.lastLocationTime.root
+
+
+@pytest.mark.parametrize("decoded_entries", [0, 8])
+def test_random_operations_match_a_dict_model(decoded_entries):
+    rng = random.Random(25)
+    cache = ColumnarLocationCache(max_entries=64, max_bytes=1 << 24, ttl=600, decoded_entries=decoded_entries)
+    model: dict[str, Location] = {}
+    keys = [f"device-{index}" for index in range(200)]
+
+    for step in range(5000):
+        key = rng.choice(keys)
+        operation = rng.random()
+        if operation < 0.5:
+            # Every put is newer than the cached location, which the cache may have evicted meanwhile.
+            location = random_location(rng, NOW - timedelta(seconds=60) + timedelta(milliseconds=step))
+            cache.put(key, location)
+            model[key] = location
+        elif operation < 0.9:
+            served = cache.get(key)
+            if served is not None:
+                # An evicted location is a miss, a served one is the newest put.
+                assert_same_location(served, model[key])
+        else:
+            cache.invalidate(key)
+            model.pop(key, None)
+            assert cache.get(key) is None
+
+        assert len(cache) <= cache.max_entries
+
+    served = {key: cache.get(key) for key in keys}
+    assert sum(location is not None for location in served.values()) == len(cache)
+    for key, location in served.items():
+        if location is not None:
+            assert_same_location(location, model[key])
+
+
+def test_recently_hit_entries_survive_eviction():
+    cache = ColumnarLocationCache(max_entries=4, max_bytes=1 << 24, ttl=600, decoded_entries=0)
+    for key in "abcd":
+        cache.put(key, polygon_location())
+    # The hand clears the reference bits of a full sweep, then evicts the first device.
+    cache.put("e", polygon_location())
+    assert cache.get("a") is None
+
+    cache.get("b")
+    cache.put("f", polygon_location())
+
+    assert cache.evictions == 2
+    assert cache.get("c") is None
+    assert all(cache.get(key) is not None for key in "bdef")
+
+
+def test_entries_are_evicted_to_stay_within_max_bytes():
+    reference = ColumnarLocationCache(max_entries=1000, max_bytes=1 << 24, ttl=600, decoded_entries=4)
+    for index in range(10):
+        reference.put(f"device-{index}", polygon_location(points=15))
+        reference.get(f"device-{index}")
+    max_bytes = reference.current_bytes // 2
+
+    cache = ColumnarLocationCache(max_entries=1000, max_bytes=max_bytes, ttl=600, decoded_entries=4)
+    for index in range(10):
+        cache.put(f"device-{index}", polygon_location(points=15))
+        cache.get(f"device-{index}")
+        assert cache.current_bytes <= max_bytes
+
+    assert 0 < len(cache) < 10
+    assert cache.evictions == 10 - len(cache)
+
+
+def test_serves_the_same_locations_as_the_objects_layout():
+    rng = random.Random(3)
+    columnar = ColumnarLocationCache(max_entries=100, max_bytes=1 << 24, ttl=120)
+    objects = LocationCache(max_entries=100, max_bytes=1 << 24, ttl=120)
+    for index in range(50):
+        location = random_location(rng)
+        columnar.put(f"device-{index}", location)
+        objects.put(f"device-{index}", location)
+
+    for index in range(50):
+        for max_age in (None, 60):
+            expected = objects.get(f"device-{index}", max_age)
+            served = columnar.get(f"device-{index}", max_age)
+            assert (served is None) == (expected is None)
+            if expected is not None:
+                assert_same_location(served, expected)
+
+
+def test_float32_coordinates_are_precise_to_about_a_meter():
+    rng = random.Random(7)
+    cache = ColumnarLocationCache(max_entries=10, max_bytes=1 << 24, ttl=600, coordinate_dtype="float32",
+                                  decoded_entries=0)
+    location = random_location(rng)
+    cache.put("device", location)
+
+    for (latitude, longitude), (expected_latitude, expected_longitude) in zip(
+            coordinates(cache.get("device")), coordinates(location)):
+        assert latitude == pytest.approx(expected_latitude, abs=1e-5)
+        assert longitude == pytest.approx(expected_longitude, abs=2e-5)
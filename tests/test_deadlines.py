@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.schemas.location_retrieval import RetrievalLocationRequest
+from app.services import location_retrieval_tf
+from app.utils import network_request_to_core as core
+from app.utils.deadline import _deadline
+from app.utils.errors.exception_errors import DeadlineExceededException
+from benchmarks.nef_stub import create_app
+
+
+class RecordingReaper:
+    def __init__(self):
+        self.released = []
+
+    def release(self, subscription_link: str) -> None:
+        self.released.append(subscription_link)
+
+
+@pytest.fixture
+def nef(monkeypatch):
+    stub = create_app(latency="const:0.2", error_rate=0.0, polygon_points=15, age_minutes=0)
+
+    async def access_token() -> str:
+        return "token"
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub))
+    monkeypatch.setattr(core, "_nef_client", client)
+    monkeypatch.setattr(core, "_get_access_token", access_token)
+    yield stub
+    asyncio.run(client.aclose())
+
+
+@pytest.fixture
+def reaper(monkeypatch) -> RecordingReaper:
+    reaper = RecordingReaper()
+    monkeypatch.setattr(location_retrieval_tf, "subscription_reaper", reaper)
+    return reaper
+
+
+def test_subscription_of_a_post_outliving_the_deadline_is_released(nef, reaper):
+    request = RetrievalLocationRequest.model_validate({"device": {"phoneNumber": "+34690000001"}})
+
+    async def main():
+        _deadline.set(time.monotonic() + 0.05)
+        with pytest.raises(DeadlineExceededException):
+            await location_retrieval_tf._fetch_monitoring_event_report(request, "device")
+        assert reaper.released == []
+        # The POST carries on past the deadline, its subscription is released once it completes.
+        await asyncio.sleep(0.3)
+
+    asyncio.run(main())
+    assert nef.state.stats["post"] == 1
+    assert len(reaper.released) == 1
+    assert reaper.released[0].endswith("/subscriptions/1")
+
+
+def test_subscription_is_released_once_its_report_is_read(nef, reaper):
+    request = RetrievalLocationRequest.model_validate({"device": {"phoneNumber": "+34690000001"}})
+
+    report = asyncio.run(location_retrieval_tf._fetch_monitoring_event_report(request, "device"))
+    assert report.locationInfo is not None
+    assert len(reaper.released) == 1
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+from app.schemas.location_retrieval import LastLocationTime, Location, Point, PointList, Polygon
+from app.utils.location_cache import LocationCache
+from app.utils.location_size import estimate_location_size
+
+
+def polygon_location(age_seconds: float = 0.0, points: int = 3) -> Location:
+    return Location(
+        area=Polygon(
+            areaType="POLYGON",
+            boundary=PointList([Point(latitude=40.0 + i * 0.001, longitude=-3.0 + (i % 2) * 0.001)
+                                for i in range(points)]),
+        ),
+        lastLocationTime=LastLocationTime(datetime.now(timezone.utc) - timedelta(seconds=age_seconds)),
+    )
+
+
+def test_get_honours_max_age():
+    cache = LocationCache(max_entries=10, max_bytes=1 << 20, ttl=600)
+    location = polygon_location(age_seconds=30)
+    cache.put("device", location)
+
+    assert cache.get("device") is location
+    assert cache.get("device", max_age=60) is location
+    assert cache.get("device", max_age=10) is None
+    assert cache.get("other") is None
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_entries_past_the_ttl_are_dropped():
+    cache = LocationCache(max_entries=10, max_bytes=1 << 20, ttl=60)
+    cache.put("device", polygon_location(age_seconds=120))
+
+    assert cache.get("device") is None
+    assert len(cache) == 0
+    assert cache.current_bytes == 0
+
+
+def test_older_location_does_not_replace_newer_one():
+    cache = LocationCache(max_entries=10, max_bytes=1 << 20, ttl=600)
+    newer = polygon_location(age_seconds=5)
+    cache.put("device", newer)
+    cache.put("device", polygon_location(age_seconds=50))
+
+    assert cache.get("device") is newer
+
+
+def test_least_recently_used_entries_are_evicted_by_count():
+    cache = LocationCache(max_entries=2, max_bytes=1 << 20, ttl=600)
+    cache.put("a", polygon_location())
+    cache.put("b", polygon_location())
+    cache.get("a")
+    cache.put("c", polygon_location())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.evictions == 1
+
+
+def test_entries_are_evicted_by_estimated_size():
+    location = polygon_location(points=15)
+    size = estimate_location_size(location)
+    cache = LocationCache(max_entries=100, max_bytes=3 * size, ttl=600)
+    for key in "abcde":
+        cache.put(key, polygon_location(points=15))
+
+    assert len(cache) == 3
+    assert cache.current_bytes == 3 * size
+    assert [key for key in "abcde" if cache.get(key) is not None] == ["c", "d", "e"]
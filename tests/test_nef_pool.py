@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+from pydantic import BaseModel
+
+from app.schemas.monitoring_event import MonitoringType
+from app.utils import network_request_to_core as core
+from app.utils.nef_pool import ROUTING_HASH, NefBackend, NefPool
+from app.utils.network_request_to_core import NefResponse, subscription_self_link
+
+
+class Subscription(BaseModel):
+    msisdn: str = "123456789"
+
+
+def backend(name: str) -> NefBackend:
+    return NefBackend(name=name, base_url=f"http://{name}:8000", scs_as_id="1", project_api_name=None,
+                      latency_decay=10.0)
+
+
+@pytest.fixture
+def pool(monkeypatch) -> NefPool:
+    pool = NefPool([backend("nef-a"), backend("nef-b")], ROUTING_HASH)
+    monkeypatch.setattr(core, "nef_pool", pool)
+    return pool
+
+
+@pytest.fixture
+def nef_calls(monkeypatch) -> list[tuple[str, str, str]]:
+    """Records the (backend, method, url) of NEF calls, answering POSTs with relative subscription links."""
+    calls = []
+
+    async def make_request(nef: NefBackend, method: str, url: str, data=None):
+        calls.append((nef.name, method, url))
+        if method == "POST":
+            body = {"monitoringType": MonitoringType.LOCATION_REPORTING.value, "self": "subscriptions/42"}
+            return NefResponse(json.dumps(body).encode(), location="/3gpp-monitoring-event/v1/1/subscriptions/42")
+        return NefResponse(b"")
+
+    monkeypatch.setattr(core, "_make_request", make_request)
+    return calls
+
+
+def devices_of(pool: NefPool, name: str) -> list[str]:
+    return [device for device in (f"device-{index}" for index in range(100)) if pool.pick(device).name == name]
+
+
+def test_hash_routing_keeps_each_device_on_one_backend(pool):
+    assert all(pool.pick(device) is pool.pick(device) for device in (f"device-{index}" for index in range(100)))
+    assert devices_of(pool, "nef-a") and devices_of(pool, "nef-b")
+
+
+@pytest.mark.parametrize("owner", ["nef-a", "nef-b"])
+def test_relative_subscription_links_reach_the_backend_that_created_them(pool, nef_calls, owner):
+    device = devices_of(pool, owner)[0]
+    subscription = Subscription()
+
+    async def main():
+        response = await core.monitoring_event_post_request(subscription, routing_key=device)
+        subscription_link = subscription_self_link(response)
+        await core.monitoring_event_delete_request(subscription_link)
+        return response, subscription_link
+
+    response, subscription_link = asyncio.run(main())
+    owner_url = f"http://{owner}:8000/3gpp-monitoring-event/v1/1/subscriptions"
+    assert response.location == f"{owner_url}/42"
+    assert subscription_link == f"{owner_url}/42"
+    assert nef_calls == [(owner, "POST", owner_url), (owner, "DELETE", f"{owner_url}/42")]
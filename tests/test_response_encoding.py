@@ -0,0 +1,46 @@
+import json
+
+from fastapi.responses import JSONResponse
+
+from app.schemas.location_retrieval import Location
+from app.schemas.monitoring_event import MonitoringEventReportResponse
+from app.utils.response_encoding import encode_json, location_response
+from app.utils.tf_helper_for_camara_loc import build_camara_location
+
+NEF_REPORT = json.dumps({
+    "msisdn": "123456789",
+    "monitoringType": "LOCATION_REPORTING",
+    "eventTime": "2026-10-18T08:00:00Z",
+    "self": "http://nef/3gpp-monitoring-event/v1/1/subscriptions/abc",
+    "locationInfo": {
+        "cellId": "cell-1",
+        "geographicArea": {"polygon": {"point_list": {"geographical_coords": [
+            {"lon": -3.70, "lat": 40.41}, {"lon": -3.69, "lat": 40.42}, {"lon": -3.68, "lat": 40.41},
+        ]}}},
+    },
+}).encode()
+
+
+def test_report_is_validated_straight_from_nef_bytes():
+    report = MonitoringEventReportResponse.model_validate_json(NEF_REPORT)
+
+    assert report.self_link == "http://nef/3gpp-monitoring-event/v1/1/subscriptions/abc"
+    assert report.locationInfo.geographicArea.polygon.point_list.geographical_coords[1].lat == 40.42
+
+
+def test_location_body_matches_the_validated_json_response():
+    location = build_camara_location(MonitoringEventReportResponse.model_validate_json(NEF_REPORT))
+    response = location_response(location, "correlator")
+
+    # What FastAPI would send after validating the model against the response model.
+    validated = Location.model_validate(location.model_dump(exclude_unset=True))
+    expected = JSONResponse(validated.model_dump(mode="json", exclude_unset=True))
+    assert response.body == expected.body
+    assert response.headers["x-correlator"] == "correlator"
+    assert json.loads(response.body)["area"]["boundary"][0] == {"latitude": 40.41, "longitude": -3.70}
+
+
+def test_encoding_is_the_one_of_json_response():
+    content = {"status": 404, "code": "NOT_FOUND", "message": "Device ñ not found"}
+
+    assert encode_json(content) == JSONResponse(content).body
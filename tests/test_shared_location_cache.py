@@ -0,0 +1,71 @@
+from app.utils.location_size import estimate_location_size
+from app.utils.shared_location_cache import WAYS, SharedLocationCache, _RECORD
+from tests.test_location_cache import polygon_location
+
+
+def shared_cache(tmp_path, **overrides) -> SharedLocationCache:
+    options = dict(path=str(tmp_path / "location_cache.bin"), max_entries=1000, max_bytes=1 << 24, ttl=600,
+                   decoded_entries=2)
+    options.update(overrides)
+    return SharedLocationCache(**options)
+
+
+def test_locations_are_shared_between_workers(tmp_path):
+    writer, reader = shared_cache(tmp_path), shared_cache(tmp_path)
+    location = polygon_location(age_seconds=30)
+    writer.put("device", location)
+
+    served = reader.get("device")
+    assert served.area.boundary.root == location.area.boundary.root
+    assert served.lastLocationTime.root == location.lastLocationTime.root
+    assert reader.get("device", max_age=10) is None
+
+    writer.put("device", polygon_location(age_seconds=5, points=4))
+    assert len(reader.get("device").area.boundary.root) == 4
+
+    reader.invalidate("device")
+    assert writer.get("device") is None
+
+
+def test_oldest_location_of_a_full_bucket_is_evicted(tmp_path):
+    cache = shared_cache(tmp_path, max_entries=WAYS, max_bytes=WAYS * _RECORD.size, decoded_entries=0)
+    assert cache.bucket_count == 1
+    for index in range(WAYS + 1):
+        cache.put(f"device-{index}", polygon_location(age_seconds=100 - index))
+
+    assert len(cache) == WAYS
+    assert cache.evictions == 1
+    assert cache.get("device-0") is None
+    assert all(cache.get(f"device-{index}") is not None for index in range(1, WAYS + 1))
+
+
+def test_decoded_locations_are_bounded_and_counted(tmp_path):
+    cache = shared_cache(tmp_path)
+    locations = {f"device-{index}": polygon_location(points=15) for index in range(5)}
+    for key, location in locations.items():
+        cache.put(key, location)
+
+    decoded_bytes = 2 * estimate_location_size(locations["device-0"])
+    assert len(cache._decoded) == 2
+    assert cache.current_bytes == 5 * _RECORD.size + decoded_bytes
+    assert cache.stats()["bytes"] == cache.current_bytes
+    assert cache.get("device-4") is locations["device-4"]
+    assert cache.get("device-0") is not locations["device-0"]
+
+
+def test_decoded_locations_are_reserved_out_of_max_bytes(tmp_path):
+    with_decoded = shared_cache(tmp_path, max_entries=10_000, max_bytes=1 << 20, decoded_entries=64)
+    without_decoded = shared_cache(tmp_path, max_entries=10_000, max_bytes=1 << 20, decoded_entries=0)
+
+    assert with_decoded.max_entries < without_decoded.max_entries
+    assert with_decoded.max_bytes <= 1 << 20
+    assert without_decoded.max_bytes <= 1 << 20
+
+
+def test_decoding_can_be_disabled(tmp_path):
+    cache = shared_cache(tmp_path, decoded_entries=0)
+    cache.put("device", polygon_location())
+
+    assert cache.get("device") is not None
+    assert not cache._decoded
+    assert cache.current_bytes == _RECORD.size
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils.deadline import _deadline, remaining
+from app.utils.errors.exception_errors import DeadlineExceededException
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "location"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("device", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["location"] * 5
+    assert calls == 1
+    assert (flight.executed, flight.coalesced) == (1, 4)
+    assert flight.in_flight() == 0
+
+
+def test_waiters_share_the_exception_of_the_call():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("NEF down")
+
+    async def main():
+        return await asyncio.gather(flight.do("device", fail), flight.do("device", fail),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_call_carries_on_until_its_last_waiter_is_cancelled():
+    flight = SingleFlight("test")
+
+    async def main():
+        done = asyncio.Event()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            done.set()
+            return "location"
+
+        first = asyncio.create_task(flight.do("device", fetch))
+        second = asyncio.create_task(flight.do("device", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "location"
+        assert done.is_set()
+
+        third = asyncio.create_task(flight.do("other", fetch))
+        await asyncio.sleep(0.01)
+        third.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await third
+
+    asyncio.run(main())
+    assert flight.cancelled == 1
+
+
+def test_deadline_of_one_caller_does_not_fail_the_others():
+    flight = SingleFlight("test")
+    deadlines_seen = []
+
+    async def fetch():
+        deadlines_seen.append(remaining())
+        await asyncio.sleep(0.1)
+        return "location"
+
+    async def call(timeout: float | None):
+        if timeout is not None:
+            _deadline.set(time.monotonic() + timeout)
+        return await flight.do("device", fetch)
+
+    async def main():
+        return await asyncio.gather(call(0.02), call(None), call(1.0), return_exceptions=True)
+
+    hurried, patient, bounded = asyncio.run(main())
+    assert isinstance(hurried, DeadlineExceededException)
+    assert (patient, bounded) == ("location", "location")
+    # The shared call runs without the deadline of the caller that started it.
+    assert deadlines_seen == [None]
@@ -0,0 +1,82 @@
+import asyncio
+
+from app.utils import subscription_reaper as reaper_module
+from app.utils.errors.exception_errors import NetworkPlatformError
+from app.utils.subscription_reaper import SubscriptionReaper
+
+
+def reaper(tmp_path, **overrides) -> SubscriptionReaper:
+    options = dict(journal_path=str(tmp_path / "journal.log"), batch_size=5, rate=1000.0, max_attempts=3,
+                   retry_backoff=0.01)
+    options.update(overrides)
+    return SubscriptionReaper(**options)
+
+
+def test_released_subscriptions_are_deleted(tmp_path, monkeypatch):
+    deleted = []
+
+    async def delete(subscription_link):
+        deleted.append(subscription_link)
+
+    monkeypatch.setattr(reaper_module, "monitoring_event_delete_request", delete)
+    subscriptions = reaper(tmp_path)
+
+    async def main():
+        await subscriptions.start()
+        for index in range(12):
+            subscriptions.release(f"http://nef/subscriptions/{index}")
+        subscriptions.release("http://nef/subscriptions/0")
+        await subscriptions.stop(drain_timeout=1.0)
+
+    asyncio.run(main())
+    assert sorted(deleted) == sorted(f"http://nef/subscriptions/{index}" for index in range(12))
+    assert (subscriptions.deleted, subscriptions.outstanding()) == (12, 0)
+
+
+def test_unexpected_delete_errors_are_retried_without_stopping_the_loop(tmp_path, monkeypatch):
+    attempts: dict[str, int] = {}
+
+    async def delete(subscription_link):
+        attempts[subscription_link] = attempts.get(subscription_link, 0) + 1
+        if subscription_link == "malformed":
+            raise ValueError("no subscription id in link")
+        if subscription_link == "flaky" and attempts[subscription_link] < 3:
+            raise NetworkPlatformError("NEF unavailable")
+
+    monkeypatch.setattr(reaper_module, "monitoring_event_delete_request", delete)
+    subscriptions = reaper(tmp_path)
+
+    async def main():
+        await subscriptions.start()
+        for subscription_link in ("malformed", "flaky", "fine"):
+            subscriptions.release(subscription_link)
+        await asyncio.sleep(0.2)
+        subscriptions.release("after")
+        await subscriptions.stop(drain_timeout=1.0)
+
+    asyncio.run(main())
+    assert attempts == {"malformed": 3, "flaky": 3, "fine": 1, "after": 1}
+    assert (subscriptions.deleted, subscriptions.failed) == (3, 1)
+
+
+def test_subscriptions_left_outstanding_are_released_at_next_start(tmp_path, monkeypatch):
+    deleted = []
+
+    async def unreachable(subscription_link):
+        raise NetworkPlatformError("NEF unavailable")
+
+    async def delete(subscription_link):
+        deleted.append(subscription_link)
+
+    async def run(subscriptions: SubscriptionReaper, links: list[str]):
+        await subscriptions.start()
+        for subscription_link in links:
+            subscriptions.release(subscription_link)
+        await subscriptions.stop(drain_timeout=0.05)
+
+    monkeypatch.setattr(reaper_module, "monitoring_event_delete_request", unreachable)
+    asyncio.run(run(reaper(tmp_path, retry_backoff=10.0), ["a", "b"]))
+
+    monkeypatch.setattr(reaper_module, "monitoring_event_delete_request", delete)
+    asyncio.run(run(reaper(tmp_path), []))
+    assert sorted(deleted) == ["a", "b"]